@@ -0,0 +1,179 @@
+import sqlite3
+import datetime
+import threading
+from decimal import Decimal
+from typing import Iterator, List, Optional, Tuple
+from query_budget import QueryBudget, QueryTimeout
+from result_digest import has_order_by
+
+# Engine used when none is requested: "sqlite" or "duckdb".
+DEFAULT_BACKEND = "sqlite"
+
+BACKENDS = ("sqlite", "duckdb")
+
+# Rows pulled from the engine per batch.
+FETCH_BATCH_SIZE = 1000
+
+
+def normalize_value(value):
+    """Map engine-specific Python values onto the types sqlite3 returns"""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        if isinstance(value, bool):
+            return int(value)
+        return value
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    if hasattr(value, "item"):
+        # numpy scalars
+        return normalize_value(value.item())
+    return str(value)
+
+
+def _sort_key(row: Tuple) -> Tuple:
+    # SQLite ordering across types: NULL < numbers < text < blob.
+    return tuple((0, 0) if v is None else (1, v) if isinstance(v, (int, float)) else
+                 (2, v) if isinstance(v, str) else (3, v) for v in row)
+
+
+class ExecutionBackend:
+    """Runs SQL for the evaluators and returns rows as plain sqlite3-style tuples"""
+
+    name = None
+    # Exceptions the engine raises for a bad or failing statement.
+    Error = Exception
+    # True if rows of a query without ORDER BY come back in an arbitrary
+    # order; such results are sorted so comparisons stay deterministic.
+    unordered_output = False
+
+    def iter_batches(self, sql: str, budget: Optional[QueryBudget] = None,
+                     batch_size: int = FETCH_BATCH_SIZE) -> Iterator[List[Tuple]]:
+        raise NotImplementedError
+
+    def fetch_all(self, sql: str, budget: Optional[QueryBudget] = None) -> List[Tuple]:
+        rows = []
+        for batch in self.iter_batches(sql, budget):
+            rows.extend(batch)
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(ExecutionBackend):
+    name = "sqlite"
+    Error = sqlite3.Error
+
+    def __init__(self, conn: sqlite3.Connection):
+        """
+        Default backend: executes directly on an sqlite3 connection.
+
+        Args:
+            conn (sqlite3.Connection): Connection to run queries on
+        """
+        self.conn = conn
+
+    def iter_batches(self, sql, budget=None, batch_size=FETCH_BATCH_SIZE):
+        if not budget:
+            cursor = self.conn.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        with budget.guard(self.conn):
+            cursor = self.conn.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+
+    def fetch_all(self, sql, budget=None):
+        if not budget:
+            return self.conn.execute(sql).fetchall()
+        with budget.guard(self.conn):
+            return self.conn.execute(sql).fetchall()
+
+
+class DuckDBBackend(ExecutionBackend):
+    name = "duckdb"
+    unordered_output = True
+
+    def __init__(self, conn: sqlite3.Connection, threads: Optional[int] = None):
+        """
+        Embedded columnar engine (DuckDB) holding a copy of every table in
+        `conn`.
+
+        Session settings follow SQLite semantics where they differ (integer
+        division, NULLs sorting first ascending). Rows are normalized to
+        sqlite3 Python types. Only the wall-clock part of a QueryBudget is
+        enforced (via interrupt()); VM step limits are SQLite-specific.
+
+        Args:
+            conn (sqlite3.Connection): Source database to copy
+            threads (int): DuckDB worker threads (None = DuckDB default)
+        """
+        try:
+            import duckdb
+        except ImportError as e:
+            raise RuntimeError("The duckdb backend requires the 'duckdb' package (pip install duckdb)") from e
+        import pandas as pd
+
+        self.Error = duckdb.Error
+        self._interrupted = duckdb.InterruptException
+        self.duck = duckdb.connect(":memory:")
+        for setting in ("SET integer_division = true",
+                        "SET default_null_order = 'nulls_first_on_asc_last_on_desc'"):
+            try:
+                self.duck.execute(setting)
+            except duckdb.Error:
+                pass
+        if threads:
+            self.duck.execute(f"SET threads = {int(threads)}")
+
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            frame = pd.read_sql_query(f'SELECT * FROM "{table}"', conn)
+            self.duck.register("_import_frame", frame)
+            self.duck.execute(f'CREATE TABLE "{table}" AS SELECT * FROM _import_frame')
+            self.duck.unregister("_import_frame")
+
+    def iter_batches(self, sql, budget=None, batch_size=FETCH_BATCH_SIZE):
+        timer = None
+        if budget and budget.max_seconds is not None:
+            timer = threading.Timer(budget.max_seconds, self.duck.interrupt)
+            timer.daemon = True
+            timer.start()
+        try:
+            cursor = self.duck.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [tuple(normalize_value(v) for v in row) for row in rows]
+        except self._interrupted as e:
+            raise QueryTimeout(f"Query cancelled: exceeded {budget.max_seconds}s wall time") from e
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def fetch_all(self, sql, budget=None):
+        rows = super().fetch_all(sql, budget)
+        if self.unordered_output and not has_order_by(sql):
+            rows.sort(key=_sort_key)
+        return rows
+
+    def close(self) -> None:
+        self.duck.close()
+
+
+def make_backend(name: str, conn: sqlite3.Connection) -> ExecutionBackend:
+    """Backend `name` ("sqlite" or "duckdb") over the data in `conn`"""
+    if name == "sqlite":
+        return SQLiteBackend(conn)
+    if name == "duckdb":
+        return DuckDBBackend(conn)
+    raise ValueError(f"Unknown execution backend: {name} (expected one of {', '.join(BACKENDS)})")
@@ -1,12 +1,38 @@
 import pandas as pd
 import sqlite3
 import os
+import io
+import csv
+import time
+import hashlib
+import argparse
+from index_advisor import apply_recommended_indexes
+from rollups import build_rollups, existing_rollups, refresh_rollups
+from storage_layout import LAYOUTS, DEFAULT_LAYOUT, migrate_to_strict, table_layout
+from db_connections import DEFAULT_DB_PATH
 
 # ==========================================
 # 1. 설정
 # ==========================================
 CSV_FILE_PATH = "data/tables/demographic_race.csv" 
-DB_FILE_PATH = "eval/my_database.db"
+DB_FILE_PATH = DEFAULT_DB_PATH
+
+# "pandas":  기존 방식 (전체 CSV를 DataFrame으로 로드, 기본값)
+# "chunked": CSV를 스트리밍으로 읽어 executemany로 삽입 (메모리 사용량 일정, --mode chunked)
+#            --incremental은 연도별로 골라 넣어야 하므로 항상 chunked 방식을 사용
+INGEST_MODE = "pandas"
+CHUNK_SIZE = 50000
+
+# "rowid":  기존 테이블 (선언 타입만, 삽입 순서대로 저장)
+# "strict": STRICT + WITHOUT ROWID, (year, zipcode) 기준 클러스터링 (storage_layout.py)
+STORAGE_LAYOUT = DEFAULT_LAYOUT
+
+# --incremental: 연도(year) 파티션별 해시를 build_manifest 테이블에 기록해 두고,
+# 다음 빌드에서는 바뀐 연도만 삭제/재삽입 (변경이 없으면 DB 파일을 건드리지 않음)
+MANIFEST_TABLE = "build_manifest"
+
+# --with_indexes: 이 워크로드 기준으로 실제로 빨라지는 인덱스만 생성
+WORKLOAD_PATH = "data/nl_sql.jsonl"
 
 # ==========================================
 # 2. 수정된 테이블 스키마 (PRIMARY KEY 제거)
@@ -31,23 +57,332 @@ CREATE TABLE IF NOT EXISTS demographics (
 );
 """
 
-def build_database():
-    if not os.path.exists(CSV_FILE_PATH):
-        print(f"❌ 오류: '{CSV_FILE_PATH}' 파일을 찾을 수 없습니다.")
+TEXT_COLUMNS = ("id", "zipcode")
+
+
+def _to_number(value):
+    # pandas 경로의 fillna(0) + astype(int)와 동일한 변환
+    value = value.strip()
+    if value == "":
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return value
+
+
+def _normalize_chunk(columns, rows):
+    zip_idx = columns.index("zipcode") if "zipcode" in columns else None
+    numeric_idx = [i for i, c in enumerate(columns) if c not in TEXT_COLUMNS]
+    for row in rows:
+        if zip_idx is not None:
+            row[zip_idx] = row[zip_idx].replace("ZCTA5", "").strip()
+        for i in numeric_idx:
+            row[i] = _to_number(row[i])
+    return rows
+
+
+def _iter_file_chunks(f, chunk_size=CHUNK_SIZE):
+    """열린 CSV 파일(또는 StringIO)에서 (컬럼 목록, 정규화된 행 chunk)를 차례로 반환"""
+    reader = csv.reader(f)
+    columns = [c.strip() for c in next(reader)]
+    chunk = []
+    for row in reader:
+        if not row:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield columns, _normalize_chunk(columns, chunk)
+            chunk = []
+    if chunk:
+        yield columns, _normalize_chunk(columns, chunk)
+
+
+def _iter_csv_chunks(csv_path, chunk_size=CHUNK_SIZE):
+    """(컬럼 목록, 정규화된 행 chunk)를 차례로 반환"""
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        yield from _iter_file_chunks(f, chunk_size)
+
+
+class PartitionHasher:
+    def __init__(self):
+        """
+        연도별 (digest, 행 수)와 CSV상의 연도 순서를 chunk 단위로 누적.
+        digest는 헤더와 정규화된 행 값으로 계산하므로 컬럼 구성이 바뀌면 모든 연도가 바뀐 것으로 본다.
+        적재 루프에 끼워 넣으면 CSV를 다시 읽지 않고 build_manifest를 채울 수 있다.
+        """
+        self.hashes, self.counts, self.order = {}, {}, []
+        self.contiguous = True
+
+    def add(self, columns, chunk):
+        year_idx = columns.index("year")
+        for row in chunk:
+            year = row[year_idx]
+            if year not in self.hashes:
+                self.hashes[year] = hashlib.sha256(repr(columns).encode("utf-8"))
+                self.counts[year] = 0
+                self.order.append(year)
+            elif self.order[-1] != year:
+                self.contiguous = False
+            self.hashes[year].update(repr(row).encode("utf-8") + b"\n")
+            self.counts[year] += 1
+
+    def result(self):
+        """(partitions, order); 연도의 행들이 CSV 안에서 연속되지 않으면 order는 None"""
+        partitions = {year: (h.hexdigest(), self.counts[year]) for year, h in self.hashes.items()}
+        return partitions, (self.order if self.contiguous else None)
+
+
+def ingest_csv_chunked(conn, csv_path, chunk_size=CHUNK_SIZE, years=None, hasher=None, commit=True):
+    """
+    CSV를 chunk 단위로 스트리밍하여 단일 트랜잭션으로 삽입하고 삽입 행 수를 반환
+    (years가 주어지면 해당 연도의 행만 삽입, hasher가 주어지면 같은 패스에서 연도별 digest 누적).
+    commit=False이면 호출자가 열어 둔 트랜잭션 안에서 삽입만 하고 커밋/롤백은 호출자에게 맡긴다.
+    """
+    cursor = conn.cursor()
+    if commit:
+        # 대량 적재용 PRAGMA (적재 중에는 내구성보다 속도 우선).
+        # 호출자의 트랜잭션 안에서는 롤백이 가능해야 하므로 저널을 그대로 둔다.
+        cursor.execute("PRAGMA synchronous = OFF;")
+        cursor.execute("PRAGMA journal_mode = MEMORY;")
+    cursor.execute("PRAGMA temp_store = MEMORY;")
+    cursor.execute("PRAGMA cache_size = -200000;")
+
+    start = time.perf_counter()
+    total = 0
+    if commit:
+        cursor.execute("BEGIN")
+    try:
+        for columns, chunk in _iter_csv_chunks(csv_path, chunk_size):
+            if hasher is not None:
+                hasher.add(columns, chunk)
+            if years is not None:
+                year_idx = columns.index("year")
+                chunk = [row for row in chunk if row[year_idx] in years]
+                if not chunk:
+                    continue
+            placeholders = ", ".join("?" for _ in columns)
+            cursor.executemany(f"INSERT INTO demographics ({', '.join(columns)}) VALUES ({placeholders})", chunk)
+            total += len(chunk)
+            if len(chunk) >= chunk_size:
+                print(f"   -> {total}개 행 삽입됨...")
+        if commit:
+            conn.commit()
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"   -> {total}개 행, {elapsed:.2f}초 ({rate:,.0f} rows/sec)")
+    return total
+
+
+def scan_csv_partitions(csv_path, chunk_size=CHUNK_SIZE):
+    """
+    CSV를 한 번 읽어 연도별 (digest, 행 수)와 CSV상의 연도 순서를 반환 (PartitionHasher 참고).
+    """
+    hasher = PartitionHasher()
+    for columns, chunk in _iter_csv_chunks(csv_path, chunk_size):
+        hasher.add(columns, chunk)
+    return hasher.result()
+
+
+def _read_manifest(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (MANIFEST_TABLE,)).fetchone()
+    if not exists:
+        return None
+    rows = conn.execute(f"SELECT year, digest, row_count FROM {MANIFEST_TABLE} ORDER BY position").fetchall()
+    return {year: (digest, count) for year, digest, count in rows}
+
+
+def _write_manifest(conn, source, partitions, order, commit=True):
+    """
+    연도별 digest, 행 수, 행 범위(rowid 레이아웃일 때 첫/마지막 rowid)를 기록
+    (commit=False이면 호출자의 트랜잭션에 포함)
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            year INTEGER PRIMARY KEY,
+            position INTEGER,
+            source TEXT,
+            digest TEXT,
+            row_count INTEGER,
+            first_rowid INTEGER,
+            last_rowid INTEGER,
+            built_at TEXT
+        )""")
+    conn.execute(f"DELETE FROM {MANIFEST_TABLE}")
+    with_rowid = table_layout(conn) == "rowid"
+    built_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    for position, year in enumerate(order or sorted(partitions)):
+        digest, count = partitions[year]
+        first, last = conn.execute(
+            "SELECT MIN(rowid), MAX(rowid) FROM demographics WHERE year = ?", (year,)).fetchone() if with_rowid else (None, None)
+        conn.execute(f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (year, position, os.path.abspath(source), digest, count, first, last, built_at))
+    if commit:
+        conn.commit()
+
+
+def _years_to_reload(manifest, partitions, order, layout):
+    """
+    다시 적재할 연도 목록 (없으면 빈 리스트, 전체 재빌드가 필요하면 None).
+
+    strict 레이아웃은 (year, zipcode) 순서로 저장되므로 바뀐 연도만 교체하면 된다.
+    rowid 레이아웃은 저장 순서가 CSV 순서와 같아야 전체 재빌드와 같은 결과
+    (ORDER BY 동점 순서 포함)가 나오므로, 처음 바뀐 연도부터 끝까지 다시 적재한다.
+    """
+    if layout == "strict":
+        return sorted(y for y in set(manifest) | set(partitions) if manifest.get(y) != partitions.get(y))
+    if order is None:
+        return None
+    old_order = list(manifest)
+    keep = 0
+    while keep < min(len(old_order), len(order)) and old_order[keep] == order[keep] \
+            and manifest[order[keep]] == partitions[order[keep]]:
+        keep += 1
+    return old_order[keep:] + [y for y in order[keep:] if y not in old_order[keep:]]
+
+
+def update_database(chunk_size=CHUNK_SIZE, with_indexes=False, with_rollups=False,
+                    layout=STORAGE_LAYOUT, csv_path=CSV_FILE_PATH, db_path=DB_FILE_PATH):
+    """
+    build_manifest를 기준으로 바뀐 연도 파티션만 반영 (추가/교체/삭제).
+    테이블이나 manifest가 없거나 레이아웃이 다르면 전체 재빌드.
+    """
+    if not os.path.exists(csv_path):
+        print(f"❌ 오류: '{csv_path}' 파일을 찾을 수 없습니다.")
         return
 
-    print(f"📂 '{CSV_FILE_PATH}' 파일을 읽는 중...")
+    print(f"📂 '{csv_path}' 파일의 연도별 해시 계산 중...")
+    partitions, order = scan_csv_partitions(csv_path, chunk_size)
+
+    manifest = None
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'demographics'").fetchone() \
+                    and table_layout(conn) == layout:
+                manifest = _read_manifest(conn)
+        finally:
+            conn.close()
+    years = _years_to_reload(manifest, partitions, order, layout) if manifest is not None else None
+    if years is None:
+        print("ℹ️ 이전 빌드 정보가 없거나 재사용할 수 없어 전체 재빌드합니다.")
+        build_database("chunked", chunk_size, with_indexes, with_rollups, layout, csv_path, db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        missing_indexes = with_indexes and not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = 'demographics' AND sql IS NOT NULL").fetchone()
+        missing_rollups = with_rollups and not existing_rollups(conn)
+        if not years and not missing_indexes and not missing_rollups:
+            print("✅ 변경된 연도가 없습니다. DB를 그대로 둡니다.")
+            return
+
+        if years:
+            removed = [y for y in years if y not in partitions]
+            print(f"🔁 다시 적재할 연도: {', '.join(map(str, sorted(years)))}" + (f" (삭제: {', '.join(map(str, removed))})" if removed else ""))
+            # 삭제, 재적재, 집계 갱신, manifest 기록을 한 트랜잭션으로 처리:
+            # 중간에 실패하면 DB와 manifest 모두 이전 상태로 남는다.
+            marks = ", ".join("?" for _ in years)
+            try:
+                conn.execute(f"DELETE FROM demographics WHERE year IN ({marks})", years)
+                total = ingest_csv_chunked(conn, csv_path, chunk_size, years=set(years) & set(partitions), commit=False)
+                print(f"   -> {total}개 행 다시 적재됨")
+                if existing_rollups(conn):
+                    refresh_rollups(conn, years, commit=False)
+                    print("   -> 바뀐 연도의 집계(rollup) 테이블 갱신")
+                _write_manifest(conn, csv_path, partitions, order, commit=False)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            # 인덱스는 삽입/삭제 시 SQLite가 갱신하므로 통계만 다시 수집
+            conn.execute("ANALYZE")
+            conn.commit()
+        if missing_indexes:
+            _create_workload_indexes(conn)
+        if missing_rollups:
+            _create_rollups(conn)
+        print(f"\n🎉 증분 빌드 완료: {len(partitions) - len(set(years) & set(partitions))}개 연도는 그대로 유지")
+    finally:
+        conn.close()
+
+
+def _create_workload_indexes(conn):
+    if not os.path.exists(WORKLOAD_PATH):
+        print(f"⚠️ '{WORKLOAD_PATH}' 파일이 없어 인덱스 생성을 건너뜁니다.")
+        return
+    print(f"🔎 '{WORKLOAD_PATH}' 워크로드 기준으로 인덱스 분석 중...")
+    names = apply_recommended_indexes(conn, WORKLOAD_PATH)
+    for name in names:
+        print(f"   -> 인덱스 생성: {name}")
+    print(f"✅ 인덱스 {len(names)}개 생성 완료")
+
+
+def _apply_layout(conn, layout):
+    if layout != "strict":
+        return
+    total = migrate_to_strict(conn)
+    print(f"✅ STRICT / WITHOUT ROWID 레이아웃으로 변환 완료 ({total}개 행, (year, zipcode) 클러스터링)")
+
+
+def _create_rollups(conn):
+    # 연도/우편번호/(연도, 우편번호)별 집계 테이블 (evaluation.py가 자동으로 사용)
+    for name in build_rollups(conn):
+        print(f"   -> 집계 테이블 생성: {name}")
+    print("✅ 집계(rollup) 테이블 생성 완료")
+
+
+def build_database(mode=INGEST_MODE, chunk_size=CHUNK_SIZE, with_indexes=False, with_rollups=False,
+                   layout=STORAGE_LAYOUT, csv_path=CSV_FILE_PATH, db_path=DB_FILE_PATH):
+    if not os.path.exists(csv_path):
+        print(f"❌ 오류: '{csv_path}' 파일을 찾을 수 없습니다.")
+        return
+
+    print(f"📂 '{csv_path}' 파일을 읽는 중...")
     
-    conn = sqlite3.connect(DB_FILE_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     # 기존 테이블 삭제 후 재생성
     cursor.execute("DROP TABLE IF EXISTS demographics")
+    cursor.execute(f"DROP TABLE IF EXISTS {MANIFEST_TABLE}")
     cursor.execute(create_table_sql)
     print("✅ 테이블 스키마 생성 완료 (PRIMARY KEY 제약 제거됨)")
 
+    # 연도별 digest는 적재와 같은 패스에서 계산 (CSV를 다시 읽지 않음)
+    hasher = PartitionHasher()
+    if mode == "chunked":
+        try:
+            total = ingest_csv_chunked(conn, csv_path, chunk_size, hasher=hasher)
+            _apply_layout(conn, layout)
+            if with_indexes:
+                _create_workload_indexes(conn)
+            if with_rollups or existing_rollups(conn):
+                _create_rollups(conn)
+            _write_manifest(conn, csv_path, *hasher.result())
+            print(f"\n🎉 성공! 총 {total}개 행이 저장되었습니다.")
+        except Exception as e:
+            print(f"❌ 데이터 처리 중 오류 발생: {e}")
+        finally:
+            conn.close()
+        return
+
     try:
-        df = pd.read_csv(CSV_FILE_PATH)
+        # 파일은 한 번만 읽고, 같은 내용으로 DataFrame과 연도별 digest를 만든다
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            text = f.read()
+        for columns, chunk in _iter_file_chunks(io.StringIO(text), chunk_size):
+            hasher.add(columns, chunk)
+        df = pd.read_csv(io.StringIO(text))
+        del text
         df.columns = [c.strip() for c in df.columns]
         
         # 1. Zipcode 정제
@@ -72,6 +407,12 @@ def build_database():
         df.to_sql("demographics", conn, if_exists="append", index=False)
         
         conn.commit()
+        _apply_layout(conn, layout)
+        if with_indexes:
+            _create_workload_indexes(conn)
+        if with_rollups or existing_rollups(conn):
+            _create_rollups(conn)
+        _write_manifest(conn, csv_path, *hasher.result())
         print(f"\n🎉 성공! 총 {len(df)}개 행이 저장되었습니다.")
 
     except Exception as e:
@@ -80,4 +421,17 @@ def build_database():
         conn.close()
 
 if __name__ == "__main__":
-    build_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["chunked", "pandas"], default=INGEST_MODE, help="CSV ingest mode")
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE, help="Rows per executemany batch (chunked mode)")
+    parser.add_argument("--with_indexes", action="store_true", help="Create indexes recommended by index_advisor.py")
+    parser.add_argument("--with_rollups", action="store_true", help="Build by-year/by-zipcode aggregate tables (see rollups.py)")
+    parser.add_argument("--layout", choices=LAYOUTS, default=STORAGE_LAYOUT, help="Table storage layout (see storage_layout.py)")
+    parser.add_argument("--csv", type=str, default=CSV_FILE_PATH, help="Input CSV (e.g. from synthetic_data.py)")
+    parser.add_argument("--db", type=str, default=DB_FILE_PATH, help="SQLite database to (re)build")
+    parser.add_argument("--incremental", action="store_true", help="Reload only the years whose CSV rows changed (see build_manifest)")
+    args = parser.parse_args()
+    if args.incremental:
+        update_database(args.chunk_size, args.with_indexes, args.with_rollups, args.layout, args.csv, args.db)
+    else:
+        build_database(args.mode, args.chunk_size, args.with_indexes, args.with_rollups, args.layout, args.csv, args.db)
\ No newline at end of file
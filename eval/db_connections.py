@@ -0,0 +1,152 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# Demographics DB used by every eval/validation entry point (run from the
+# repo root).
+DEFAULT_DB_PATH = "my_database.db"
+
+# Shared SQLite tuning for every eval/validation entry point.
+MMAP_SIZE = 256 << 20
+# Negative cache_size is in KiB (64 MiB page cache per connection).
+CACHE_SIZE_KIB = 64 << 10
+# Compiled statements kept per connection. The sqlite3 default (128) is
+# smaller than the number of distinct queries in one eval run, so repeated
+# gold queries would be re-prepared.
+CACHED_STATEMENTS = 1024
+
+POOL_SIZE = 8
+
+
+def tune_connection(conn: sqlite3.Connection, mmap_size: int = MMAP_SIZE) -> sqlite3.Connection:
+    """Apply the shared read-side PRAGMAs to `conn`"""
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def open_readonly(db_path: str, immutable: bool = False, check_same_thread: bool = True,
+                  mmap_size: Optional[int] = None) -> sqlite3.Connection:
+    """
+    Open `db_path` read-only with the shared tuning.
+
+    Args:
+        db_path (str): SQLite database file
+        immutable (bool): Promise the file never changes while open, which
+            lets SQLite skip locking entirely (safe for content-addressed images)
+        check_same_thread (bool): Passed through to sqlite3.connect
+        mmap_size (int): Bytes to memory-map (default: the file, up to MMAP_SIZE)
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database not found: {db_path}")
+    uri = "file:" + os.path.abspath(db_path) + "?mode=ro" + ("&immutable=1" if immutable else "")
+    conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS,
+                           check_same_thread=check_same_thread)
+    if mmap_size is None:
+        mmap_size = min(MMAP_SIZE, os.path.getsize(db_path))
+    tune_connection(conn, mmap_size)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def open_memory(image: Optional[bytes] = None) -> sqlite3.Connection:
+    """In-memory database with the shared tuning, optionally loaded from a serialized image"""
+    conn = sqlite3.connect(":memory:", cached_statements=CACHED_STATEMENTS)
+    if image is not None:
+        conn.deserialize(image)
+    tune_connection(conn)
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str, max_size: int = POOL_SIZE, immutable: bool = False):
+        """
+        Pool of read-only connections to one database file.
+
+        Connections are created on demand up to `max_size`; acquire() blocks
+        once they are all in use. local() hands each thread its own
+        connection for the lifetime of the pool.
+
+        Args:
+            db_path (str): SQLite database file
+            max_size (int): Maximum number of pooled connections
+            immutable (bool): Open with immutable=1 (see open_readonly)
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.immutable = immutable
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._all = []
+
+    def _open(self) -> sqlite3.Connection:
+        conn = open_readonly(self.db_path, self.immutable, check_same_thread=False)
+        self._all.append(conn)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                return self._open()
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection for the duration of a with-block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def local(self) -> sqlite3.Connection:
+        """This thread's own connection (opened on first use, outside the pool bound)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._local.conn = self._open()
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+            self._created = 0
+            self._idle = queue.LifoQueue()
+            self._local = threading.local()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """Process-wide pool for `db_path` (one per absolute path)"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, **kwargs)
+        return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
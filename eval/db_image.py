@@ -0,0 +1,112 @@
+import os
+import glob
+import json
+import sqlite3
+import hashlib
+from typing import Optional
+from db_connections import open_memory, open_readonly
+
+# "mmap": open the image read-only with immutable=1 and memory-map it, so
+# startup does not touch the pages at all. "deserialize": load the image
+# into a private, writable in-memory database.
+IMAGE_LOAD_MODE = "mmap"
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def _file_stamp(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatabaseImage:
+    def __init__(self, db_path: str):
+        """
+        Compact, content-addressed snapshot of an SQLite database file.
+
+        The image is written once with VACUUM INTO next to the DB
+        (`<name>.<hash>.image`) and reused until the DB content changes. The
+        DB's stat and hash are kept in a `<db>.image.json` sidecar, so an
+        unchanged DB costs one stat() instead of a re-hash.
+
+        Args:
+            db_path (str): Path to the source SQLite database
+        """
+        self.db_path = db_path
+        self.sidecar_path = db_path + ".image.json"
+        self.digest = None
+        self.image_path = None
+        self._prepare()
+
+    def _image_path_for(self, digest: str) -> str:
+        stem = os.path.splitext(self.db_path)[0]
+        return f"{stem}.{digest[:16]}.image"
+
+    def _read_sidecar(self) -> Optional[dict]:
+        try:
+            with open(self.sidecar_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prepare(self) -> None:
+        stamp = _file_stamp(self.db_path)
+        sidecar = self._read_sidecar()
+        if sidecar and sidecar.get("stamp") == stamp:
+            digest = sidecar["digest"]
+        else:
+            digest = file_digest(self.db_path)
+
+        image_path = self._image_path_for(digest)
+        if not os.path.exists(image_path):
+            self._build(image_path)
+
+        if not sidecar or sidecar.get("stamp") != stamp or sidecar.get("digest") != digest:
+            tmp_path = self.sidecar_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stamp": stamp, "digest": digest, "image": os.path.basename(image_path)}, f)
+            os.replace(tmp_path, self.sidecar_path)
+
+        self.digest = digest
+        self.image_path = image_path
+
+    def _build(self, image_path: str) -> None:
+        # Drop images of older DB versions; each one is a full copy.
+        stem = os.path.splitext(self.db_path)[0]
+        for stale in glob.glob(glob.escape(stem) + ".*.image"):
+            os.remove(stale)
+
+        tmp_path = image_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        src = sqlite3.connect(self.db_path)
+        try:
+            src.execute("VACUUM INTO ?", (tmp_path,))
+        finally:
+            src.close()
+        # Images are never modified in place, which is what makes opening
+        # them with immutable=1 safe.
+        os.replace(tmp_path, image_path)
+
+    def read_bytes(self) -> bytes:
+        with open(self.image_path, "rb") as f:
+            return f.read()
+
+    def connect(self, mode: str = IMAGE_LOAD_MODE) -> sqlite3.Connection:
+        """Open a read-only connection (mmap) or private in-memory copy (deserialize)"""
+        if mode == "mmap":
+            return open_readonly(self.image_path, immutable=True, mmap_size=os.path.getsize(self.image_path))
+        if mode == "deserialize":
+            if not hasattr(sqlite3.Connection, "deserialize"):
+                raise RuntimeError("deserialize mode requires sqlite3 deserialize() (Python 3.11+)")
+            return open_memory(self.read_bytes())
+        raise ValueError(f"Unknown image load mode: {mode}")
@@ -0,0 +1,65 @@
+from typing import Dict, Optional, Tuple
+
+# Myers/Hyyrö bit-parallel Levenshtein distance. Python ints are arbitrary
+# precision, so a whole DP column lives in one integer regardless of length
+# and each character of the text costs a handful of word operations instead
+# of a row of the (m+1)x(n+1) table.
+
+
+def build_peq(pattern: str) -> Tuple[Dict[str, int], int]:
+    """Per-character match bitmasks for `pattern`, plus its length"""
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    return peq, len(pattern)
+
+
+def distance_with_peq(peq: Dict[str, int], m: int, text: str, max_distance: Optional[int] = None) -> int:
+    """
+    Levenshtein distance between a preprocessed pattern and `text`.
+
+    With `max_distance`, returns max_distance + 1 as soon as the distance
+    is known to exceed it.
+    """
+    n = len(text)
+    if max_distance is not None and abs(m - n) > max_distance:
+        return max_distance + 1
+    if m == 0:
+        return n
+
+    mask = (1 << m) - 1
+    high_bit = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+
+    for j, ch in enumerate(text, 1):
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high_bit:
+            score += 1
+        elif mh & high_bit:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+        # The remaining n - j characters can lower the score by at most one each.
+        if max_distance is not None and score - (n - j) > max_distance:
+            return max_distance + 1
+
+    return score
+
+
+def levenshtein(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """Levenshtein distance between two strings (bounded if max_distance is set)"""
+    if s1 == s2:
+        return 0
+    # The shorter string becomes the bit vector.
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    peq, m = build_peq(s1)
+    return distance_with_peq(peq, m, s2, max_distance)
@@ -1,11 +1,23 @@
 import pandas as pd
 import sqlite3
-import json
 import os
 from datetime import datetime
 import subprocess
+from collections import deque
+from gold_plan_index import GoldPlanIndex
+from gold_cache import GoldResultCache, GOLD_CACHE_PATH
+from db_image import DatabaseImage, IMAGE_LOAD_MODE
+from db_connections import DEFAULT_DB_PATH
+from result_digest import digest_rows, has_order_by, normalize_sql
+from execution_memo import ExecutionMemo
+from results_sink import ResultsSink, render_record, render_text_log
+from jsonl_io import JSONLReader
+from parallel_eval import run_cases
+from query_budget import QueryBudget, QueryTimeout
+from rollups import RollupRewriter
+from backends import DEFAULT_BACKEND, SQLiteBackend, make_backend
 
-DB_CACHE_PATH = "my_database.db"
+DB_CACHE_PATH = DEFAULT_DB_PATH
 
 CSV_PATH = "data/tables/demographic_race.csv"
 
@@ -15,177 +27,287 @@ JSONL_PATH = "data/eval_ready/nl_to_sql_v3.jsonl"
 
 LOG_DIR = "eval/results"
 
+# Reuse gold query fingerprints across runs; only pred_sql is executed on a hit.
+USE_GOLD_CACHE = True
+
+# Number of worker processes, each with its own in-memory DB replica (0 = serial).
+PARALLEL_WORKERS = 0
+
+# Per-query execution budget; queries over either limit are cancelled and
+# reported as TIMEOUT (None = unbounded).
+QUERY_TIMEOUT_SEC = 30
+QUERY_MAX_VM_STEPS = None
+
+# Run-scoped LRU memo of query outcomes keyed on normalized SQL, so repeated
+# predictions (and predictions identical to their gold) run once (0 = off).
+EXEC_MEMO_ENTRIES = 4096
+
+# Answer aggregate queries from the rollup tables (createDB.py --with_rollups)
+# when the rewrite is provably equivalent; a no-op if the DB has none.
+USE_ROLLUP_REWRITE = True
+
+# Query engine: "sqlite", or "duckdb" for a columnar copy of the DB (faster
+# GROUP BY/SUM on large tables; requires the duckdb package).
+EXECUTION_BACKEND = DEFAULT_BACKEND
+
+# Per-case records always go to eval_results_<ts>.jsonl. QUIET prints only
+# the summary; WRITE_TEXT_LOG also renders the classic text log afterwards.
+QUIET = False
+WRITE_TEXT_LOG = True
+
+
+def _build_database_from_csv(csv_path):
+    # Last resort when createDB.py did not produce a DB.
+    conn = sqlite3.connect(DB_CACHE_PATH)
+    try:
+        df = pd.read_csv(csv_path)
+        df.columns = [c.strip().replace(" ", "_").replace("-", "_") for c in df.columns]
+        df.to_sql("demographics", conn, if_exists="replace", index=False)
+    finally:
+        conn.close()
 
 def setup_database(csv_path):
+    """
+    Open the evaluation DB through its cached image (see db_image.py).
+    Returns (conn, image), or (None, None) if no DB could be built.
+    """
     print(f"Loading CSV from: {csv_path}...")
     if os.path.exists(DB_CACHE_PATH):
-        try:
-            print(f"Using existing DB at {DB_CACHE_PATH}")
-            conn = sqlite3.connect(DB_CACHE_PATH)
-            # PRAGMA optimizations
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA synchronous = OFF;")
-            cursor.execute("PRAGMA journal_mode = MEMORY;")
-            cursor.execute("PRAGMA temp_store = MEMORY;")
-            cursor.execute("PRAGMA locking_mode = EXCLUSIVE;")
-            # Move on-disk DB to in-memory DB for speed
-            mem_conn = sqlite3.connect(":memory:")
-            conn.backup(mem_conn)
-            conn.close()
-            return mem_conn
-        except Exception as e:
-            print(f"Failed to load existing DB ({e}), rebuilding from createDB.py...")
+        print(f"Using existing DB at {DB_CACHE_PATH}")
     else:
         print("DB not found. Running createDB.py to build DB...")
-        subprocess.run(["python3", "createDB.py"], check=False)
-
-        if os.path.exists(DB_CACHE_PATH):
+        subprocess.run(["python3", os.path.join(os.path.dirname(os.path.abspath(__file__)), "createDB.py"),
+                        "--csv", csv_path, "--db", DB_CACHE_PATH], check=False)
+        if not os.path.exists(DB_CACHE_PATH):
+            print("createDB.py did not produce a DB. Falling back to internal build...")
             try:
-                conn = sqlite3.connect(DB_CACHE_PATH)
-                # PRAGMA optimizations
-                cursor = conn.cursor()
-                cursor.execute("PRAGMA synchronous = OFF;")
-                cursor.execute("PRAGMA journal_mode = MEMORY;")
-                cursor.execute("PRAGMA temp_store = MEMORY;")
-                cursor.execute("PRAGMA locking_mode = EXCLUSIVE;")
-                print("DB successfully built and loaded.")
-                # Move on-disk DB to in-memory DB for speed
-                mem_conn = sqlite3.connect(":memory:")
-                conn.backup(mem_conn)
-                conn.close()
-                return mem_conn
+                _build_database_from_csv(csv_path)
             except Exception as e:
-                print(f"DB built but failed to load: {e}. Falling back to internal build...")
+                print(f"DB Setup Failed: {e}")
+                return None, None
+
     try:
-        conn = sqlite3.connect("my_database.db")
-        # PRAGMA optimizations
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA synchronous = OFF;")
-        cursor.execute("PRAGMA journal_mode = MEMORY;")
-        cursor.execute("PRAGMA temp_store = MEMORY;")
-        cursor.execute("PRAGMA locking_mode = EXCLUSIVE;")
-        df = pd.read_csv(csv_path)
-        df.columns = [c.strip().replace(" ", "_").replace("-", "_") for c in df.columns]
-        df.to_sql("demographics", conn, if_exists="replace", index=False)
-        mem_conn = sqlite3.connect(":memory:")
-        conn.backup(mem_conn)
-        conn.close()
-        return mem_conn
+        image = DatabaseImage(DB_CACHE_PATH)
+        return image.connect(IMAGE_LOAD_MODE), image
     except Exception as e:
         print(f"DB Setup Failed: {e}")
-        return None
+        return None, None
+
+def _digest(backend, sql, ordered, budget, rewriter):
+    rewritten = rewriter.rewrite(sql) if rewriter else None
+    if rewritten is not None:
+        try:
+            return digest_rows(backend.iter_batches(rewritten, budget), ordered)
+        except backend.Error:
+            pass
+    return digest_rows(backend.iter_batches(sql, budget), ordered)
 
-def execute_and_compare(conn, pred_sql, gold_sql):
-    cursor = conn.cursor()
+def _digest_memoized(backend, sql, ordered, budget, memo, result, rewriter=None):
+    # Memo hits are counted in result["memo_hits"], including memoized
+    # errors, which are counted before being raised again.
+    if memo is None:
+        return _digest(backend, sql, ordered, budget, rewriter)
+
+    key = (normalize_sql(sql), ordered)
+    hit = memo.get(key)
+    if hit is not None:
+        result["memo_hits"] += 1
+        if isinstance(hit, Exception):
+            raise hit.with_traceback(None)
+        return hit
+
+    try:
+        digest = _digest(backend, sql, ordered, budget, rewriter)
+    except Exception as e:
+        memo.put(key, e)
+        raise
+    memo.put(key, digest)
+    return digest
+
+def execute_and_compare(conn, pred_sql, gold_sql, gold_entry=None, budget=None, memo=None, rewriter=None,
+                        backend=None):
     result = {
         "pred_res": None,
         "gold_res": None,
+        "pred_row_count": None,
+        "gold_cached": False,
+        "gold_fingerprint": None,
+        "gold_row_count": None,
+        "memo_hits": 0,
         "error": None,
         "match": False,
         "status": "FAIL"
     }
 
+    if backend is None:
+        backend = SQLiteBackend(conn)
+
     try:
-        cursor.execute(pred_sql)
-        pred_res = cursor.fetchall()
-        result["pred_res"] = pred_res
+        # Bag semantics: duplicates must match; row order only matters when
+        # the gold query asks for it.
+        ordered = has_order_by(gold_sql)
+        pred_digest = _digest_memoized(backend, pred_sql, ordered, budget, memo, result, rewriter)
+        result["pred_res"] = pred_digest.preview
+        result["pred_row_count"] = pred_digest.row_count
 
-        cursor.execute(gold_sql)
-        gold_res = cursor.fetchall()
-        result["gold_res"] = gold_res
+        if gold_entry:
+            gold_fp, result["gold_row_count"] = gold_entry
+            result["gold_cached"] = True
+        else:
+            gold_digest = _digest_memoized(backend, gold_sql, ordered, budget, memo, result, rewriter)
+            result["gold_res"] = gold_digest.preview
+            result["gold_row_count"] = gold_digest.row_count
+            result["gold_fingerprint"] = gold_fp = gold_digest.fingerprint
 
-        if set(pred_res) == set(gold_res):
+        if pred_digest.fingerprint == gold_fp:
             result["match"] = True
             result["status"] = "PASS"
             
+    except QueryTimeout as e:
+        result["error"] = str(e)
+        result["status"] = "TIMEOUT"
     except Exception as e:
         result["error"] = str(e)
         result["status"] = "ERROR"
 
     return result
 
+class _CaseEvaluator:
+    # Picklable case runner. Each pool worker gets its own copy, so the
+    # memo and rollup rewriter are created lazily and live for the rest of
+    # the run.
+    def __init__(self, budget, memo_entries, use_rollups=False, backend_name=DEFAULT_BACKEND):
+        self.budget = budget
+        self.memo_entries = memo_entries
+        self.use_rollups = use_rollups
+        self.backend_name = backend_name
+        self.memo = None
+        self.rewriter = None
+        self.backend = None
+
+    def __call__(self, conn, case):
+        if self.memo is None and self.memo_entries:
+            self.memo = ExecutionMemo(self.memo_entries)
+        if self.rewriter is None and self.use_rollups:
+            self.rewriter = RollupRewriter(conn)
+        if self.backend is None:
+            self.backend = make_backend(self.backend_name, conn)
+        pred_sql, gold_sql, gold_entry = case
+        return execute_and_compare(conn, pred_sql, gold_sql, gold_entry, self.budget, self.memo, self.rewriter,
+                                   self.backend)
+
+    def __getstate__(self):
+        # Backends hold live connections; workers build their own.
+        state = self.__dict__.copy()
+        state["backend"] = None
+        return state
+
 def run_batch_evaluation():
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_filename = f"{LOG_DIR}/eval_log_{timestamp}.txt"
+    results_filename = f"{LOG_DIR}/eval_results_{timestamp}.jsonl"
     
-    conn = setup_database(CSV_PATH)
+    conn, image = setup_database(CSV_PATH)
     if not conn:
         return
 
+    gold_cache = None
+    if USE_GOLD_CACHE:
+        # Tie order and float rounding can differ between engines, so each
+        # backend keeps its own gold fingerprints.
+        cache_key = image.digest if EXECUTION_BACKEND == "sqlite" else f"{image.digest}:{EXECUTION_BACKEND}"
+        gold_cache = GoldResultCache(cache_key, GOLD_CACHE_PATH)
+
+    gold_plans = GoldPlanIndex()
+    budget = QueryBudget(QUERY_TIMEOUT_SEC, QUERY_MAX_VM_STEPS)
+
     print(f"Starting Evaluation on {JSONL_PATH}...")
-    print(f"Logging to: {log_filename}\n")
+    print(f"Writing results to: {results_filename}\n")
 
     total_cnt = 0
     pass_cnt = 0
     error_cnt = 0
+    timeout_cnt = 0
+    memo_hit_cnt = 0
 
-    with open(JSONL_PATH, "r", encoding="utf-8") as f_in, \
-         open(log_filename, "w", encoding="utf-8") as f_log:
+    reader = JSONLReader(JSONL_PATH)
+    with ResultsSink(results_filename) as sink:
 
-        def log(msg):
-            print(msg)
-            f_log.write(msg + "\n")
+        def emit(record):
+            sink.write(record)
+            if not QUIET:
+                for msg in render_record(record):
+                    print(msg)
 
-        for line_idx, line in enumerate(f_in, 1):
-            line = line.strip()
-            if not line: continue
-            
-            try:
-                data = json.loads(line)
-                nl = data.get("nl", "")
-                pred_sql = data.get("pred_sql", "")
+        # Records stream through once: the case generator queues every line
+        # it reads in `pending`, and each result is paired with the queued
+        # record it belongs to, so the input is never held in memory.
+        pending = deque()
+
+        def iter_cases():
+            for line_idx, data in reader.iter_records(keep_errors=True):
+                pending.append((line_idx, data))
+                if data is None: continue
                 gold_sql = data.get("gold_sql", "")
-                json_pred = data.get("json_pred", "(No JSON Pred)")
-                
-                gold_json = "(No Gold JSON)"
-                merged_path = os.path.join("data", "merged_dataset.jsonl")
-                try:
-                    with open(merged_path, "r", encoding="utf-8") as mf:
-                        for mline in mf:
-                            mline = mline.strip()
-                            if not mline:
-                                continue
-                            mitem = json.loads(mline)
-                            if mitem.get("nl", "") == nl:
-                                if "json_plan" in mitem:
-                                    gold_json = mitem["json_plan"]
-                                break
-                except:
-                    gold_json = "(Load Error)"
-                
-
-                total_cnt += 1
-                
-                res = execute_and_compare(conn, pred_sql, gold_sql)
-                if res["match"]:
-                    pass_cnt += 1
-                if res["status"] == "ERROR":
-                    error_cnt += 1
-
-                log(f"[" + "="*20 + f" Test Case #{line_idx} " + "="*20 + "]")
-                log(f"Question: {nl}")
-                log(f"Pred SQL:  {pred_sql}")
-                log(f"Gold SQL:  {gold_sql}")
-                
-                if res["error"]:
-                    log(f"Execution Error: {res['error']}")
-                else:
-                    p_res_str = str(res['pred_res'])
-                    g_res_str = str(res['gold_res'])
-                    if len(p_res_str) > 200: p_res_str = p_res_str[:200] + "... (truncated)"
-                    if len(g_res_str) > 200: g_res_str = g_res_str[:200] + "... (truncated)"
-                    
-                    log(f"Pred DB Result: {p_res_str}")
-                    log(f"Gold DB Result: {g_res_str}")
-                
-                status_icon = "MATCH" if res["match"] else "X"
-                log(f"result: {status_icon} {res['status']}\n")
-
-            except json.JSONDecodeError:
-                log(f"JSON Parsing Error on line {line_idx}\n")
+                gold_entry = gold_cache.get(gold_sql) if gold_cache else None
+                yield (data.get("pred_sql", ""), gold_sql, gold_entry)
+
+        def iter_records():
+            for res in run_cases(conn, _CaseEvaluator(budget, EXEC_MEMO_ENTRIES, USE_ROLLUP_REWRITE, EXECUTION_BACKEND), iter_cases(), PARALLEL_WORKERS, image):
+                line_idx, data = pending.popleft()
+                while data is None:
+                    yield line_idx, None, None
+                    line_idx, data = pending.popleft()
+                yield line_idx, data, res
+            # Malformed lines after the last case
+            while pending:
+                line_idx, _ = pending.popleft()
+                yield line_idx, None, None
+
+        for line_idx, data, res in iter_records():
+            if data is None:
+                emit({"type": "parse_error", "line": line_idx})
+                continue
+
+            nl = data.get("nl", "")
+            pred_sql = data.get("pred_sql", "")
+            gold_sql = data.get("gold_sql", "")
+            gold_json = None if gold_plans.load_error else gold_plans.lookup_nl(nl)
+
+            total_cnt += 1
+
+            if gold_cache and res["gold_fingerprint"]:
+                gold_cache.put(gold_sql, res["gold_fingerprint"], res["gold_row_count"])
+            memo_hit_cnt += res["memo_hits"]
+            if res["match"]:
+                pass_cnt += 1
+            if res["status"] == "ERROR":
+                error_cnt += 1
+            if res["status"] == "TIMEOUT":
+                timeout_cnt += 1
+
+            emit({
+                "type": "case",
+                "line": line_idx,
+                "id": data.get("id"),
+                "nl": nl,
+                "pred_sql": pred_sql,
+                "gold_sql": gold_sql,
+                "json_pred": data.get("json_pred"),
+                "gold_json": gold_json,
+                "status": res["status"],
+                "match": res["match"],
+                "error": res["error"],
+                "pred_res": res["pred_res"],
+                "pred_row_count": res["pred_row_count"],
+                "gold_res": res["gold_res"],
+                "gold_row_count": res["gold_row_count"],
+                "gold_cached": res["gold_cached"],
+                "memo_hits": res["memo_hits"],
+            })
 
         accuracy = (pass_cnt / total_cnt * 100) if total_cnt > 0 else 0
         summary = [
@@ -196,13 +318,35 @@ def run_batch_evaluation():
             f"Passed:           {pass_cnt}",
             f"Failed:           {total_cnt - pass_cnt}",
             f"Errors (Syntax):  {error_cnt}",
+            f"Timeouts:         {timeout_cnt}",
             f"Execution Acc:    {accuracy:.2f}%",
-            "="*50
         ]
+        if reader.errors:
+            summary.append(f"Malformed Lines:  {reader.errors}")
+        if gold_cache:
+            summary.append(f"Gold Cache Hits:  {gold_cache.hits}/{gold_cache.hits + gold_cache.misses}")
+        if EXEC_MEMO_ENTRIES:
+            summary.append(f"Exec Memo Hits:   {memo_hit_cnt}")
+        summary.append("="*50)
         
+        sink.write({
+            "type": "summary",
+            "lines": summary,
+            "total": total_cnt,
+            "passed": pass_cnt,
+            "errors": error_cnt,
+            "timeouts": timeout_cnt,
+            "accuracy": accuracy,
+        })
         for s in summary:
-            log(s)
+            print(s)
+
+    if WRITE_TEXT_LOG:
+        render_text_log(results_filename, log_filename)
+        print(f"Text log written to: {log_filename}")
 
+    if gold_cache:
+        gold_cache.close()
     conn.close()
 
 if __name__ == "__main__":
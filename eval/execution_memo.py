@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+# Default bounds for a run-scoped memo.
+MEMO_MAX_ENTRIES = 4096
+MEMO_MAX_ROWS = 1_000_000
+
+
+class ExecutionMemo:
+    def __init__(self, max_entries: int = MEMO_MAX_ENTRIES, max_weight: Optional[int] = None):
+        """
+        LRU memo of query outcomes for the lifetime of one evaluation run.
+
+        Values are whatever the caller stores (a result digest, a row list,
+        or the exception the query raised). `max_weight` optionally bounds
+        the total weight (e.g. rows) held across all entries.
+
+        Args:
+            max_entries (int): Maximum number of memoized queries
+            max_weight (int): Optional bound on the summed entry weights
+        """
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.total_weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """Return the memoized value for `key` (None on a miss)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value, weight: int = 1) -> None:
+        """Store `value`, evicting least recently used entries over the bounds"""
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_weight -= old[1]
+        self._entries[key] = (value, weight)
+        self.total_weight += weight
+        while len(self._entries) > self.max_entries or \
+                (self.max_weight is not None and self.total_weight > self.max_weight):
+            _, (_, evicted_weight) = self._entries.popitem(last=False)
+            self.total_weight -= evicted_weight
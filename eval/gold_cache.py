@@ -0,0 +1,65 @@
+import os
+import sqlite3
+from typing import Optional, Tuple
+from result_digest import normalize_sql
+
+GOLD_CACHE_PATH = "eval/cache/gold_results.db"
+
+# Bump when the fingerprint format changes so stale entries are ignored.
+FINGERPRINT_VERSION = 2
+
+
+class GoldResultCache:
+    def __init__(self, db_digest: str, cache_path: str = GOLD_CACHE_PATH):
+        """
+        On-disk store of gold query fingerprints for one database version.
+
+        Args:
+            db_digest (str): Content hash of the demographics DB
+            cache_path (str): Path to the SQLite file backing the cache
+        """
+        self.db_digest = db_digest
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS gold_results ("
+            " sql_key TEXT NOT NULL,"
+            " db_digest TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " row_count INTEGER NOT NULL,"
+            " PRIMARY KEY (sql_key, db_digest, version))"
+        )
+
+    def get(self, gold_sql: str) -> Optional[Tuple[str, int]]:
+        """Return (fingerprint, row_count) for `gold_sql`, or None on a miss"""
+        row = self.conn.execute(
+            "SELECT fingerprint, row_count FROM gold_results"
+            " WHERE sql_key = ? AND db_digest = ? AND version = ?",
+            (normalize_sql(gold_sql), self.db_digest, FINGERPRINT_VERSION),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1]
+
+    def put(self, gold_sql: str, fingerprint: str, row_count: int) -> None:
+        """Record the fingerprint of a successfully executed gold query"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO gold_results VALUES (?, ?, ?, ?, ?)",
+            (normalize_sql(gold_sql), self.db_digest, FINGERPRINT_VERSION, fingerprint, row_count),
+        )
+
+    def close(self) -> None:
+        """Flush pending entries and close the cache file"""
+        if self.conn:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,91 @@
+import os
+import json
+from typing import Optional
+
+MERGED_DATASET_PATH = os.path.join("data", "merged_dataset.jsonl")
+GOLD_PLAN_INDEX_PATH = "eval/cache/gold_plans.json"
+
+
+class GoldPlanIndex:
+    def __init__(self, dataset_path: str = MERGED_DATASET_PATH, index_path: Optional[str] = GOLD_PLAN_INDEX_PATH):
+        """
+        In-memory id/NL -> json_plan lookup over the merged dataset.
+
+        The index is persisted to `index_path` and rebuilt only when the
+        dataset's size or mtime changes.
+
+        Args:
+            dataset_path (str): Path to the merged NL/SQL/plan JSONL file
+            index_path (str): Where to persist the index (None disables it)
+        """
+        self.dataset_path = dataset_path
+        self.index_path = index_path
+        self.by_id = {}
+        self.by_nl = {}
+        self.load_error = None
+        self.skipped_lines = 0
+        self._load()
+
+    def _source_stamp(self) -> dict:
+        st = os.stat(self.dataset_path)
+        return {"source": os.path.abspath(self.dataset_path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    def _load(self) -> None:
+        try:
+            stamp = self._source_stamp()
+        except OSError as e:
+            self.load_error = str(e)
+            return
+
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("stamp") == stamp:
+                    self.by_id = saved["by_id"]
+                    self.by_nl = saved["by_nl"]
+                    return
+            except (OSError, ValueError, KeyError):
+                pass
+
+        try:
+            self._build()
+        except OSError as e:
+            self.load_error = str(e)
+            return
+
+        if self.index_path:
+            index_dir = os.path.dirname(self.index_path)
+            if index_dir:
+                os.makedirs(index_dir, exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stamp": stamp, "by_id": self.by_id, "by_nl": self.by_nl}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+    def _build(self) -> None:
+        with open(self.dataset_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    self.skipped_lines += 1
+                    continue
+                plan = item.get("json_plan")
+                # First occurrence wins, matching the old linear scan.
+                if "id" in item:
+                    self.by_id.setdefault(str(item["id"]), plan)
+                self.by_nl.setdefault(item.get("nl", ""), plan)
+
+    def lookup_id(self, item_id, default=None):
+        """Return the gold plan for a dataset id"""
+        plan = self.by_id.get(str(item_id))
+        return default if plan is None else plan
+
+    def lookup_nl(self, nl: str, default=None):
+        """Return the gold plan for an exact NL question"""
+        plan = self.by_nl.get(nl)
+        return default if plan is None else plan
@@ -0,0 +1,244 @@
+import re
+import json
+import time
+import sqlite3
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from result_digest import normalize_sql
+from db_connections import DEFAULT_DB_PATH
+
+TABLE_NAME = "demographics"
+WORKLOAD_PATH = "data/nl_sql.jsonl"
+DB_PATH = DEFAULT_DB_PATH
+
+# Widest index the advisor will propose (key columns plus covered columns).
+MAX_INDEX_COLUMNS = 4
+
+# An index is kept only if the queries that use it get at least this much
+# faster (as a fraction of their unindexed time).
+MIN_IMPROVEMENT = 0.2
+
+_CLAUSE_END = r"(?=\bgroup\s+by\b|\border\s+by\b|\bhaving\b|\blimit\b|$)"
+_WHERE_RE = re.compile(r"\bwhere\b(.*?)" + _CLAUSE_END, re.IGNORECASE | re.DOTALL)
+_GROUP_RE = re.compile(r"\bgroup\s+by\b(.*?)(?=\border\s+by\b|\bhaving\b|\blimit\b|$)", re.IGNORECASE | re.DOTALL)
+_SELECT_RE = re.compile(r"^\s*select\b(.*?)\bfrom\b", re.IGNORECASE | re.DOTALL)
+_EQ_RE = re.compile(r"\b(\w+)\s*(?:==?|\bin\b)", re.IGNORECASE)
+_RANGE_RE = re.compile(r"\b(\w+)\s*(?:<=|>=|<>|!=|<|>|\bbetween\b|\blike\b)", re.IGNORECASE)
+_IDENT_RE = re.compile(r"\b([a-z_][a-z0-9_]*)\b", re.IGNORECASE)
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+def load_workload(path: str) -> List[str]:
+    """Distinct SQL strings from a dataset or prediction JSONL file"""
+    seen = set()
+    workload = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for key in ("sql", "gold_sql", "pred_sql"):
+                sql = row.get(key)
+                if isinstance(sql, str) and sql.strip() and normalize_sql(sql) not in seen:
+                    seen.add(normalize_sql(sql))
+                    workload.append(sql)
+    return workload
+
+
+def table_columns(conn: sqlite3.Connection, table: str = TABLE_NAME) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for `sql` (empty if it does not compile)"""
+    try:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    except sqlite3.Error:
+        return []
+
+
+def is_full_scan(plan: List[str], table: str = TABLE_NAME) -> bool:
+    # "SCAN demographics" (3.36+) / "SCAN TABLE demographics" (older), but
+    # not "SCAN demographics USING [COVERING] INDEX ...".
+    return any(re.match(rf"SCAN (TABLE )?{table}\b(?!.*USING)", detail) for detail in plan)
+
+
+def _ordered_unique(names: List[str]) -> List[str]:
+    return list(dict.fromkeys(names))
+
+
+def candidate_index(sql: str, columns: List[str], covering: bool = False) -> Optional[Tuple[str, ...]]:
+    """
+    Index key for one query: equality columns, then one range column, then
+    GROUP BY columns. With `covering`, selected columns are appended while
+    the index stays within MAX_INDEX_COLUMNS.
+    """
+    known = {c.lower(): c for c in columns}
+    text = _QUOTED_RE.sub("''", sql)
+
+    key = []
+    where = _WHERE_RE.search(text)
+    if where:
+        key += [known[c.lower()] for c in _EQ_RE.findall(where.group(1)) if c.lower() in known]
+        ranges = [known[c.lower()] for c in _RANGE_RE.findall(where.group(1)) if c.lower() in known]
+        key += [c for c in ranges if c not in key][:1]
+    group = _GROUP_RE.search(text)
+    if group:
+        key += [known[c.lower()] for c in _IDENT_RE.findall(group.group(1)) if c.lower() in known]
+    key = _ordered_unique(key)[:MAX_INDEX_COLUMNS]
+    if not key:
+        return None
+
+    if covering:
+        select = _SELECT_RE.search(text)
+        if select and "*" not in select.group(1):
+            extra = [known[c.lower()] for c in _IDENT_RE.findall(select.group(1)) if c.lower() in known]
+            covered = _ordered_unique(key + extra)
+            if len(covered) <= MAX_INDEX_COLUMNS:
+                key = covered
+    return tuple(key)
+
+
+def index_name(key: Tuple[str, ...], table: str = TABLE_NAME) -> str:
+    return f"idx_{table}_" + "_".join(key)
+
+
+def time_query(conn: sqlite3.Connection, sql: str, repeat: int = 3) -> float:
+    """Best-of-`repeat` wall time for one query (0 if it does not run)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            conn.execute(sql).fetchall()
+        except sqlite3.Error:
+            return 0.0
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_workload(conn: sqlite3.Connection, workload: List[str], repeat: int = 3) -> Dict[str, float]:
+    return {sql: time_query(conn, sql, repeat) for sql in workload}
+
+
+def propose_indexes(conn: sqlite3.Connection, workload: List[str], covering: bool = False,
+                    table: str = TABLE_NAME) -> List[Tuple[Tuple[str, ...], int]]:
+    """Candidate index keys for full-scan queries, most frequently needed first"""
+    columns = table_columns(conn, table)
+    counts = Counter()
+    for sql in workload:
+        if is_full_scan(explain(conn, sql), table):
+            key = candidate_index(sql, columns, covering)
+            if key:
+                counts[key] += 1
+
+    # Drop keys that are a strict prefix of another candidate; the longer
+    # index serves the same lookups.
+    keys = list(counts)
+    for key in keys:
+        for other in keys:
+            if other != key and other[:len(key)] == key and key in counts:
+                counts[other] += counts.pop(key)
+    return counts.most_common()
+
+
+def create_indexes(conn: sqlite3.Connection, keys: List[Tuple[str, ...]], table: str = TABLE_NAME) -> List[str]:
+    names = []
+    for key in keys:
+        name = index_name(key, table)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(key)})")
+        names.append(name)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return names
+
+
+def queries_using(conn: sqlite3.Connection, workload: List[str], name: str) -> List[str]:
+    """Workload queries the planner answers with index `name`"""
+    pattern = re.compile(rf"USING (?:COVERING )?INDEX {name}\b")
+    return [sql for sql in workload if any(pattern.search(d) for d in explain(conn, sql))]
+
+
+def advise(conn: sqlite3.Connection, workload: List[str], covering: bool = False, repeat: int = 3) -> Dict:
+    """
+    Propose indexes for `workload` and measure them on an in-memory copy of
+    `conn`.
+
+    Candidates are added greedily, most frequently needed first. Each one is
+    timed against the queries whose plans pick it up, on top of the indexes
+    kept so far, and kept only if those queries improve by at least
+    MIN_IMPROVEMENT.
+    """
+    scratch = sqlite3.connect(":memory:")
+    conn.backup(scratch)
+
+    full_scans = sum(is_full_scan(explain(scratch, sql)) for sql in workload)
+    baseline = time_workload(scratch, workload, repeat)
+    current = dict(baseline)
+
+    kept = []
+    for key, _ in propose_indexes(scratch, workload, covering):
+        name = create_indexes(scratch, [key])[0]
+        users = queries_using(scratch, workload, name)
+        if users:
+            timings = {sql: time_query(scratch, sql, repeat) for sql in users}
+            if sum(timings.values()) < sum(current[sql] for sql in users) * (1 - MIN_IMPROVEMENT):
+                kept.append((key, len(users)))
+                current.update(timings)
+                continue
+        scratch.execute(f"DROP INDEX {name}")
+
+    tuned = time_workload(scratch, workload, repeat)
+    remaining = sum(is_full_scan(explain(scratch, sql)) for sql in workload)
+    scratch.close()
+
+    return {
+        "queries": len(workload),
+        "full_scans_before": full_scans,
+        "full_scans_after": remaining,
+        "time_before": sum(baseline.values()),
+        "time_after": sum(tuned.values()),
+        "indexes": kept,
+    }
+
+
+def apply_recommended_indexes(conn: sqlite3.Connection, workload_path: str = WORKLOAD_PATH,
+                              covering: bool = False) -> List[str]:
+    """Create the indexes that measurably speed up the workload in `conn`"""
+    report = advise(conn, load_workload(workload_path), covering)
+    return create_indexes(conn, [key for key, _ in report["indexes"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workload-driven index advisor for the demographics DB")
+    parser.add_argument("--db", type=str, default=DB_PATH, help="SQLite database to analyze")
+    parser.add_argument("--workload", type=str, default=WORKLOAD_PATH, help="JSONL file with sql/gold_sql/pred_sql fields")
+    parser.add_argument("--covering", action="store_true", help="Append selected columns to make covering indexes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best of N)")
+    parser.add_argument("--apply", action="store_true", help="Create the recommended indexes in --db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    workload = load_workload(args.workload)
+    report = advise(conn, workload, args.covering, args.repeat)
+
+    print(f"Workload: {report['queries']} distinct queries from {args.workload}")
+    print(f"Full scans: {report['full_scans_before']} -> {report['full_scans_after']}")
+    print("Recommended indexes:")
+    for key, uses in report["indexes"]:
+        print(f"  CREATE INDEX {index_name(key)} ON {TABLE_NAME} ({', '.join(key)});  -- used by {uses} queries")
+    speedup = report["time_before"] / report["time_after"] if report["time_after"] > 0 else float("inf")
+    print(f"Workload time: {report['time_before']*1000:.1f} ms -> {report['time_after']*1000:.1f} ms ({speedup:.2f}x)")
+
+    if args.apply:
+        names = create_indexes(conn, [key for key, _ in report["indexes"]])
+        print(f"Created {len(names)} indexes in {args.db}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
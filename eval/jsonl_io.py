@@ -0,0 +1,274 @@
+import os
+import json
+import mmap
+import orjson
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+# Bytes read per buffered I/O call when streaming a file.
+READ_BUFFER_SIZE = 1 << 20
+
+# Records encoded per write() call by JSONLWriter.
+WRITE_BATCH_SIZE = 1000
+
+# Line numbers of malformed lines kept for the error summary.
+MAX_REPORTED_ERRORS = 20
+
+# Sidecar file holding the persisted id -> offset index of `<path>`.
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 2
+
+
+class JSONLReader:
+    def __init__(self, path: str, start_offset: int = 0, start_line: int = 1):
+        """
+        Streaming JSONL reader that counts malformed lines instead of
+        silently dropping them.
+
+        Lines are read in binary through a large buffer and decoded with
+        orjson. Blank lines are skipped and not counted. `offset` and
+        `line_no` track the position just past the last line read, so a
+        later reader can resume from there.
+
+        Args:
+            path (str): JSONL file to read
+            start_offset (int): Byte offset of the first line to read
+            start_line (int): Line number of that line
+        """
+        self.path = path
+        self.records = 0
+        self.errors = 0
+        self.error_lines: List[int] = []
+        self.offset = start_offset
+        self.line_no = start_line - 1
+
+    def iter_raw(self) -> Iterator[Tuple[int, int, bytes]]:
+        """(line number, byte offset, raw line) for every non-blank line"""
+        offset = self.offset
+        with open(self.path, "rb", buffering=READ_BUFFER_SIZE) as f:
+            f.seek(offset)
+            for line_no, line in enumerate(f, self.line_no + 1):
+                self.offset, self.line_no = offset + len(line), line_no
+                if line.strip():
+                    yield line_no, offset, line
+                offset += len(line)
+
+    def iter_records(self, keep_errors: bool = False) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """
+        (line number, record) for every decodable line.
+
+        Args:
+            keep_errors (bool): Also yield (line number, None) for malformed
+                lines, for callers that report them in place
+        """
+        for line_no, _, line in self.iter_raw():
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                self.errors += 1
+                if len(self.error_lines) < MAX_REPORTED_ERRORS:
+                    self.error_lines.append(line_no)
+                if keep_errors:
+                    yield line_no, None
+                continue
+            self.records += 1
+            yield line_no, record
+
+    def __iter__(self) -> Iterator[Dict]:
+        for _, record in self.iter_records():
+            yield record
+
+    def iter_batches(self, batch_size: int) -> Iterator[List[Dict]]:
+        """Records in lists of up to `batch_size`, without loading the whole file"""
+        batch = []
+        for record in self:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def summary(self) -> str:
+        """One-line report of decoded records and malformed lines"""
+        text = f"{self.records} records from {self.path}"
+        if self.errors:
+            shown = ", ".join(map(str, self.error_lines))
+            more = ", ..." if self.errors > len(self.error_lines) else ""
+            text += f" ({self.errors} malformed lines skipped: line {shown}{more})"
+        return text
+
+
+class JSONLWriter:
+    def __init__(self, path: str, batch_size: int = WRITE_BATCH_SIZE, compact: bool = False,
+                 append: bool = False):
+        """
+        Batched JSONL writer.
+
+        Records are encoded and written `batch_size` at a time. By default
+        lines use the same encoding as the rest of the repo
+        (json.dumps(ensure_ascii=False)), so regenerated files diff cleanly;
+        compact=True encodes with orjson (no spaces after separators).
+
+        Args:
+            path (str): Output JSONL file
+            batch_size (int): Records per write
+            compact (bool): Encode with orjson instead of json
+            append (bool): Append to an existing file instead of truncating it
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.compact = compact
+        self.count = 0
+        self._pending: List[bytes] = []
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self._file = open(path, "ab" if append else "wb", buffering=READ_BUFFER_SIZE)
+
+    def _encode(self, record) -> bytes:
+        if self.compact:
+            return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def write(self, record: Dict) -> None:
+        """Queue one record; written once the batch is full"""
+        self.write_encoded(self._encode(record))
+
+    def write_encoded(self, line: bytes) -> None:
+        """Queue one line encoded elsewhere (e.g. in a worker process), newline included"""
+        self._pending.append(line)
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all queued records"""
+        if self._pending:
+            self._file.write(b"".join(self._pending))
+            self._pending = []
+        self._file.flush()
+
+    def tell(self) -> int:
+        """Size of the output once queued records are flushed"""
+        self.flush()
+        return self._file.tell()
+
+    def close(self) -> None:
+        """Flush queued records and close the file"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JSONLIndex:
+    def __init__(self, path: str, key: str = "id", index_path: Optional[str] = None):
+        """
+        Random access to JSONL records by a key field, in O(1) per lookup.
+
+        The byte offset of every record is kept in a sidecar index file
+        (`<path>.idx`), rebuilt whenever the JSONL file's size or mtime
+        changes. Lookups read the single line from a memory map of the file.
+        When a key occurs more than once the last record wins, as it does
+        when such a file is loaded into a dict. Malformed lines and records
+        without a usable key are skipped and counted in `errors` (first line
+        numbers in `error_lines`).
+
+        Args:
+            path (str): JSONL file to index
+            key (str): Field identifying a record
+            index_path (str): Where to persist the index (default: path + ".idx")
+        """
+        self.path = path
+        self.key = key
+        self.index_path = index_path or path + INDEX_SUFFIX
+        self.errors = 0
+        self.error_lines: List[int] = []
+        self._offsets: Dict[Hashable, int] = {}
+        self._file = None
+        self._map = None
+        if not self._load():
+            self.build()
+
+    def _stamp(self) -> Dict:
+        st = os.stat(self.path)
+        return {"version": INDEX_VERSION, "key": self.key, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _load(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                saved = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return False
+        if any(saved.get(k) != v for k, v in self._stamp().items()):
+            return False
+        self._offsets = {key: offset for key, offset in saved["offsets"]}
+        self.errors = saved.get("errors", 0)
+        self.error_lines = saved.get("error_lines", [])
+        return True
+
+    def build(self) -> None:
+        """Scan the file, rebuild the offsets and persist them (best effort)"""
+        stamp = self._stamp()
+        reader = JSONLReader(self.path)
+        offsets = {}
+        for line_no, offset, line in reader.iter_raw():
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                record = None
+            value = record.get(self.key) if isinstance(record, dict) else None
+            if isinstance(value, (str, int)):
+                offsets[value] = offset
+                continue
+            reader.errors += 1
+            if len(reader.error_lines) < MAX_REPORTED_ERRORS:
+                reader.error_lines.append(line_no)
+        self._offsets = offsets
+        self.errors = reader.errors
+        self.error_lines = reader.error_lines
+        saved = dict(stamp, errors=self.errors, error_lines=self.error_lines, offsets=list(offsets.items()))
+        try:
+            with open(self.index_path, "wb") as f:
+                f.write(orjson.dumps(saved))
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def keys(self):
+        return self._offsets.keys()
+
+    def get(self, key, default=None) -> Optional[Dict]:
+        """The record whose key field equals `key`, or `default`"""
+        offset = self._offsets.get(key)
+        if offset is None:
+            return default
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self._map.find(b"\n", offset)
+        return orjson.loads(self._map[offset:end if end != -1 else len(self._map)])
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,93 @@
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional
+from db_connections import open_memory
+
+# Cases submitted to the pool at a time by run_parallel.
+PARALLEL_WINDOW = 4096
+
+# Per-process state, populated by _init_worker in each pool worker.
+_worker_conn = None
+_worker_case_fn = None
+
+
+def serialize_database(conn: sqlite3.Connection) -> bytes:
+    """Snapshot a connection's main database as a serialized image"""
+    if not hasattr(conn, "serialize"):
+        raise RuntimeError("Parallel evaluation requires sqlite3 serialize() (Python 3.11+)")
+    return conn.serialize()
+
+
+def load_replica(image) -> sqlite3.Connection:
+    """Open a read-only copy of a serialized image (bytes) or a DatabaseImage"""
+    if not isinstance(image, (bytes, bytearray)):
+        conn = image.connect()
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+    conn = open_memory(image)
+    conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+
+def _init_worker(image, case_fn: Callable) -> None:
+    global _worker_conn, _worker_case_fn
+    _worker_conn = load_replica(image)
+    _worker_case_fn = case_fn
+
+
+def _run_case(case):
+    return _worker_case_fn(_worker_conn, case)
+
+
+def _windows(cases: Iterable, size: int) -> Iterator[List]:
+    it = iter(cases)
+    while True:
+        window = list(islice(it, size))
+        if not window:
+            return
+        yield window
+
+
+def run_parallel(image, case_fn: Callable, cases: Iterable, workers: int,
+                 chunksize: Optional[int] = None, window: int = PARALLEL_WINDOW) -> Iterator:
+    """
+    Apply `case_fn(conn, case)` to every case across a process pool.
+
+    Each worker opens its own replica of `image` once, so no worker touches
+    the source DB or the CSVs. Results are yielded in input order. Cases
+    are read `window` at a time, and the next window is submitted before
+    the results of the current one are yielded, so at most two windows are
+    held in memory and the pool never waits on the consumer.
+
+    Args:
+        image: Serialized database bytes (see serialize_database), or a
+            db_image.DatabaseImage that workers open from disk themselves
+        case_fn (Callable): Module-level function taking (conn, case)
+        cases (Iterable): Test cases to shard across workers
+        workers (int): Number of worker processes
+        chunksize (int): Cases per task; defaults to ~4 tasks per worker per window
+        window (int): Cases read from `cases` per submission
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(image, case_fn)) as pool:
+        in_flight = None
+        for batch in _windows(cases, window):
+            size = chunksize or max(1, len(batch) // (workers * 4))
+            submitted = pool.map(_run_case, batch, chunksize=size)
+            if in_flight is not None:
+                yield from in_flight
+            in_flight = submitted
+        if in_flight is not None:
+            yield from in_flight
+
+
+def run_cases(conn: sqlite3.Connection, case_fn: Callable, cases: Iterable, workers: int = 0,
+              image=None) -> Iterator:
+    """
+    Run cases serially on `conn`, or in parallel replicas when workers > 1.
+    Replicas are opened from `image` when given, else from a snapshot of `conn`.
+    """
+    if workers and workers > 1:
+        return run_parallel(image or serialize_database(conn), case_fn, cases, workers)
+    return (case_fn(conn, case) for case in cases)
@@ -0,0 +1,61 @@
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Optional
+
+# SQLite VM instructions between progress-handler callbacks.
+PROGRESS_INTERVAL = 1000
+
+
+class QueryTimeout(Exception):
+    """Raised when a query exceeds its execution budget and is cancelled"""
+
+
+class QueryBudget:
+    def __init__(self, max_seconds: Optional[float] = None, max_steps: Optional[int] = None):
+        """
+        Per-query execution limit enforced through SQLite's progress handler.
+
+        Args:
+            max_seconds (float): Wall-clock limit per query (None = unbounded)
+            max_steps (int): Limit on SQLite VM instructions (None = unbounded)
+        """
+        self.max_seconds = max_seconds
+        self.max_steps = max_steps
+
+    def __bool__(self) -> bool:
+        return self.max_seconds is not None or self.max_steps is not None
+
+    def __repr__(self) -> str:
+        return f"QueryBudget(max_seconds={self.max_seconds}, max_steps={self.max_steps})"
+
+    @contextmanager
+    def guard(self, conn: sqlite3.Connection):
+        """Cancel any statement stepped on `conn` inside the block once over budget"""
+        if not self:
+            yield
+            return
+
+        state = {"steps": 0, "reason": None}
+        deadline = time.monotonic() + self.max_seconds if self.max_seconds is not None else None
+
+        def on_progress():
+            state["steps"] += PROGRESS_INTERVAL
+            if self.max_steps is not None and state["steps"] > self.max_steps:
+                state["reason"] = f"exceeded {self.max_steps} VM steps"
+                return 1
+            if deadline is not None and time.monotonic() > deadline:
+                state["reason"] = f"exceeded {self.max_seconds}s wall time"
+                return 1
+            return 0
+
+        conn.set_progress_handler(on_progress, PROGRESS_INTERVAL)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if state["reason"]:
+                raise QueryTimeout(f"Query cancelled: {state['reason']}") from e
+            raise
+        finally:
+            conn.set_progress_handler(None, PROGRESS_INTERVAL)
+
@@ -2,48 +2,70 @@ import sqlite3
 import time
 import re
 from typing import List, Dict, Tuple, Set, Optional
+from query_budget import QueryBudget, QueryTimeout
+from backends import DEFAULT_BACKEND, ExecutionBackend, make_backend
+from edit_distance import build_peq, distance_with_peq, levenshtein
+from execution_memo import ExecutionMemo
+from result_digest import normalize_sql
+from db_connections import get_pool
+
+# Memoized outcome of a query that raised a (non-timeout) error.
+_QUERY_FAILED = object()
 
 class QueryComparator:
-    def __init__(self, database_path: str):
+    def __init__(self, database_path: str, budget: Optional[QueryBudget] = None,
+                 memo: Optional[ExecutionMemo] = None, backend: str = DEFAULT_BACKEND):
         """
         Initialize QueryComparator with database path.
         
         Args:
             database_path (str): Path to SQLite database
+            budget (QueryBudget): Optional per-query execution limit
+            memo (ExecutionMemo): Optional run-scoped memo of query results,
+                keyed on normalized SQL
+            backend (str): Execution engine ("sqlite" or "duckdb", see backends.py)
         """
         self.database_path = database_path
+        self.budget = budget
+        self.memo = memo
+        self.memo_hits = 0
+        self.backend_name = backend
         self.conn = None
+        self._pool = None
+        self._backend = None
+        self._backend_conn = None
 
     def connect(self) -> None:
-        """Establish database connection"""
-        self.conn = sqlite3.connect(self.database_path)
+        """Borrow a read-only connection from the shared pool"""
+        self._pool = get_pool(self.database_path)
+        self.conn = self._pool.acquire()
+        self.backend()
 
     def disconnect(self) -> None:
-        """Close database connection"""
+        """Return the connection to the pool"""
         if self.conn:
-            self.conn.close()
+            if self._pool is not None:
+                self._pool.release(self.conn)
             self.conn = None
 
+    def backend(self) -> ExecutionBackend:
+        """Execution backend over the current connection (rebuilt if it changes)"""
+        if self._backend is None or self._backend_conn is not self.conn:
+            if self._backend is not None:
+                self._backend.close()
+            self._backend = make_backend(self.backend_name, self.conn)
+            self._backend_conn = self.conn
+        return self._backend
+
     @staticmethod
-    def levenshtein_distance(s1: str, s2: str) -> int:
-        """Calculate Levenshtein distance between two strings"""
-        m, n = len(s1), len(s2)
-        dp = [[0]*(n+1) for _ in range(m+1)]
-        
-        for i in range(m+1):
-            dp[i][0] = i
-        for j in range(n+1):
-            dp[0][j] = j
-            
-        for i in range(1, m+1):
-            for j in range(1, n+1):
-                cost = 0 if s1[i-1] == s2[j-1] else 1
-                dp[i][j] = min(
-                    dp[i-1][j] + 1,      # deletion
-                    dp[i][j-1] + 1,      # insertion
-                    dp[i-1][j-1] + cost  # substitution
-                )
-        return dp[m][n]
+    def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+        """Calculate Levenshtein distance between two strings.
+
+        Uses the bit-parallel algorithm in edit_distance.py. With
+        `max_distance`, stops early and returns max_distance + 1 once the
+        distance is known to exceed it.
+        """
+        return levenshtein(s1, s2, max_distance)
 
     @staticmethod
     def canonicalize(query: str) -> str:
@@ -53,16 +75,76 @@ class QueryComparator:
         query = re.sub(r'\bwhere\b.*order by', 'order by', query)
         return query
 
+    @classmethod
+    def structural_similarity(cls, predicted_sql: str, ground_truth_sql: str) -> float:
+        """1 - normalized edit distance between the canonicalized queries"""
+        pred_canonical = cls.canonicalize(predicted_sql)
+        gt_canonical = cls.canonicalize(ground_truth_sql)
+        dist = cls.levenshtein_distance(pred_canonical, gt_canonical)
+        max_len = max(len(pred_canonical), len(gt_canonical)) or 1
+        return 1 - (dist / max_len)
+
+    @classmethod
+    def structural_similarity_batch(cls, pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        Structural similarity for many (predicted, ground truth) pairs.
+
+        Each distinct ground truth is canonicalized and preprocessed once,
+        so scoring many predictions against a shared gold set is cheap.
+
+        Args:
+            pairs (List[Tuple[str, str]]): (predicted_sql, ground_truth_sql) pairs
+        """
+        gt_cache = {}
+        scores = []
+        for predicted_sql, ground_truth_sql in pairs:
+            if ground_truth_sql not in gt_cache:
+                gt_canonical = cls.canonicalize(ground_truth_sql)
+                gt_cache[ground_truth_sql] = (gt_canonical, build_peq(gt_canonical))
+            gt_canonical, (peq, m) = gt_cache[ground_truth_sql]
+            pred_canonical = cls.canonicalize(predicted_sql)
+
+            if pred_canonical == gt_canonical:
+                dist = 0
+            else:
+                dist = distance_with_peq(peq, m, pred_canonical)
+            max_len = max(len(pred_canonical), m) or 1
+            scores.append(1 - (dist / max_len))
+        return scores
+
     def run_sql_query(self, query: str) -> Tuple[list, float]:
-        """Execute SQL query and return results with execution time"""
+        """Execute SQL query and return results with execution time.
+
+        Memoized queries are answered from the memo (counted in memo_hits);
+        the time returned is always the wall time of this call.
+        Raises QueryTimeout if the query exceeds the comparator's budget.
+        """
+        start_time = time.time()
+        if self.memo is not None:
+            key = normalize_sql(query)
+            hit = self.memo.get(key)
+            if hit is not None:
+                self.memo_hits += 1
+                if isinstance(hit, QueryTimeout):
+                    raise hit.with_traceback(None)
+                if hit is _QUERY_FAILED:
+                    return [], 0
+                return hit, time.time() - start_time
+
+        backend = self.backend()
         try:
-            start_time = time.time()
-            cursor = self.conn.execute(query)
-            results = cursor.fetchall()
+            results = backend.fetch_all(query, self.budget)
             exec_time = time.time() - start_time
-            return results, exec_time
+        except QueryTimeout as e:
+            if self.memo is not None:
+                self.memo.put(key, e)
+            raise
         except Exception as e:
-            return [], 0
+            results, exec_time = _QUERY_FAILED, 0
+
+        if self.memo is not None:
+            self.memo.put(key, results, weight=1 if results is _QUERY_FAILED else max(1, len(results)))
+        return ([], 0) if results is _QUERY_FAILED else (results, exec_time)
 
     @staticmethod
     def output_similarity(pred: list, gt: list) -> float:
@@ -82,6 +164,7 @@ class QueryComparator:
         if not self.conn:
             self.connect()
 
+        memo_hits = self.memo_hits
         try:
             # Generate and execute predicted SQL
             start_time = time.time()
@@ -98,30 +181,46 @@ class QueryComparator:
             is_exact_match = (pred_canonical == gt_canonical)
             is_execution_match = (pred_results == gt_results)
 
-            dist = self.levenshtein_distance(pred_canonical, gt_canonical)
-            max_len = max(len(pred_canonical), len(gt_canonical)) or 1
-            structural_sim = 1 - (dist / max_len)
+            structural_sim = self.structural_similarity(predicted_sql, ground_truth_sql)
 
             out_sim = self.output_similarity(pred_results, gt_results)
 
             return {
+                "timed_out": False,
                 "exact_match": is_exact_match,
                 "execution_match": is_execution_match,
                 "structural_similarity": structural_sim,
                 "output_similarity": out_sim,
                 "execution_time": total_pred_time,
+                "memo_hits": self.memo_hits - memo_hits,
                 "predicted_results": pred_results,
                 "ground_truth_results": gt_results
             }
 
+        except QueryTimeout as e:
+            return {
+                "error": str(e),
+                "timed_out": True,
+                "exact_match": False,
+                "execution_match": False,
+                "structural_similarity": 0.0,
+                "output_similarity": 0.0,
+                "execution_time": 0.0,
+                "memo_hits": self.memo_hits - memo_hits,
+                "predicted_results": [],
+                "ground_truth_results": []
+            }
+
         except Exception as e:
             return {
                 "error": str(e),
+                "timed_out": False,
                 "exact_match": False,
                 "execution_match": False,
                 "structural_similarity": 0.0,
                 "output_similarity": 0.0,
                 "execution_time": 0.0,
+                "memo_hits": self.memo_hits - memo_hits,
                 "predicted_results": [],
                 "ground_truth_results": []
             }
\ No newline at end of file
@@ -1,54 +1,101 @@
 import os
-import json
 import argparse
+import sqlite3
 from datetime import datetime
 from query_comparator import QueryComparator
+from parallel_eval import run_parallel, serialize_database
+from query_budget import QueryBudget
+from execution_memo import ExecutionMemo, MEMO_MAX_ENTRIES, MEMO_MAX_ROWS
+from db_connections import DEFAULT_DB_PATH, get_pool
+from backends import BACKENDS, DEFAULT_BACKEND
+from jsonl_io import JSONLReader
 from typing import List, Dict
 
+
+def _make_memo(memo_entries: int):
+    return ExecutionMemo(memo_entries, MEMO_MAX_ROWS) if memo_entries else None
+
+
+class _CaseComparator:
+    # Picklable per-worker comparator; the memo is built on first use so
+    # every worker keeps its own for the rest of the run.
+    def __init__(self, budget: QueryBudget, memo_entries: int, backend: str = DEFAULT_BACKEND):
+        self.budget = budget
+        self.memo_entries = memo_entries
+        self.backend = backend
+        self.comparator = None
+
+    def __call__(self, conn: sqlite3.Connection, test_case: Dict) -> Dict:
+        if self.comparator is None:
+            self.comparator = QueryComparator(":memory:", self.budget, _make_memo(self.memo_entries), self.backend)
+        self.comparator.conn = conn
+        return self.comparator.compare_queries(test_case["pred_sql"], test_case["gold_sql"])
+
+
 class QueryTester:
-    def __init__(self, database_path: str, predictions_path: str):
+    def __init__(self, database_path: str, predictions_path: str, budget: QueryBudget = None,
+                 memo_entries: int = MEMO_MAX_ENTRIES, backend: str = DEFAULT_BACKEND):
         """
         Initialize QueryTester with paths to database and predicted SQL results.
 
         Args:
             database_path (str): Path to SQLite database
             predictions_path (str): Path to JSONL file containing predictions
+            budget (QueryBudget): Optional per-query execution limit
+            memo_entries (int): Size of the run-scoped query memo (0 = off)
+            backend (str): Execution engine ("sqlite" or "duckdb")
         """
         self.database_path = database_path
         self.predictions_path = predictions_path
-        self.comparator = QueryComparator(database_path)
+        self.budget = budget
+        self.memo_entries = memo_entries
+        self.backend = backend
+        self.comparator = QueryComparator(database_path, budget, _make_memo(memo_entries), backend)
         self.test_data = []
 
     def load_jsonl_data(self) -> None:
         """Load test data from a JSONL file"""
         self.test_data = []
-        with open(self.predictions_path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    obj = json.loads(line)
-                    if "pred_sql" in obj and "gold_sql" in obj:
-                        self.test_data.append({
-                            "nlq": obj.get("nl", ""),
-                            "pred_sql": obj["pred_sql"],
-                            "gold_sql": obj["gold_sql"]
-                        })
-                except json.JSONDecodeError:
-                    continue
+        reader = JSONLReader(self.predictions_path)
+        for obj in reader:
+            if "pred_sql" in obj and "gold_sql" in obj:
+                self.test_data.append({
+                    "nlq": obj.get("nl", ""),
+                    "pred_sql": obj["pred_sql"],
+                    "gold_sql": obj["gold_sql"]
+                })
         print(f"📂 Loaded {len(self.test_data)} test cases from {self.predictions_path}")
+        if reader.errors:
+            print(f"⚠️ {reader.summary()}")
 
-    def run_tests(self) -> Dict:
+    def iter_metrics(self, workers: int = 0):
+        """
+        Yield per-test metrics in input order.
+
+        Args:
+            workers (int): Worker processes, each comparing against its own
+                in-memory replica of the database (0 or 1 = serial)
+        """
+        if workers and workers > 1:
+            with get_pool(self.database_path).connection() as src:
+                image = serialize_database(src)
+            yield from run_parallel(image, _CaseComparator(self.budget, self.memo_entries, self.backend), self.test_data, workers)
+        else:
+            for test_case in self.test_data:
+                yield self.comparator.compare_queries(test_case["pred_sql"], test_case["gold_sql"])
+
+    def run_tests(self, workers: int = 0) -> Dict:
         """Run all tests and return aggregated metrics"""
         try:
             self.comparator.connect()
             total_tests = len(self.test_data)
             all_metrics = []
 
-            for i, test_case in enumerate(self.test_data, start=1):
+            for i, (test_case, metrics) in enumerate(zip(self.test_data, self.iter_metrics(workers)), start=1):
                 nlq = test_case["nlq"]
                 pred_sql = test_case["pred_sql"]
                 gt_sql = test_case["gold_sql"]
 
-                metrics = self.comparator.compare_queries(pred_sql, gt_sql)
                 all_metrics.append(metrics)
 
                 print(f"Test {i}:")
@@ -57,6 +104,8 @@ class QueryTester:
                 print("  Ground Truth SQL:", gt_sql)
                 print(f"  Exact Match: {metrics['exact_match']}")
                 print(f"  Execution Match: {metrics['execution_match']}")
+                if metrics["timed_out"]:
+                    print(f"  TIMEOUT: {metrics['error']}")
                 print(f"  Structural Similarity: {metrics['structural_similarity']:.3f}")
                 print(f"  Output Similarity: {metrics['output_similarity']:.3f}")
                 print(f"  Execution Time: {metrics['execution_time']:.3f} seconds\n")
@@ -66,7 +115,9 @@ class QueryTester:
                 "execution_match": sum(m["execution_match"] for m in all_metrics) / total_tests,
                 "avg_structural_sim": sum(m["structural_similarity"] for m in all_metrics) / total_tests,
                 "avg_output_sim": sum(m["output_similarity"] for m in all_metrics) / total_tests,
-                "avg_exec_time": sum(m["execution_time"] for m in all_metrics) / total_tests
+                "avg_exec_time": sum(m["execution_time"] for m in all_metrics) / total_tests,
+                "timeouts": sum(m["timed_out"] for m in all_metrics),
+                "memo_hits": sum(m["memo_hits"] for m in all_metrics)
             }
 
             return aggregate_metrics
@@ -82,6 +133,8 @@ class QueryTester:
         print(f"Average Structural Similarity: {metrics['avg_structural_sim']:.3f}")
         print(f"Average Output Similarity: {metrics['avg_output_sim']:.3f}")
         print(f"Average Execution Time: {metrics['avg_exec_time']:.3f} seconds")
+        print(f"Timeouts: {metrics['timeouts']}")
+        print(f"Memo Hits: {metrics['memo_hits']}")
 
 
 
@@ -89,7 +142,13 @@ class QueryTester:
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--pred_file", type=str, required=True, help="Path to NL2SQL prediction JSONL file")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH, help="SQLite database to run queries against")
     parser.add_argument("--save_dir", type=str, default="eval/results", help="Directory to save text logs")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-query wall-time budget in seconds")
+    parser.add_argument("--max_steps", type=int, default=None, help="Per-query budget in SQLite VM steps")
+    parser.add_argument("--memo_entries", type=int, default=MEMO_MAX_ENTRIES, help="Run-scoped query memo size (0 = off)")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Execution engine")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes with in-memory DB replicas (0 = serial)")
     args = parser.parse_args()
 
     os.makedirs(args.save_dir, exist_ok=True)
@@ -97,8 +156,11 @@ def main():
     log_path = os.path.join(args.save_dir, f"query_eval_log_{timestamp}.txt")
 
     tester = QueryTester(
-        database_path="my_database.db",
-        predictions_path=args.pred_file
+        database_path=args.db,
+        predictions_path=args.pred_file,
+        budget=QueryBudget(args.timeout, args.max_steps),
+        memo_entries=args.memo_entries,
+        backend=args.backend
     )
 
     tester.load_jsonl_data()
@@ -108,12 +170,11 @@ def main():
         total_tests = len(tester.test_data)
         all_metrics = []
 
-        for i, test_case in enumerate(tester.test_data, start=1):
+        for i, (test_case, metrics) in enumerate(zip(tester.test_data, tester.iter_metrics(args.workers)), start=1):
             nlq = test_case["nlq"]
             pred_sql = test_case["pred_sql"]
             gt_sql = test_case["gold_sql"]
 
-            metrics = tester.comparator.compare_queries(pred_sql, gt_sql)
             all_metrics.append(metrics)
 
             output_lines = [
@@ -123,6 +184,10 @@ def main():
                 f"  Ground Truth SQL: {gt_sql}",
                 f"  Exact Match: {metrics['exact_match']}",
                 f"  Execution Match: {metrics['execution_match']}",
+            ]
+            if metrics["timed_out"]:
+                output_lines.append(f"  TIMEOUT: {metrics['error']}")
+            output_lines += [
                 f"  Structural Similarity: {metrics['structural_similarity']:.3f}",
                 f"  Output Similarity: {metrics['output_similarity']:.3f}",
                 f"  Execution Time: {metrics['execution_time']:.3f} seconds",
@@ -141,7 +206,9 @@ def main():
             "execution_match": sum(m['execution_match'] for m in all_metrics) / total,
             "avg_structural_sim": sum(m['structural_similarity'] for m in all_metrics) / total,
             "avg_output_sim": sum(m['output_similarity'] for m in all_metrics) / total,
-            "avg_exec_time": sum(m['execution_time'] for m in all_metrics) / total
+            "avg_exec_time": sum(m['execution_time'] for m in all_metrics) / total,
+            "timeouts": sum(m['timed_out'] for m in all_metrics),
+            "memo_hits": sum(m['memo_hits'] for m in all_metrics)
         }
 
         summary_lines = [
@@ -152,6 +219,8 @@ def main():
             f"Average Structural Similarity: {summary['avg_structural_sim']:.3f}",
             f"Average Output Similarity: {summary['avg_output_sim']:.3f}",
             f"Average Execution Time: {summary['avg_exec_time']:.3f} seconds",
+            f"Timeouts: {summary['timeouts']}",
+            f"Memo Hits: {summary['memo_hits']}",
         ]
 
         for line in summary_lines:
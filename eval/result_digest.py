@@ -0,0 +1,79 @@
+import re
+import hashlib
+
+# Leading rows kept for human-readable logs.
+PREVIEW_ROWS = 5
+
+_BAG_MODULUS = 1 << 128
+
+_QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_ORDER_BY_RE = re.compile(r"\border\s+by\b", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and lowercase everything outside quoted literals"""
+    parts = _QUOTED_RE.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i]).lower()
+    return "".join(parts).strip()
+
+
+def has_order_by(sql: str) -> bool:
+    """True if the query has an ORDER BY outside of string literals"""
+    return bool(_ORDER_BY_RE.search(_QUOTED_RE.sub("''", sql)))
+
+
+def _normalize_value(value):
+    # sqlite returns 3 and 3.0 for the same population count depending on
+    # column affinity; treat them as the same value.
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ResultDigest:
+    __slots__ = ("row_count", "bag_hash", "ordered_hash", "preview")
+
+    def __init__(self, ordered: bool = False):
+        """
+        Constant-memory summary of a result set.
+
+        `bag_hash` is an order-insensitive multiset hash (the sum of per-row
+        hashes), so duplicates count but row order does not. `ordered_hash`
+        is only maintained when `ordered` is set.
+
+        Args:
+            ordered (bool): Also hash rows in the order they arrive
+        """
+        self.row_count = 0
+        self.bag_hash = 0
+        self.ordered_hash = hashlib.blake2b(digest_size=16) if ordered else None
+        self.preview = []
+
+    def add(self, row) -> None:
+        row_bytes = repr(tuple(_normalize_value(v) for v in row)).encode("utf-8")
+        row_hash = hashlib.blake2b(row_bytes, digest_size=16).digest()
+        self.bag_hash = (self.bag_hash + int.from_bytes(row_hash, "big")) % _BAG_MODULUS
+        if self.ordered_hash is not None:
+            self.ordered_hash.update(row_hash)
+        if len(self.preview) < PREVIEW_ROWS:
+            self.preview.append(row)
+        self.row_count += 1
+
+    @property
+    def fingerprint(self) -> str:
+        """Comparable string form: row count, bag hash and (if kept) order hash"""
+        fp = f"{self.row_count}:{self.bag_hash:032x}"
+        if self.ordered_hash is not None:
+            fp += ":" + self.ordered_hash.hexdigest()
+        return fp
+
+
+def digest_rows(batches, ordered: bool = False) -> ResultDigest:
+    """Digest rows arriving in batches (e.g. from an execution backend)"""
+    digest = ResultDigest(ordered)
+    for rows in batches:
+        for row in rows:
+            digest.add(row)
+    return digest
+
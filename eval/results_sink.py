@@ -0,0 +1,134 @@
+import sys
+import json
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional
+
+# Bytes buffered by the writer thread before hitting the file.
+WRITE_BUFFER_SIZE = 1 << 20
+
+_CLOSE = object()
+
+
+class ResultsSink:
+    def __init__(self, path: str, buffer_size: int = WRITE_BUFFER_SIZE, max_pending: int = 10000):
+        """
+        JSONL writer for per-case evaluation records.
+
+        Records are handed to a background thread, which encodes them and
+        writes through a large buffer, so the evaluation loop never waits
+        on disk I/O.
+
+        Args:
+            path (str): Output JSONL file
+            buffer_size (int): File buffer size in bytes
+            max_pending (int): Records queued before write() blocks
+        """
+        self.path = path
+        self.count = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._file = open(path, "w", encoding="utf-8", buffering=buffer_size)
+        self._thread = threading.Thread(target=self._drain, name="results-sink", daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is _CLOSE:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                self._error = e
+
+    def write(self, record: Dict) -> None:
+        """Queue one record for writing"""
+        self._queue.put(record)
+        self.count += 1
+
+    def close(self) -> None:
+        """Flush all queued records and close the file"""
+        if self._file is None:
+            return
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._file.close()
+        self._file = None
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Read records back from a results JSONL file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _rows_str(rows, row_count) -> str:
+    # JSON turns result tuples into lists; restore them so the text log
+    # reads the same as a direct str() of the cursor rows.
+    text = str([tuple(r) if isinstance(r, list) else r for r in rows])
+    if row_count is not None and row_count > len(rows):
+        text += f" ... ({row_count} rows)"
+    if len(text) > 200:
+        text = text[:200] + "... (truncated)"
+    return text
+
+
+def render_record(record: Dict) -> List[str]:
+    """Human-readable lines for one record"""
+    kind = record.get("type")
+    if kind == "parse_error":
+        return [f"JSON Parsing Error on line {record['line']}\n"]
+    if kind == "summary":
+        return record["lines"]
+
+    lines = [
+        f"[" + "="*20 + f" Test Case #{record['line']} " + "="*20 + "]",
+        f"Question: {record['nl']}",
+        f"Pred SQL:  {record['pred_sql']}",
+        f"Gold SQL:  {record['gold_sql']}",
+    ]
+    if record["status"] == "TIMEOUT":
+        lines.append(f"Execution Timeout: {record['error']}")
+    elif record["error"]:
+        lines.append(f"Execution Error: {record['error']}")
+    else:
+        lines.append(f"Pred DB Result: {_rows_str(record['pred_res'], record['pred_row_count'])}")
+        if record["gold_cached"]:
+            lines.append(f"Gold DB Result: (cached, {record['gold_row_count']} rows)")
+        else:
+            lines.append(f"Gold DB Result: {_rows_str(record['gold_res'], record['gold_row_count'])}")
+    status_icon = "MATCH" if record["match"] else "X"
+    lines.append(f"result: {status_icon} {record['status']}\n")
+    return lines
+
+
+def render_text_log(jsonl_path: str, txt_path: Optional[str] = None) -> str:
+    """Render a results JSONL file as the classic text log"""
+    if txt_path is None:
+        txt_path = jsonl_path.rsplit(".", 1)[0] + ".txt"
+    with open(txt_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+        for record in iter_records(jsonl_path):
+            for line in render_record(record):
+                f.write(line + "\n")
+    return txt_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python eval/results_sink.py <results.jsonl> [out.txt]")
+        sys.exit(1)
+    out_path = render_text_log(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Text log written to: {out_path}")
@@ -0,0 +1,410 @@
+import re
+import sys
+import json
+import sqlite3
+import argparse
+from typing import Dict, Iterable, List, Optional, Tuple
+from result_digest import digest_rows
+from db_connections import DEFAULT_DB_PATH
+
+BASE_TABLE = "demographics"
+DB_PATH = DEFAULT_DB_PATH
+
+# Rows per fetchmany() call when fingerprinting the base table.
+FETCH_BATCH_SIZE = 1000
+
+# Materialized rollups and their grouping keys.
+ROLLUPS = {
+    "demographics_by_year": ("year",),
+    "demographics_by_zipcode": ("zipcode",),
+    "demographics_by_year_zipcode": ("year", "zipcode"),
+}
+
+# Content fingerprint of the base table at the last build/refresh.
+# RollupRewriter compares it with the live table and stops rewriting when
+# they differ.
+ROLLUP_STATE_TABLE = "rollup_state"
+
+# Columns that are never aggregated.
+NON_MEASURE_COLUMNS = ("year", "id", "zipcode")
+
+_AGG_FUNCS = ("sum", "avg", "min", "max", "count")
+_SQL_WORDS = {
+    "and", "or", "not", "in", "between", "like", "glob", "is", "null", "as",
+    "asc", "desc", "case", "when", "then", "else", "end", "cast", "collate",
+    "escape", "nocase", "integer", "real", "text", "limit", "offset",
+}
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_QUERY_RE = re.compile(
+    r"^select\s+(?P<select>.+?)\s+from\s+" + BASE_TABLE + r"\b"
+    r"(?:\s+where\s+(?P<where>.+?))?"
+    r"(?:\s+group\s+by\s+(?P<group>.+?))?"
+    r"(?:\s+having\s+(?P<having>.+?))?"
+    r"(?:\s+order\s+by\s+(?P<order>.+?))?"
+    r"(?:\s+limit\s+(?P<limit>\d+(?:\s*(?:,|offset)\s*\d+)?))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+_AGG_RE = re.compile(r"\b(sum|avg|min|max|count)\s*\(\s*(\*|[a-z_][a-z0-9_]*)\s*\)", re.IGNORECASE)
+_IDENT_RE = re.compile(r"\b([a-z_][a-z0-9_]*)\b(?!\s*\()", re.IGNORECASE)
+_ALIAS_RE = re.compile(r"\bas\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+_UNSUPPORTED_RE = re.compile(r"\b(select|join|union|intersect|except|distinct|over|total|group_concat)\b", re.IGNORECASE)
+
+
+def measure_columns(conn: sqlite3.Connection, table: str = BASE_TABLE) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] not in NON_MEASURE_COLUMNS]
+
+
+def _rollup_select(key: Tuple[str, ...], measures: List[str]) -> str:
+    parts = list(key) + ["COUNT(*) AS row_count"]
+    for col in measures:
+        parts += [
+            f"SUM({col}) AS sum_{col}",
+            f"MIN({col}) AS min_{col}",
+            f"MAX({col}) AS max_{col}",
+            f"COUNT({col}) AS cnt_{col}",
+        ]
+    return f"SELECT {', '.join(parts)} FROM {BASE_TABLE}"
+
+
+def base_fingerprint(conn: sqlite3.Connection) -> str:
+    """
+    Order-insensitive hash of every base table row (see result_digest), so
+    a corrected value or a swapped-out year changes it even when the row
+    count does not.
+    """
+    cursor = conn.execute(f"SELECT * FROM {BASE_TABLE}")
+    return digest_rows(iter(lambda: cursor.fetchmany(FETCH_BATCH_SIZE), [])).fingerprint
+
+
+def _record_state(conn: sqlite3.Connection) -> None:
+    conn.execute(f"DROP TABLE IF EXISTS {ROLLUP_STATE_TABLE}")
+    conn.execute(f"CREATE TABLE {ROLLUP_STATE_TABLE} (base_fingerprint TEXT NOT NULL)")
+    conn.execute(f"INSERT INTO {ROLLUP_STATE_TABLE} VALUES (?)", (base_fingerprint(conn),))
+
+
+def rollups_fresh(conn: sqlite3.Connection) -> bool:
+    """Whether the base table still has the content the rollups were built from"""
+    try:
+        row = conn.execute(f"SELECT base_fingerprint FROM {ROLLUP_STATE_TABLE}").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return row is not None and row[0] == base_fingerprint(conn)
+
+
+def build_rollups(conn: sqlite3.Connection, commit: bool = True) -> List[str]:
+    """(Re)create every rollup table from the base table"""
+    measures = measure_columns(conn)
+    for name, key in ROLLUPS.items():
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+        # CREATE TABLE AS keeps the exact aggregate values (no column
+        # affinity), so rollup results are bit-identical to the base query.
+        conn.execute(f"CREATE TABLE {name} AS {_rollup_select(key, measures)} GROUP BY {', '.join(key)}")
+        conn.execute(f"CREATE UNIQUE INDEX idx_{name}_key ON {name} ({', '.join(key)})")
+    _record_state(conn)
+    if commit:
+        conn.commit()
+    return list(ROLLUPS)
+
+
+def existing_rollups(conn: sqlite3.Connection) -> Dict[str, Tuple[str, ...]]:
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {name: key for name, key in ROLLUPS.items() if name in names}
+
+
+def refresh_rollups(conn: sqlite3.Connection, years: Optional[Iterable[int]] = None,
+                    commit: bool = True) -> None:
+    """
+    Bring rollups up to date after rows for `years` were appended, replaced
+    or deleted. With years=None every rollup is rebuilt. With commit=False the
+    changes stay in the caller's open transaction.
+    """
+    rollups = existing_rollups(conn)
+    if not rollups:
+        return
+    if years is None:
+        build_rollups(conn, commit)
+        return
+    years = sorted(set(years))
+    if not years:
+        return
+
+    measures = measure_columns(conn)
+    marks = ", ".join("?" for _ in years)
+
+    # Zipcodes touched by these years, both before (rollup) and after (base).
+    zipcodes = {row[0] for row in conn.execute(
+        f"SELECT DISTINCT zipcode FROM {BASE_TABLE} WHERE year IN ({marks})", years)}
+    if "demographics_by_year_zipcode" in rollups:
+        zipcodes |= {row[0] for row in conn.execute(
+            f"SELECT DISTINCT zipcode FROM demographics_by_year_zipcode WHERE year IN ({marks})", years)}
+
+    for name, key in rollups.items():
+        select = _rollup_select(key, measures)
+        if "year" in key:
+            conn.execute(f"DELETE FROM {name} WHERE year IN ({marks})", years)
+            conn.execute(f"INSERT INTO {name} {select} WHERE year IN ({marks}) GROUP BY {', '.join(key)}", years)
+        elif zipcodes:
+            zips = sorted(zipcodes)
+            zip_marks = ", ".join("?" for _ in zips)
+            conn.execute(f"DELETE FROM {name} WHERE zipcode IN ({zip_marks})", zips)
+            conn.execute(f"INSERT INTO {name} {select} WHERE zipcode IN ({zip_marks}) GROUP BY {', '.join(key)}", zips)
+    _record_state(conn)
+    if commit:
+        conn.commit()
+
+
+class RollupRewriter:
+    def __init__(self, conn: sqlite3.Connection):
+        """
+        Rewrites aggregate queries over `demographics` to read a rollup table
+        when the result is provably the same.
+
+        Only a narrow query shape is accepted: a single SELECT over the base
+        table whose WHERE and GROUP BY reference only rollup key columns and
+        whose other column references are SUM/AVG/MIN/MAX/COUNT of a column
+        or COUNT(*). Anything else is left alone.
+
+        Rewriting is disabled when the base table's content fingerprint no
+        longer matches the one recorded at the last build_rollups/
+        refresh_rollups (rows loaded or edited without refreshing the
+        rollups).
+
+        Args:
+            conn (sqlite3.Connection): Connection whose rollup tables to use
+        """
+        self.rollups = existing_rollups(conn)
+        self.stale = bool(self.rollups) and not rollups_fresh(conn)
+        if self.stale:
+            self.rollups = {}
+        self.measures = {c.lower() for c in measure_columns(conn)} if self.rollups else set()
+        self.rewritten = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.rollups)
+
+    def _pick_rollup(self, needed: set, group: set) -> Optional[Tuple[str, Tuple[str, ...], bool]]:
+        # Prefer a rollup keyed exactly on the GROUP BY (no re-aggregation),
+        # otherwise the smallest one that still contains every needed column.
+        best = None
+        for name, key in self.rollups.items():
+            if not needed <= set(key):
+                continue
+            direct = bool(group) and set(key) == group
+            rank = (not direct, len(key))
+            if best is None or rank < best[0]:
+                best = (rank, name, key, direct)
+        return best and best[1:]
+
+    def _agg_sql(self, func: str, arg: str, direct: bool) -> Optional[str]:
+        func = func.lower()
+        arg = arg.lower()
+        if arg == "*":
+            if func != "count":
+                return None
+            return "row_count" if direct else "COALESCE(SUM(row_count), 0)"
+        if arg not in self.measures:
+            return None
+        if direct:
+            return {
+                "sum": f"sum_{arg}",
+                "min": f"min_{arg}",
+                "max": f"max_{arg}",
+                "count": f"cnt_{arg}",
+                "avg": f"(CAST(sum_{arg} AS REAL) / cnt_{arg})",
+            }[func]
+        return {
+            "sum": f"SUM(sum_{arg})",
+            "min": f"MIN(min_{arg})",
+            "max": f"MAX(max_{arg})",
+            "count": f"COALESCE(SUM(cnt_{arg}), 0)",
+            "avg": f"(CAST(SUM(sum_{arg}) AS REAL) / SUM(cnt_{arg}))",
+        }[func]
+
+    def rewrite(self, sql: str) -> Optional[str]:
+        """Equivalent rollup query for `sql`, or None if it cannot be proven"""
+        if not self.rollups:
+            return None
+
+        literals = []
+
+        def stash(match):
+            literals.append(match.group(0))
+            return f"'{len(literals) - 1}'"
+
+        text = _LITERAL_RE.sub(stash, sql.strip().rstrip(";").strip())
+        if ";" in text or _UNSUPPORTED_RE.search(text[len("select"):]):
+            return None
+        match = _QUERY_RE.match(text)
+        if not match:
+            return None
+        parts = {k: (v or "") for k, v in match.groupdict().items()}
+
+        group = [g.strip().lower() for g in parts["group"].split(",")] if parts["group"] else []
+        if any(not re.fullmatch(r"[a-z_][a-z0-9_]*", g) for g in group):
+            return None
+        where_cols = {c.lower() for c in _IDENT_RE.findall(parts["where"])} - _SQL_WORDS
+        if _AGG_RE.search(parts["where"]):
+            return None
+
+        # Ties in ORDER BY come back in an unspecified order, which the
+        # rollup cannot reproduce; only a total order (every group key
+        # column sorted on) is safe.
+        if group and parts["order"]:
+            order_cols = {c.lower() for c in _IDENT_RE.findall(_AGG_RE.sub("", parts["order"]))}
+            if not set(group) <= order_cols:
+                return None
+
+        picked = self._pick_rollup(where_cols | set(group), set(group))
+        if not picked:
+            return None
+        name, key, direct = picked
+
+        aliases = {a.lower() for a in _ALIAS_RE.findall(parts["select"])}
+        if aliases & set(key):
+            return None
+        found_agg = False
+
+        def replace_aggs(clause: str) -> Optional[str]:
+            nonlocal found_agg
+            failed = False
+
+            def repl(m):
+                nonlocal failed, found_agg
+                found_agg = True
+                out = self._agg_sql(m.group(1), m.group(2), direct)
+                if out is None:
+                    failed = True
+                    return m.group(0)
+                return out
+
+            out = _AGG_RE.sub(repl, clause)
+            if failed or re.search(r"\b(" + "|".join(_AGG_FUNCS) + r")\s*\(", _AGG_RE.sub("", clause), re.IGNORECASE):
+                return None
+            # Whatever is left outside the aggregates must be a group key
+            # (or alias); bare measure columns have no rollup equivalent.
+            allowed = set(group) | aliases | _SQL_WORDS
+            leftover = {c.lower() for c in _IDENT_RE.findall(_AGG_RE.sub("", clause))}
+            if not leftover <= allowed or "*" in _AGG_RE.sub("", clause):
+                return None
+            return out
+
+        new_parts = {}
+        for clause in ("select", "having", "order"):
+            if parts[clause]:
+                new_parts[clause] = replace_aggs(parts[clause])
+                if new_parts[clause] is None:
+                    return None
+        if not group and not found_agg:
+            return None
+
+        pieces = [f"SELECT {new_parts['select']} FROM {name}"]
+        if parts["where"]:
+            pieces.append(f"WHERE {parts['where']}")
+        if group:
+            pieces.append(f"GROUP BY {parts['group']}")
+        if parts["having"]:
+            pieces.append(f"HAVING {new_parts['having']}")
+        if parts["order"]:
+            pieces.append(f"ORDER BY {new_parts['order']}")
+        elif group:
+            # The base query comes back in GROUP BY order (SQLite sorts to
+            # group); the rollup's key index may not follow the same column
+            # order, so spell it out.
+            pieces.append(f"ORDER BY {parts['group']}")
+        if parts["limit"]:
+            pieces.append(f"LIMIT {parts['limit']}")
+        rewritten = " ".join(pieces)
+
+        self.rewritten += 1
+        return re.sub(r"'(\d+)'", lambda m: literals[int(m.group(1))], rewritten)
+
+
+def check_stale_refusal(conn: sqlite3.Connection) -> Optional[str]:
+    """
+    Change one measure value in an in-memory copy of `conn`, keeping the row
+    count, and check that RollupRewriter refuses to rewrite. Returns None on
+    success, else what went wrong.
+    """
+    copy = sqlite3.connect(":memory:")
+    try:
+        conn.backup(copy)
+        measures = measure_columns(copy)
+        probe = f"SELECT year, SUM({measures[0]}) FROM {BASE_TABLE} GROUP BY year ORDER BY year"
+        if RollupRewriter(copy).rewrite(probe) is None:
+            return "rollups are not used on the unmodified copy"
+        year, zipcode = copy.execute(f"SELECT year, zipcode FROM {BASE_TABLE} LIMIT 1").fetchone()
+        copy.execute(f"UPDATE {BASE_TABLE} SET {measures[0]} = COALESCE({measures[0]}, 0) + 1 "
+                     f"WHERE year = ? AND zipcode = ?", (year, zipcode))
+        copy.commit()
+        if RollupRewriter(copy).rewrite(probe) is not None:
+            return f"rewrite still used after changing {measures[0]} for ({year}, {zipcode})"
+        return None
+    finally:
+        copy.close()
+
+
+def verify_workload(conn: sqlite3.Connection, workload: List[str]) -> Tuple[int, int, List[str]]:
+    """Run every rewritable query both ways; return (rewritten, total, mismatches)"""
+    rewriter = RollupRewriter(conn)
+    rewritten = 0
+    mismatches = []
+    for sql in workload:
+        new_sql = rewriter.rewrite(sql)
+        if new_sql is None:
+            continue
+        rewritten += 1
+        try:
+            expected = conn.execute(sql).fetchall()
+        except sqlite3.Error:
+            continue
+        try:
+            actual = conn.execute(new_sql).fetchall()
+        except sqlite3.Error as e:
+            mismatches.append(f"{sql}\n  -> {new_sql}\n  error: {e}")
+            continue
+        if expected != actual:
+            mismatches.append(f"{sql}\n  -> {new_sql}")
+    return rewritten, len(workload), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialized rollups for the demographics table")
+    parser.add_argument("command", choices=["build", "refresh", "rewrite", "verify"])
+    parser.add_argument("--db", type=str, default=DB_PATH, help="SQLite database")
+    parser.add_argument("--years", type=int, nargs="*", help="Years to refresh (default: rebuild all)")
+    parser.add_argument("--sql", type=str, help="Query to rewrite (rewrite command)")
+    parser.add_argument("--workload", type=str, default="data/nl_sql.jsonl", help="JSONL workload (verify command)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.command == "build":
+        print(f"Built rollups: {', '.join(build_rollups(conn))}")
+    elif args.command == "refresh":
+        refresh_rollups(conn, args.years)
+        print("Rollups refreshed")
+    elif RollupRewriter(conn).stale:
+        print("Rollups are stale (base table changed since the last build); run the refresh command")
+    elif args.command == "rewrite":
+        print(RollupRewriter(conn).rewrite(args.sql or sys.stdin.read()) or "(no equivalent rollup query)")
+    else:
+        workload = []
+        with open(args.workload, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    workload += [row[k] for k in ("sql", "gold_sql", "pred_sql") if row.get(k)]
+        rewritten, total, mismatches = verify_workload(conn, workload)
+        print(f"Rewritten {rewritten}/{total} queries, {len(mismatches)} mismatches")
+        for m in mismatches:
+            print(m)
+        failure = check_stale_refusal(conn)
+        print(f"Stale rollup check: {'FAILED, ' + failure if failure else 'rewrite refused after a value change'}")
+        if mismatches or failure:
+            conn.close()
+            sys.exit(1)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import os
+import re
+import json
+import shutil
+import sqlite3
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from rollups import existing_rollups, build_rollups
+from db_connections import DEFAULT_DB_PATH
+
+BASE_TABLE = "demographics"
+DB_PATH = DEFAULT_DB_PATH
+
+# "rowid":  plain rowid table with declared (not enforced) column types
+# "strict": STRICT table clustered on CLUSTER_KEY (WITHOUT ROWID)
+LAYOUTS = ("rowid", "strict")
+DEFAULT_LAYOUT = "rowid"
+
+# One row per (year, zipcode); rows are stored in this order, so year and
+# year+zipcode lookups are primary-key range scans.
+CLUSTER_KEY = ("year", "zipcode")
+TEXT_COLUMNS = ("id", "zipcode")
+
+# The strict layout stores zipcode as an INTEGER (a 5-digit ZCTA fits in
+# 4 bytes instead of a 5-character string). Every zipcode must then
+# round-trip through printf('%05d', zipcode): digits only, zero-padded to
+# ZIPCODE_WIDTH and never longer with a leading zero (synthetic_data.py's
+# larger replica codes qualify). Text literals still match through the
+# column's INTEGER affinity (zipcode = '30005'), but results return numbers.
+ZIPCODE_WIDTH = 5
+
+_LIMIT_RE = re.compile(r"\s+limit\s+\d+(?:\s*(?:,|offset)\s*\d+)?\s*;?\s*$", re.IGNORECASE)
+
+# Census ZCTA label prefix stripped by createDB.py ("ZCTA5 30005" -> "30005").
+ZCTA_PREFIX = "ZCTA5"
+
+
+def _is_text(col: str, integer_zipcode: bool) -> bool:
+    return col in TEXT_COLUMNS and not (col == "zipcode" and integer_zipcode)
+
+
+def strict_table_sql(columns: List[str], table: str = BASE_TABLE, integer_zipcode: bool = True) -> str:
+    """CREATE TABLE for the strict layout: INTEGER enforced, id TEXT, clustered on CLUSTER_KEY"""
+    lines = []
+    for col in columns:
+        if col in CLUSTER_KEY:
+            lines.append(f"    {col} {'TEXT' if _is_text(col, integer_zipcode) else 'INTEGER'} NOT NULL")
+        elif _is_text(col, integer_zipcode):
+            lines.append(f"    {col} TEXT")
+        else:
+            lines.append(f"    {col} INTEGER DEFAULT 0")
+    lines.append(f"    PRIMARY KEY ({', '.join(CLUSTER_KEY)})")
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n" + ",\n".join(lines) + "\n) STRICT, WITHOUT ROWID;"
+
+
+def table_layout(conn: sqlite3.Connection, table: str = BASE_TABLE) -> str:
+    """"strict" if `table` is a STRICT WITHOUT ROWID table, else "rowid" """
+    row = conn.execute("SELECT wr, strict FROM pragma_table_list WHERE name = ? AND schema = 'main'", (table,)).fetchone()
+    if row is None:
+        raise ValueError(f"no such table: {table}")
+    return "strict" if row[0] and row[1] else "rowid"
+
+
+def _columns(conn: sqlite3.Connection, table: str = BASE_TABLE) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _zipcode_sql(normalize_zipcode: bool) -> str:
+    return f"TRIM(REPLACE(zipcode, '{ZCTA_PREFIX}', ''))" if normalize_zipcode else "zipcode"
+
+
+def check_migratable(conn: sqlite3.Connection, table: str = BASE_TABLE, normalize_zipcode: bool = False,
+                     integer_zipcode: bool = True) -> List[str]:
+    """Reasons `table` cannot be stored in the strict layout (empty if it can)"""
+    columns = _columns(conn, table)
+    problems = []
+    for col in CLUSTER_KEY:
+        if col not in columns:
+            problems.append(f"missing key column {col}")
+    if problems:
+        return problems
+
+    key = ", ".join(CLUSTER_KEY)
+    dupes = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} GROUP BY {key} HAVING COUNT(*) > 1)").fetchone()[0]
+    if dupes:
+        problems.append(f"{dupes} duplicate ({key}) keys")
+    nulls = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {' OR '.join(c + ' IS NULL' for c in CLUSTER_KEY)}").fetchone()[0]
+    if nulls:
+        problems.append(f"{nulls} rows with a NULL key")
+    for col in columns:
+        if col in TEXT_COLUMNS:
+            continue
+        # Whole-valued REALs convert losslessly; anything else would be rejected.
+        bad = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE {col} IS NOT NULL AND "
+            f"(typeof({col}) NOT IN ('integer', 'real') OR {col} != CAST({col} AS INTEGER))").fetchone()[0]
+        if bad:
+            problems.append(f"{bad} non-integer values in {col}")
+    if integer_zipcode and "zipcode" in columns:
+        zipcode = f"CAST({_zipcode_sql(normalize_zipcode)} AS TEXT)"
+        bad = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE zipcode IS NOT NULL AND "
+            f"({zipcode} = '' OR {zipcode} GLOB '*[^0-9]*' OR "
+            f"printf('%0{ZIPCODE_WIDTH}d', CAST({zipcode} AS INTEGER)) != {zipcode})").fetchone()[0]
+        if bad:
+            hint = "" if normalize_zipcode else f" (strip the '{ZCTA_PREFIX} ' prefix with normalize_zipcode)"
+            problems.append(f"{bad} zipcodes that are not zero-padded {ZIPCODE_WIDTH}-digit numbers{hint}")
+    return problems
+
+
+def _select_expr(col: str, normalize_zipcode: bool, integer_zipcode: bool) -> str:
+    if col == "zipcode":
+        cast = "INTEGER" if integer_zipcode else "TEXT"
+        return f"CAST({_zipcode_sql(normalize_zipcode)} AS {cast}) AS zipcode"
+    if col in TEXT_COLUMNS:
+        return f"CAST({col} AS TEXT) AS {col}"
+    return f"CAST({col} AS INTEGER) AS {col}"
+
+
+def migrate_to_strict(conn: sqlite3.Connection, normalize_zipcode: bool = False,
+                      table: str = BASE_TABLE, integer_zipcode: bool = True) -> int:
+    """
+    Rewrite `table` in place into the strict layout and return the row count.
+
+    Whole-valued REALs become INTEGERs and NULLs are kept, so every query
+    returns the same rows (numbers compare equal, now with one type), except
+    that zipcodes come back as numbers unless integer_zipcode is False.
+    Indexes on the table are recreated and rollup tables rebuilt.
+
+    Args:
+        conn (sqlite3.Connection): Writable connection
+        normalize_zipcode (bool): Also strip the "ZCTA5 " label prefix, as
+            createDB.py does (changes zipcode values)
+        table (str): Table to migrate
+        integer_zipcode (bool): Store zipcode as INTEGER (see ZIPCODE_WIDTH);
+            False keeps it TEXT
+    """
+    if table_layout(conn, table) == "strict":
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    problems = check_migratable(conn, table, normalize_zipcode, integer_zipcode)
+    if problems:
+        raise ValueError(f"{table} cannot use the strict layout: {'; '.join(problems)}")
+
+    columns = _columns(conn, table)
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))]
+    staging = f"{table}_strict"
+    select = ", ".join(_select_expr(col, normalize_zipcode, integer_zipcode) for col in columns)
+
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {staging}")
+        conn.execute(strict_table_sql(columns, staging, integer_zipcode))
+        conn.execute(f"INSERT INTO {staging} ({', '.join(columns)}) "
+                     f"SELECT {select} FROM {table} ORDER BY {', '.join(CLUSTER_KEY)}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+        for sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if existing_rollups(conn):
+        build_rollups(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _zipcodes_as_int(rows: List[Tuple]) -> List[Tuple]:
+    # Puts a TEXT-zipcode result in the form the INTEGER-zipcode layout returns.
+    return [tuple(int(v) if isinstance(v, str) and len(v) == ZIPCODE_WIDTH and v.isdigit() else v for v in row)
+            for row in rows]
+
+
+def _same_without_limit(src: sqlite3.Connection, dst: sqlite3.Connection, sql: str) -> bool:
+    # A LIMIT cutting through tied rows may keep different ones; the query is
+    # still equivalent if the uncut results hold the same rows.
+    unlimited = _LIMIT_RE.sub("", sql)
+    if unlimited == sql:
+        return False
+    return Counter(_zipcodes_as_int(src.execute(unlimited).fetchall())) == \
+        Counter(_zipcodes_as_int(dst.execute(unlimited).fetchall()))
+
+
+def compare_workload(src: sqlite3.Connection, dst: sqlite3.Connection,
+                     workload: List[str]) -> Tuple[int, int, List[str]]:
+    """
+    Run every query on both DBs; return (compared, reordered, mismatches).
+
+    `reordered` counts queries returning the same rows in a different order:
+    the clustered layout changes the scan order, so rows that tie under
+    ORDER BY (or queries without one) may come back permuted. Zipcodes are
+    compared as numbers, since the strict layout stores them as INTEGER.
+    """
+    compared = reordered = 0
+    mismatches = []
+    for sql in workload:
+        try:
+            expected = _zipcodes_as_int(src.execute(sql).fetchall())
+        except sqlite3.Error:
+            continue
+        compared += 1
+        try:
+            actual = _zipcodes_as_int(dst.execute(sql).fetchall())
+        except sqlite3.Error as e:
+            mismatches.append(f"{sql}\n  error: {e}")
+            continue
+        if expected == actual:
+            continue
+        if Counter(expected) == Counter(actual) or _same_without_limit(src, dst, sql):
+            reordered += 1
+        else:
+            mismatches.append(sql)
+    return compared, reordered, mismatches
+
+
+def layout_report(db_path: str) -> Dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        types = {}
+        for col in _columns(conn):
+            types[col] = dict(conn.execute(f"SELECT typeof({col}), COUNT(*) FROM {BASE_TABLE} GROUP BY 1").fetchall())
+        return {"layout": table_layout(conn), "size": os.path.getsize(db_path), "types": types}
+    finally:
+        conn.close()
+
+
+def _load_workload(path: str) -> List[str]:
+    workload = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                workload += [row[k] for k in ("sql", "gold_sql", "pred_sql") if row.get(k)]
+    return workload
+
+
+def migrate_file(src_path: str, dst_path: Optional[str] = None, normalize_zipcode: bool = False,
+                 integer_zipcode: bool = True) -> str:
+    """Migrate a copy of `src_path` (or the file itself if dst_path is None); returns the migrated path"""
+    if dst_path and os.path.abspath(dst_path) != os.path.abspath(src_path):
+        shutil.copyfile(src_path, dst_path)
+    else:
+        dst_path = src_path
+    conn = sqlite3.connect(dst_path, isolation_level=None)
+    try:
+        migrate_to_strict(conn, normalize_zipcode, integer_zipcode=integer_zipcode)
+    finally:
+        conn.close()
+    return dst_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the demographics table to the STRICT / WITHOUT ROWID layout")
+    parser.add_argument("--db", type=str, default=DB_PATH, help="SQLite database to migrate")
+    parser.add_argument("--out", type=str, default=None, help="Write the migrated DB here (default: in place)")
+    parser.add_argument("--normalize_zipcode", action="store_true", help=f"Strip the '{ZCTA_PREFIX} ' prefix from zipcodes")
+    parser.add_argument("--text_zipcode", action="store_true", help="Keep zipcode as TEXT instead of INTEGER")
+    parser.add_argument("--check", action="store_true", help="Only report the current layout and blockers")
+    parser.add_argument("--verify", type=str, default=None, metavar="WORKLOAD",
+                        help="JSONL workload to compare between the original and migrated DB (needs --out)")
+    args = parser.parse_args()
+
+    before = layout_report(args.db)
+    conn = sqlite3.connect(args.db)
+    integer_zipcode = not args.text_zipcode
+    problems = check_migratable(conn, normalize_zipcode=args.normalize_zipcode,
+                                integer_zipcode=integer_zipcode) if before["layout"] == "rowid" else []
+    conn.close()
+    print(f"{args.db}: {before['layout']} layout, {before['size']:,} bytes")
+    for col, counts in before["types"].items():
+        if len(counts) > 1 or ("real" in counts and col not in TEXT_COLUMNS):
+            print(f"  {col}: {counts}")
+    if args.check or problems:
+        for p in problems:
+            print(f"  blocker: {p}")
+        return
+
+    path = migrate_file(args.db, args.out, args.normalize_zipcode, integer_zipcode)
+    after = layout_report(path)
+    print(f"{path}: {after['layout']} layout, {after['size']:,} bytes")
+
+    if args.verify:
+        if path == args.db:
+            print("--verify needs --out (the original DB was migrated in place)")
+            return
+        src, dst = sqlite3.connect(args.db), sqlite3.connect(path)
+        compared, reordered, mismatches = compare_workload(src, dst, _load_workload(args.verify))
+        src.close()
+        dst.close()
+        print(f"Compared {compared} queries: {reordered} differ only in the order of tied rows, "
+              f"{len(mismatches)} mismatches")
+        for m in mismatches:
+            print(m)
+
+
+if __name__ == "__main__":
+    main()
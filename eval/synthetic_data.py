@@ -0,0 +1,280 @@
+import os
+import csv
+import sqlite3
+import argparse
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+from db_connections import DEFAULT_DB_PATH
+
+BASE_TABLE = "demographics"
+SOURCE_DB_PATH = DEFAULT_DB_PATH
+
+# Replica 0 is the real table; replicas 1..scale-1 are synthetic zipcodes
+# derived from it. TEXT zipcodes get a ZIP+4 style suffix ("ZCTA5 30005" ->
+# "ZCTA5 30005-0001"), so keys stay unique and prefix filters
+# (zipcode LIKE 'ZCTA5 30%') keep their selectivity. INTEGER zipcodes (the
+# strict layout, see storage_layout.py) become replica * ZIP_REPLICA_OFFSET
+# + zipcode, above every real 5-digit ZCTA.
+MAX_SCALE = 10000
+ZIP_REPLICA_OFFSET = 100000
+DEFAULT_SEED = 0
+
+# Spread of a synthetic zipcode's population around its template zipcode
+# (log-normal sigma, fixed across years) and its year-to-year jitter.
+POPULATION_SIGMA = 0.25
+YEAR_SIGMA = 0.02
+# Dirichlet concentration around the template's race/ethnicity shares
+# (higher = closer to the real mix).
+SHARE_CONCENTRATION = 200.0
+
+# Rows written per batch.
+BATCH_ROWS = 50000
+
+RACE_COLUMNS = (
+    "white", "black", "american_indian_and_alaska_native", "asian",
+    "native_hawaiian_and_other_pacific_islander", "some_other_race",
+)
+COLUMNS = (
+    "year", "id", "zipcode", "race_total_population", "one_race", "two_or_more_races",
+) + RACE_COLUMNS + ("hispanic_or_latino_total", "hispanic_or_latino", "not_hispanic_or_latino")
+
+# Columns a census year may leave unreported (NULL, or 0 once createDB.py
+# has filled NULLs).
+OPTIONAL_COLUMNS = RACE_COLUMNS + ("two_or_more_races",)
+
+# Consistency rules every generated table satisfies (all hold in the real
+# data). Each query counts violating rows.
+INVARIANTS = {
+    "unique (year, zipcode)":
+        f"SELECT COUNT(*) - COUNT(DISTINCT year || '|' || zipcode) FROM {BASE_TABLE}",
+    "hispanic_or_latino + not_hispanic_or_latino = hispanic_or_latino_total":
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE hispanic_or_latino + not_hispanic_or_latino != hispanic_or_latino_total",
+    "hispanic_or_latino_total = race_total_population":
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE hispanic_or_latino_total != race_total_population",
+    "one_race <= race_total_population":
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE one_race > race_total_population",
+    "sum of race columns <= one_race":
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE {' + '.join(f'IFNULL({c}, 0)' for c in RACE_COLUMNS)} > one_race",
+    "no negative counts":
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE "
+        f"{' OR '.join(f'{c} < 0' for c in COLUMNS if c not in ('year', 'id', 'zipcode'))}",
+    "same NULL columns for every zipcode in a year":
+        f"SELECT COUNT(*) FROM (SELECT year FROM {BASE_TABLE} GROUP BY year HAVING "
+        f"{' OR '.join(f'COUNT({c}) NOT IN (0, COUNT(*))' for c in OPTIONAL_COLUMNS)})",
+}
+
+
+def reported_columns(conn: sqlite3.Connection) -> Dict[int, Tuple[str, ...]]:
+    """Optional columns each year actually reports (any non-NULL, non-zero value)"""
+    flags = ", ".join(f"MAX(IFNULL({c}, 0) != 0)" for c in OPTIONAL_COLUMNS)
+    return {row[0]: tuple(c for c, on in zip(OPTIONAL_COLUMNS, row[1:]) if on)
+            for row in conn.execute(f"SELECT year, {flags} FROM {BASE_TABLE} GROUP BY year")}
+
+
+def check_invariants(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Number of violating rows for each rule in INVARIANTS plus the per-year sum rules"""
+    result = {name: conn.execute(sql).fetchone()[0] for name, sql in INVARIANTS.items()}
+    reported = reported_columns(conn)
+    # Exact sums only hold in years that report every part.
+    years = [y for y, cols in reported.items() if "two_or_more_races" in cols]
+    result["one_race + two_or_more_races = race_total_population (reporting years)"] = conn.execute(
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE year IN ({', '.join('?' for _ in years)}) "
+        f"AND one_race + two_or_more_races != race_total_population", years).fetchone()[0]
+    years = [y for y, cols in reported.items() if set(RACE_COLUMNS) <= set(cols)]
+    result["sum of race columns = one_race (reporting years)"] = conn.execute(
+        f"SELECT COUNT(*) FROM {BASE_TABLE} WHERE year IN ({', '.join('?' for _ in years)}) "
+        f"AND {' + '.join(RACE_COLUMNS)} != one_race", years).fetchone()[0]
+    return result
+
+
+class _Template:
+    # The real table as arrays; NULL counts are stored as -1.
+    def __init__(self, conn: sqlite3.Connection):
+        rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM {BASE_TABLE}").fetchall()
+        if not rows:
+            raise ValueError(f"{BASE_TABLE} is empty")
+        self.rows = rows
+        self.n = len(rows)
+        self.year = np.array([r[0] for r in rows], dtype=np.int64)
+        self.ids = [r[1] for r in rows]
+        self.zipcodes = [r[2] for r in rows]
+        zip_types = {type(z) for z in self.zipcodes}
+        if zip_types not in ({str}, {int}):
+            raise ValueError(f"zipcode must be all TEXT or all INTEGER, found {sorted(t.__name__ for t in zip_types)}")
+        self.integer_zipcode = zip_types == {int}
+        counts = np.array([[-1 if v is None else v for v in r[3:]] for r in rows], dtype=np.float64)
+        self.counts = {c: counts[:, i].astype(np.int64) for i, c in enumerate(COLUMNS[3:])}
+        # Population multipliers are drawn per zipcode so a synthetic
+        # zipcode keeps its template's year-over-year trend.
+        zip_index = {z: i for i, z in enumerate(dict.fromkeys(self.zipcodes))}
+        self.zip_id = np.array([zip_index[z] for z in self.zipcodes], dtype=np.int64)
+        self.n_zipcodes = len(zip_index)
+        # Per row: is the column reported in that row's year? Unreported
+        # columns are copied from the template (NULL or 0).
+        reported = reported_columns(conn)
+        self.reported = {c: np.array([c in reported[y] for y in self.year.tolist()], dtype=bool)
+                         for c in OPTIONAL_COLUMNS}
+
+
+def _shares(rng: np.random.Generator, parts: np.ndarray) -> np.ndarray:
+    # Dirichlet draw per row around the row's own shares (gamma trick, vectorized).
+    total = parts.sum(axis=1, keepdims=True)
+    mean = np.divide(parts, total, out=np.zeros_like(parts, dtype=np.float64), where=total > 0)
+    draws = rng.gamma(mean * SHARE_CONCENTRATION)
+    norm = draws.sum(axis=1, keepdims=True)
+    return np.divide(draws, norm, out=np.zeros_like(draws), where=norm > 0)
+
+
+def _split(rng: np.random.Generator, n: np.ndarray, parts: np.ndarray) -> np.ndarray:
+    """Split each n[i] into len(parts[i]) counts, shares jittered around parts[i]"""
+    out = np.zeros(parts.shape, dtype=np.int64)
+    live = n > 0
+    if live.any():
+        p = _shares(rng, parts[live].astype(np.float64))
+        # Rows whose template has no mass here keep everything in the last part.
+        p[p.sum(axis=1) == 0, -1] = 1.0
+        out[live] = rng.multinomial(n[live], p / p.sum(axis=1, keepdims=True))
+    return out
+
+
+def synthesize_replica(template: _Template, replica: int, seed: int = DEFAULT_SEED) -> Dict[str, np.ndarray]:
+    """
+    Counts for one synthetic copy of the table (replica >= 1), as column
+    arrays aligned with the template rows (-1 = NULL).
+
+    Each replica has its own random stream (seeded by (seed, replica)), so
+    output does not depend on how replicas are batched.
+    """
+    rng = np.random.default_rng([seed, replica])
+    t = template.counts
+    zip_scale = rng.lognormal(0.0, POPULATION_SIGMA, template.n_zipcodes)[template.zip_id]
+    year_noise = rng.lognormal(0.0, YEAR_SIGMA, template.n)
+    total = np.rint(t["race_total_population"] * zip_scale * year_noise).astype(np.int64)
+
+    out = {"race_total_population": total, "hispanic_or_latino_total": total}
+    hisp = _split(rng, total, np.stack([t["hispanic_or_latino"], t["not_hispanic_or_latino"]], axis=1))
+    out["hispanic_or_latino"], out["not_hispanic_or_latino"] = hisp[:, 0], hisp[:, 1]
+
+    # one_race vs the rest of the population (two_or_more_races where reported).
+    single = _split(rng, total, np.stack([t["one_race"], t["race_total_population"] - t["one_race"]], axis=1))
+    one_race = single[:, 0]
+    out["one_race"] = one_race
+    out["two_or_more_races"] = np.where(template.reported["two_or_more_races"], single[:, 1], t["two_or_more_races"])
+
+    # Reported race columns split one_race; an extra bucket holds the part
+    # of one_race the template's reported columns do not cover.
+    races = np.stack([t[c] for c in RACE_COLUMNS], axis=1)
+    reported = np.stack([template.reported[c] for c in RACE_COLUMNS], axis=1)
+    covered = np.where(reported, np.maximum(races, 0), 0)
+    rest = np.maximum(t["one_race"] - covered.sum(axis=1), 0)
+    split = _split(rng, one_race, np.concatenate([covered, rest[:, None]], axis=1))
+    for i, c in enumerate(RACE_COLUMNS):
+        out[c] = np.where(reported[:, i], split[:, i], races[:, i])
+    return out
+
+
+def _suffix(value: str, replica: int) -> str:
+    return f"{value}-{replica:04d}"
+
+
+def _synthetic_zipcodes(template: _Template, replica: int) -> list:
+    if template.integer_zipcode:
+        return [replica * ZIP_REPLICA_OFFSET + z for z in template.zipcodes]
+    return [_suffix(z, replica) for z in template.zipcodes]
+
+
+def iter_rows(template: _Template, scale: int, seed: int = DEFAULT_SEED) -> Iterator[List[tuple]]:
+    """Batches of rows for a table `scale` times the template (real rows first)"""
+    if not 1 <= scale <= MAX_SCALE:
+        raise ValueError(f"scale must be between 1 and {MAX_SCALE}")
+    yield [tuple(r) for r in template.rows]
+    count_columns = COLUMNS[3:]
+    for replica in range(1, scale):
+        counts = synthesize_replica(template, replica, seed)
+        columns = [template.year.tolist(),
+                   [_suffix(v, replica) for v in template.ids],
+                   _synthetic_zipcodes(template, replica)]
+        for c in count_columns:
+            values = counts[c].tolist()
+            columns.append([None if v < 0 else v for v in values])
+        rows = list(zip(*columns))
+        for start in range(0, len(rows), BATCH_ROWS):
+            yield rows[start:start + BATCH_ROWS]
+
+
+def _table_sql(conn: sqlite3.Connection) -> str:
+    return conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (BASE_TABLE,)).fetchone()[0]
+
+
+def write_sqlite(src: sqlite3.Connection, out_path: str, scale: int, seed: int = DEFAULT_SEED) -> int:
+    """Write a scaled table to a new SQLite DB with the source's schema; returns the row count"""
+    if os.path.exists(out_path):
+        os.remove(out_path)
+    template = _Template(src)
+    out = sqlite3.connect(out_path)
+    out.execute("PRAGMA synchronous = OFF")
+    out.execute("PRAGMA journal_mode = MEMORY")
+    out.execute(_table_sql(src))
+    insert = f"INSERT INTO {BASE_TABLE} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+    total = 0
+    try:
+        for batch in iter_rows(template, scale, seed):
+            out.executemany(insert, batch)
+            total += len(batch)
+        out.commit()
+    finally:
+        out.close()
+    return total
+
+
+def write_csv(src: sqlite3.Connection, out_path: str, scale: int, seed: int = DEFAULT_SEED) -> int:
+    """Write a scaled table as CSV in createDB.py's input format; returns the row count"""
+    template = _Template(src)
+    total = 0
+    with open(out_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for batch in iter_rows(template, scale, seed):
+            writer.writerows(["" if v is None else v for v in row] for row in batch)
+            total += len(batch)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded synthetic scale-up of the demographics table")
+    parser.add_argument("--db", type=str, default=SOURCE_DB_PATH, help="Source SQLite database (real data)")
+    parser.add_argument("--scale", type=int, default=10, help="Output size as a multiple of the source table (e.g. 10, 100, 1000)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed (same seed + scale = same table)")
+    parser.add_argument("--out", type=str, help="Output .db (SQLite) or .csv (input for createDB.py --csv)")
+    parser.add_argument("--check", action="store_true", help="Only check the consistency rules on --db")
+    args = parser.parse_args()
+
+    if args.check or not args.out:
+        conn = sqlite3.connect(args.db)
+        for name, bad in check_invariants(conn).items():
+            print(f"  {'OK ' if not bad else 'BAD'} {name}" + (f" ({bad} rows)" if bad else ""))
+        conn.close()
+        return
+
+    src = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    try:
+        if args.out.endswith(".csv"):
+            total = write_csv(src, args.out, args.scale, args.seed)
+        else:
+            total = write_sqlite(src, args.out, args.scale, args.seed)
+    finally:
+        src.close()
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {total:,} rows ({args.scale}x) to {args.out} in {elapsed:.1f}s")
+
+    if not args.out.endswith(".csv"):
+        conn = sqlite3.connect(args.out)
+        violations = {name: bad for name, bad in check_invariants(conn).items() if bad}
+        conn.close()
+        print("Consistency rules: " + ("all hold" if not violations else f"VIOLATED {violations}"))
+
+
+if __name__ == "__main__":
+    main()
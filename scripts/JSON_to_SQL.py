@@ -2,20 +2,70 @@ import json
 import os
 import re
 import ast
+import sys
+import time
+import orjson
+import argparse
+from functools import lru_cache
+from light_ir import LightIR
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval"))
+from jsonl_io import JSONLIndex, JSONLReader, JSONLWriter
+from execution_memo import ExecutionMemo
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_FILE = os.path.join(BASE_DIR, "..", "data", "eval_ready", "nl_to_json_v3.jsonl")
 OUTPUT_FILE = os.path.join(BASE_DIR, "..", "data", "eval_ready", "nl_to_json_sql_converted.jsonl")
 GOLD_DATA_FILE = os.path.join(BASE_DIR, "..", "data", "nl_json_sql.jsonl")
 
+AGG_PATTERN = re.compile(r"(SUM|AVG|COUNT|MIN|MAX)\s*\(", re.IGNORECASE)
+
+# Rows converted between checkpoints of a streaming run (see convert_file).
+CHECKPOINT_EVERY = 1000
+CHECKPOINT_SUFFIX = ".ckpt"
+
+# Distinct plans kept by a PlanTranslator.
+TRANSLATION_MEMO_ENTRIES = 100000
+
+# Plan fields translate_json_to_sql() uppercases itself, so their casing
+# never changes the SQL text.
+_CASE_INSENSITIVE_KEYS = ("agg", "direction")
+
+# Memoized value for plans that do not translate.
+_FAILED = object()
+
 def clean_json_string(json_str):
     if not json_str: return None
     json_str = re.sub(r"```json\s*", "", json_str)
     json_str = re.sub(r"```\s*$", "", json_str)
     return json_str.strip()
 
+@lru_cache(maxsize=4096)
+def _list_literal(text):
+    # The same few IN-lists ("['2019', '2020']") recur across plans.
+    try:
+        parsed = ast.literal_eval(text)
+    except Exception:
+        return None
+    return tuple(parsed) if isinstance(parsed, list) else None
+
+
+def _condition_value(op, val):
+    """(value, SQL text) for a condition; "[...]" strings become lists and IN lists "(a,b)" """
+    if isinstance(val, str) and val.strip().startswith("[") and val.strip().endswith("]"):
+        parsed = _list_literal(val)
+        if parsed is not None: val = list(parsed)
+
+    if op.upper() == "IN" and isinstance(val, list):
+        formatted = [f"'{v}'" if isinstance(v, str) else str(v) for v in val]
+        return val, "(" + ",".join(formatted) + ")"
+    return val, str(val)
+
+
 def translate_json_to_sql(json_obj):
     try:
+        if isinstance(json_obj, LightIR):
+            json_obj = json_obj.to_dict()
         if isinstance(json_obj, str):
             json_obj = json.loads(json_obj)
 
@@ -49,27 +99,13 @@ def translate_json_to_sql(json_obj):
         where_parts = []
         having_parts = []
         
-        agg_pattern = re.compile(r"(SUM|AVG|COUNT|MIN|MAX)\s*\(", re.IGNORECASE)
+        agg_pattern = AGG_PATTERN
         all_conditions = json_obj.get("where", []) + json_obj.get("having", [])
 
         for cond in all_conditions:
             col = cond.get("column", "")
             op = cond.get("operator", "=")
-            val = cond.get("value")
-
-            if isinstance(val, str) and val.strip().startswith("[") and val.strip().endswith("]"):
-                try:
-                    parsed = ast.literal_eval(val)
-                    if isinstance(parsed, list): val = parsed
-                except: pass
-            
-            val_str = str(val)
-            if op.upper() == "IN" and isinstance(val, list):
-                formatted = [f"'{v}'" if isinstance(v, str) else str(v) for v in val]
-                val_str = "(" + ",".join(formatted) + ")"
-                clause_template = f"{{col}} IN {val_str}"
-            else:
-                clause_template = f"{{col}} {op} {val_str}"
+            val, val_str = _condition_value(op, cond.get("value"))
 
             is_agg = False
             
@@ -125,60 +161,276 @@ def translate_json_to_sql(json_obj):
     except Exception as e:
         return None
 
-def main():
-    print(f"Reading from: {INPUT_FILE}")
-    
-    id_to_gold_sql = {}
-    if os.path.exists(GOLD_DATA_FILE):
-        with open(GOLD_DATA_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip(): continue
+def canonical_plan(plan):
+    """
+    Copy of a dict plan with aggregate and direction names uppercased, for
+    memo keys only (the plan itself is translated as given). Operators keep
+    their case: it is copied into the SQL text.
+    """
+    if isinstance(plan, dict):
+        return {k: v.upper() if k in _CASE_INSENSITIVE_KEYS and isinstance(v, str) else canonical_plan(v)
+                for k, v in plan.items()}
+    if isinstance(plan, list):
+        return [canonical_plan(v) for v in plan]
+    return plan
+
+
+def plan_key(plan):
+    """Hashable memo key of a plan (sorted-key JSON), or None if it cannot be encoded"""
+    if isinstance(plan, LightIR):
+        return plan
+    try:
+        return orjson.dumps(plan, option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        return None
+
+
+class TranslationStats:
+    __slots__ = ("total", "hits", "misses", "failed", "seconds")
+
+    def __init__(self):
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"{self.total} plans translated in {self.seconds:.3f}s "
+                f"({self.hits} memo hits, {self.misses} misses, {self.failed} failed)")
+
+
+class PlanTranslator:
+    def __init__(self, max_entries: int = TRANSLATION_MEMO_ENTRIES):
+        """
+        translate_json_to_sql() with a memo keyed by the canonical plan.
+
+        Plans are keyed by their canonical form (see canonical_plan) as
+        sorted-key JSON, so predictions that differ only in key order or in
+        the casing of aggregates/directions share one translation; every
+        plan still translates to exactly the SQL translate_json_to_sql()
+        gives it. Plan strings are also memoized verbatim, which skips
+        decoding repeated model output.
+
+        Args:
+            max_entries (int): Distinct plans kept (least recently used evicted)
+        """
+        self.memo = ExecutionMemo(max_entries)
+        self.text_memo = ExecutionMemo(max_entries)
+        self.stats = TranslationStats()
+
+    def _translate_plan(self, plan):
+        # Returns (sql, memo hit). The plan as given is looked up first, so
+        # repeated plans skip canonicalization too.
+        key = plan_key(plan)
+        if key is None:
+            return translate_json_to_sql(plan), False
+        keys = [key]
+        sql = self.memo.get(key)
+        if sql is None and not isinstance(plan, LightIR):
+            canonical_key = plan_key(canonical_plan(plan))
+            if canonical_key != key:
+                sql = self.memo.get(canonical_key)
+                keys.append(canonical_key)
+        if sql is None:
+            sql = translate_json_to_sql(plan)
+            hit = False
+        else:
+            hit = True
+            sql = None if sql is _FAILED else sql
+        for k in keys:
+            self.memo.put(k, _FAILED if sql is None else sql)
+        return sql, hit
+
+    def translate(self, plan):
+        """
+        SQL for one plan (LightIR, dict or JSON string), or None if it does
+        not translate.
+        """
+        start = time.perf_counter()
+        if isinstance(plan, str):
+            sql = self.text_memo.get(plan)
+            hit = sql is not None
+            if not hit:
                 try:
-                    row = json.loads(line)
-                    if "id" in row and "sql" in row:
-                        id_to_gold_sql[row["id"]] = row["sql"]
-                except: continue
-
-    results = []
-    
-    if not os.path.exists(INPUT_FILE):
+                    sql, hit = self._translate_plan(json.loads(plan))
+                except ValueError:
+                    sql = None
+                self.text_memo.put(plan, _FAILED if sql is None else sql)
+            elif sql is _FAILED:
+                sql = None
+        else:
+            sql, hit = self._translate_plan(plan)
+
+        stats = self.stats
+        stats.total += 1
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+        if sql is None:
+            stats.failed += 1
+        stats.seconds += time.perf_counter() - start
+        return sql
+
+    def translate_many(self, plans):
+        """
+        Translate a batch of plans; returns (sqls, stats) where stats covers
+        this call only (self.stats keeps the running totals).
+        """
+        before = self.stats
+        self.stats = TranslationStats()
+        try:
+            sqls = [self.translate(plan) for plan in plans]
+            return sqls, self.stats
+        finally:
+            call = self.stats
+            before.total += call.total
+            before.hits += call.hits
+            before.misses += call.misses
+            before.failed += call.failed
+            before.seconds += call.seconds
+            self.stats = before
+
+
+def convert_row(data, translator, gold_index=None):
+    """Output row for one prediction record; gold SQL comes from `gold_index` only if the row has none"""
+    gen_json_str = data.get("pred_json", "")
+    translated_sql = None
+
+    if gen_json_str:
+        clean_str = clean_json_string(gen_json_str)
+        try:
+            parsed_json = json.loads(clean_str)
+        except:
+            translated_sql = "Error"
+        else:
+            translated_sql = translator.translate(parsed_json)
+
+    gold_sql = data.get("gold_sql") or data.get("sql")
+    if not gold_sql and gold_index is not None:
+        gold_sql = (gold_index.get(data.get("id")) or {}).get("sql")
+
+    return {
+        "id": data.get("id"),
+        "nl": data.get("nl"),
+        "gold_sql": gold_sql,
+        "pred_sql": translated_sql
+    }
+
+
+def iter_converted(reader, translator, gold_file=GOLD_DATA_FILE):
+    """
+    Lazily convert every record of `reader`.
+
+    The gold id index (see jsonl_io.JSONLIndex) is opened on the first row
+    that lacks gold SQL, so files that carry their own never touch it.
+    """
+    gold_index = None
+    try:
+        for data in reader:
+            if gold_index is None and not (data.get("gold_sql") or data.get("sql")) and os.path.exists(gold_file):
+                gold_index = JSONLIndex(gold_file)
+            yield convert_row(data, translator, gold_index)
+    finally:
+        if gold_index is not None:
+            gold_index.close()
+
+
+def _input_stamp(path):
+    st = os.stat(path)
+    return {"input": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_checkpoint(checkpoint_file, input_file, output_file):
+    """Saved progress for this input/output pair, or None if there is none or it is stale"""
+    try:
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(state.get(k) != v for k, v in _input_stamp(input_file).items()):
+        return None
+    if not os.path.exists(output_file) or os.path.getsize(output_file) < state.get("output_offset", 0):
+        return None
+    return state
+
+
+def save_checkpoint(checkpoint_file, state):
+    # Written to a temporary file and renamed, so a crash never leaves a torn checkpoint.
+    tmp = checkpoint_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, checkpoint_file)
+
+
+def convert_file(input_file, output_file, gold_file=GOLD_DATA_FILE, resume=False,
+                 checkpoint_every=CHECKPOINT_EVERY):
+    """
+    Stream `input_file` to `output_file`, writing rows as they are converted.
+
+    Every `checkpoint_every` rows the output is flushed and the input and
+    output positions are saved to `<output_file>.ckpt`. With resume=True a
+    run picks up from the last checkpoint: the output is cut back to the
+    checkpointed size and reading restarts at the matching input line.
+    The checkpoint is removed once the whole file has been converted.
+
+    Args:
+        input_file (str): Prediction JSONL (pred_json per row)
+        output_file (str): JSONL of id, nl, gold_sql, pred_sql
+        gold_file (str): JSONL with gold sql by id, for rows without one
+        resume (bool): Continue from a matching checkpoint if there is one
+        checkpoint_every (int): Rows between checkpoints
+
+    Returns:
+        (rows written this run, JSONLReader, PlanTranslator)
+    """
+    checkpoint_file = output_file + CHECKPOINT_SUFFIX
+    state = load_checkpoint(checkpoint_file, input_file, output_file) if resume else None
+    if state:
+        with open(output_file, "r+b") as f:
+            f.truncate(state["output_offset"])
+        reader = JSONLReader(input_file, state["input_offset"], state["input_line"])
+        print(f"Resuming after {state['rows']} rows (input line {state['input_line']})")
+    else:
+        state = dict(_input_stamp(input_file), rows=0)
+        reader = JSONLReader(input_file)
+
+    translator = PlanTranslator()
+    written = 0
+    with JSONLWriter(output_file, append=bool(state["rows"])) as writer:
+        for row in iter_converted(reader, translator, gold_file):
+            writer.write(row)
+            written += 1
+            if written % checkpoint_every == 0:
+                state.update(rows=state["rows"] + checkpoint_every, output_offset=writer.tell(),
+                             input_offset=reader.offset, input_line=reader.line_no + 1)
+                save_checkpoint(checkpoint_file, state)
+
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    return written, reader, translator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate predicted JSON plans to SQL")
+    parser.add_argument("--input", type=str, default=INPUT_FILE, help="Prediction JSONL (pred_json per row)")
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE, help="JSONL to write")
+    parser.add_argument("--gold", type=str, default=GOLD_DATA_FILE, help="JSONL with gold sql by id")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint of an interrupted run")
+    parser.add_argument("--checkpoint_every", type=int, default=CHECKPOINT_EVERY, help="Rows between checkpoints")
+    args = parser.parse_args()
+
+    print(f"Reading from: {args.input}")
+    if not os.path.exists(args.input):
         return
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip(): continue
-            try:
-                data = json.loads(line)
-            except: continue
-            
-            gen_json_str = data.get("pred_json", "")
-            translated_sql = None
-            
-            if gen_json_str:
-                clean_str = clean_json_string(gen_json_str)
-                try:
-                    parsed_json = json.loads(clean_str)
-                    translated_sql = translate_json_to_sql(parsed_json)
-                except:
-                    translated_sql = "Error"
-            
-            gold_sql = data.get("gold_sql") or data.get("sql")
-            if not gold_sql:
-                gold_sql = id_to_gold_sql.get(data.get("id"))
-
-            results.append({
-                "id": data.get("id"),
-                "nl": data.get("nl"),
-                "gold_sql": gold_sql,
-                "pred_sql": translated_sql
-            })
-            
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        for r in results:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-            
-    print(f"Translation Complete. Saved to: {OUTPUT_FILE}")
+    _, reader, translator = convert_file(args.input, args.output, args.gold, args.resume,
+                                         max(1, args.checkpoint_every))
+
+    print(reader.summary())
+    print(translator.stats)
+    print(f"Translation Complete. Saved to: {args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,252 @@
+import sys
+import json
+import time
+import argparse
+import sqlglot
+from sqlglot import exp
+
+from generate_json import light_json_from_tree, INPUT_FILE
+
+
+def load_sqls(path):
+    sqls = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                sql = json.loads(line).get("sql")
+                if sql:
+                    sqls.append(sql)
+    return sqls
+
+
+def reference_light_json_from_tree(parsed):
+    """
+    The previous IR extraction (one find/find_all tree walk per clause),
+    kept verbatim as the baseline for timing and for checking that
+    light_json_from_tree produces the same IR.
+    """
+    light_sql = {
+        "select": [],
+        "from": [],
+        "where": [],
+        "groupBy": [],
+        "orderBy": [],
+        "limit": None,
+        "having": []
+    }
+
+    for table in parsed.find_all(exp.Table):
+        light_sql["from"].append(table.name)
+
+    for expression in parsed.find_all(exp.Select):
+        for col_exp in expression.expressions:
+            col_info = {"column": None, "agg": None, "alias": None}
+            
+            if isinstance(col_exp, exp.Alias):
+                col_info["alias"] = col_exp.alias
+                child = col_exp.this
+            else:
+                child = col_exp
+
+            if isinstance(child, (exp.Sum, exp.Count, exp.Avg, exp.Min, exp.Max)):
+                func_name = child.sql().split('(')[0].upper()
+                col_info["agg"] = func_name
+
+                if isinstance(child.this, exp.Star):
+                    col_info["column"] = "*"
+                elif child.this is None:
+                    col_info["column"] = "*"
+                else:
+                    if hasattr(child.this, "name") and child.this.name:
+                        col_info["column"] = child.this.name
+                    else:
+                        col_info["column"] = child.this.sql()
+                    
+            elif isinstance(child, exp.Column):
+                col_info["column"] = child.name
+            else:
+                col_info["column"] = child.sql()
+
+            light_sql["select"].append(col_info)
+
+    if parsed.find(exp.Where):
+        where_expression = parsed.find(exp.Where).this
+        
+        conditions = []
+        
+        def collect_conditions(node):
+            if isinstance(node, exp.And):
+                collect_conditions(node.left)
+                collect_conditions(node.right)
+            else:
+                conditions.append(node)
+
+        collect_conditions(where_expression)
+
+        for cond in conditions:
+            if isinstance(cond, (exp.EQ, exp.GT, exp.LT, exp.GTE, exp.LTE, exp.NEQ, exp.Like)):
+                operator_map = {
+                    exp.EQ: "=", exp.GT: ">", exp.LT: "<", 
+                    exp.GTE: ">=", exp.LTE: "<=", exp.NEQ: "!=", exp.Like: "LIKE"
+                }
+                
+                val_node = cond.expression
+                if isinstance(val_node, exp.Literal):
+                    val = val_node.name if val_node.is_string else val_node.this
+                    if val_node.is_string:
+                        val = f"'{val}'"
+                else:
+                    val = val_node.sql()
+
+                light_sql["where"].append({
+                    "column": cond.this.name,
+                    "operator": operator_map.get(type(cond), "UNKNOWN"),
+                    "value": val
+                })
+            elif isinstance(cond, exp.In):
+                light_sql["where"].append({
+                    "column": cond.this.name,
+                    "operator": "IN",
+                    "value": str([e.name for e in cond.args['expressions']])
+                })
+            elif isinstance(cond, exp.Between):
+                light_sql["where"].append({
+                    "column": cond.this.name,
+                    "operator": "BETWEEN",
+                    "value": f"{cond.args['low'].name} AND {cond.args['high'].name}"
+                })
+
+    if parsed.find(exp.Group):
+        for group in parsed.find(exp.Group).expressions:
+            light_sql["groupBy"].append(group.name)
+
+    if parsed.find(exp.Order):
+        for order in parsed.find(exp.Order).expressions:
+            light_sql["orderBy"].append({
+                "column": order.this.name,
+                "direction": "DESC" if order.args.get("desc") else "ASC"
+            })
+
+    if parsed.find(exp.Limit):
+        light_sql["limit"] = int(parsed.find(exp.Limit).expression.this)
+        
+    if parsed.find(exp.Having):
+        having_expression = parsed.find(exp.Having).this
+        
+        conditions = []
+        def collect_conditions(node):
+            if isinstance(node, exp.And):
+                collect_conditions(node.left)
+                collect_conditions(node.right)
+            else:
+                conditions.append(node)
+        collect_conditions(having_expression)
+
+        for cond in conditions:
+            if isinstance(cond, (exp.EQ, exp.GT, exp.LT, exp.GTE, exp.LTE, exp.NEQ, exp.Like)):
+                operator_map = {
+                    exp.EQ: "=", exp.GT: ">", exp.LT: "<", 
+                    exp.GTE: ">=", exp.LTE: "<=", exp.NEQ: "!=", exp.Like: "LIKE"
+                }
+                
+                left = cond.this
+                col_name = left.sql()
+                agg_func = None
+                
+                if isinstance(left, (exp.Sum, exp.Count, exp.Avg, exp.Min, exp.Max)):
+                    agg_func = left.sql().split('(')[0].upper()
+                    
+                    if isinstance(left, exp.Count):
+                        if isinstance(left.this, exp.Star) or left.this is None:
+                            col_name = "*"
+                        elif hasattr(left.this, "name") and left.this.name:
+                            col_name = left.this.name
+                        else:
+                            col_name = left.this.sql()
+                    else:
+                        if hasattr(left.this, "name") and left.this.name:
+                            col_name = left.this.name
+                        elif left.this:
+                            col_name = left.this.sql()
+                            
+                elif isinstance(left, exp.Column):
+                    col_name = left.name
+
+                val_node = cond.expression
+                if isinstance(val_node, exp.Literal):
+                    val = val_node.name if val_node.is_string else val_node.this
+                    if val_node.is_string:
+                        val = f"'{val}'"
+                else:
+                    val = val_node.sql()
+
+                light_sql["having"].append({
+                    "column": col_name,
+                    "agg": agg_func,
+                    "operator": operator_map.get(type(cond), "UNKNOWN"),
+                    "value": val
+                })
+    return light_sql
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _outcome(fn, tree):
+    # Exceptions are part of the behaviour being compared.
+    try:
+        return json.dumps(fn(tree))
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQL -> light JSON IR extraction against the previous implementation")
+    parser.add_argument("--input", type=str, default=INPUT_FILE, help="JSONL with a 'sql' field")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best of N)")
+    args = parser.parse_args()
+
+    sqls = load_sqls(args.input)
+    trees = []
+    for sql in sqls:
+        try:
+            trees.append((sql, sqlglot.parse_one(sql)))
+        except Exception:
+            continue
+
+    mismatches = 0
+    for sql, tree in trees:
+        expected = _outcome(reference_light_json_from_tree, tree)
+        actual = _outcome(light_json_from_tree, tree)
+        if expected != actual:
+            mismatches += 1
+            print(f"[MISMATCH] {sql}\n  previous: {expected}\n  current:  {actual}")
+
+    def run_all(fn):
+        for _, tree in trees:
+            try:
+                fn(tree)
+            except Exception:
+                pass
+
+    parse_time = best_of(lambda: [sqlglot.parse_one(sql) for sql, _ in trees], args.repeat)
+    old_time = best_of(lambda: run_all(reference_light_json_from_tree), args.repeat)
+    new_time = best_of(lambda: run_all(light_json_from_tree), args.repeat)
+    n = len(trees)
+    print(f"Queries: {n} parsed ({len(sqls) - n} parse errors)")
+    print(f"Parse (sqlglot):          {parse_time:.3f}s ({parse_time / n * 1e6:.0f} us/query)")
+    print(f"IR extraction (previous): {old_time:.3f}s ({old_time / n * 1e6:.0f} us/query)")
+    print(f"IR extraction (current):  {new_time:.3f}s ({new_time / n * 1e6:.0f} us/query, {old_time / new_time:.1f}x)")
+    print(f"Compared {n} IRs with the previous implementation: {mismatches} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
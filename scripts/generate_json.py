@@ -1,18 +1,152 @@
+import os
+import sys
 import json
+import argparse
+import multiprocessing
 import sqlglot
 from sqlglot import exp
+from ir_cache import IRCache, IR_CACHE_PATH, sql_key
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval"))
+from jsonl_io import JSONLReader, JSONLWriter
 
 
 INPUT_FILE = "data/nl_sql.jsonl" 
 OUTPUT_FILE = "data/nl_json_sql.jsonl"
 
-def parse_sql_to_light_json(sql_query):
-    try:
-        parsed = sqlglot.parse_one(sql_query)
-    except Exception as e:
-        print(f"Error parsing SQL: {sql_query} | {e}")
+# Bump whenever light_json_from_tree output changes so cached IRs are not reused.
+IR_VERSION = 1
+
+AGG_TYPES = (exp.Sum, exp.Count, exp.Avg, exp.Min, exp.Max)
+
+OPERATOR_MAP = {
+    exp.EQ: "=", exp.GT: ">", exp.LT: "<",
+    exp.GTE: ">=", exp.LTE: "<=", exp.NEQ: "!=", exp.Like: "LIKE"
+}
+COMPARISON_TYPES = tuple(OPERATOR_MAP)
+
+# Node types the IR reads. Tables and SELECTs are collected everywhere in the
+# tree; for the clauses only the first one in breadth-first order is used.
+_NODE_KINDS = (
+    (exp.Table, "from"), (exp.Select, "select"), (exp.Where, "where"), (exp.Group, "groupBy"),
+    (exp.Order, "orderBy"), (exp.Limit, "limit"), (exp.Having, "having"),
+)
+_kind_cache = {}
+
+
+def _node_kind(node_type):
+    kind = _kind_cache.get(node_type, False)
+    if kind is False:
+        kind = next((k for cls, k in _NODE_KINDS if issubclass(node_type, cls)), None)
+        _kind_cache[node_type] = kind
+    return kind
+
+
+def _and_terms(node):
+    """Operands of a chain of ANDs, left to right"""
+    terms = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, exp.And):
+            stack.append(node.right)
+            stack.append(node.left)
+        else:
+            terms.append(node)
+    return terms
+
+
+def _agg_name(node):
+    return type(node).sql_name()
+
+
+def _value(val_node):
+    if isinstance(val_node, exp.Literal):
+        if val_node.is_string:
+            return f"'{val_node.name}'"
+        return val_node.this
+    return val_node.sql()
+
+
+def _select_item(col_exp):
+    col_info = {"column": None, "agg": None, "alias": None}
+
+    if isinstance(col_exp, exp.Alias):
+        col_info["alias"] = col_exp.alias
+        child = col_exp.this
+    else:
+        child = col_exp
+
+    if isinstance(child, AGG_TYPES):
+        col_info["agg"] = _agg_name(child)
+        arg = child.this
+        if arg is None or isinstance(arg, exp.Star):
+            col_info["column"] = "*"
+        elif getattr(arg, "name", None):
+            col_info["column"] = arg.name
+        else:
+            col_info["column"] = arg.sql()
+    elif isinstance(child, exp.Column):
+        col_info["column"] = child.name
+    else:
+        col_info["column"] = child.sql()
+    return col_info
+
+
+def _where_item(cond):
+    if isinstance(cond, COMPARISON_TYPES):
+        return {
+            "column": cond.this.name,
+            "operator": OPERATOR_MAP.get(type(cond), "UNKNOWN"),
+            "value": _value(cond.expression)
+        }
+    if isinstance(cond, exp.In):
+        return {
+            "column": cond.this.name,
+            "operator": "IN",
+            "value": str([e.name for e in cond.args['expressions']])
+        }
+    if isinstance(cond, exp.Between):
+        return {
+            "column": cond.this.name,
+            "operator": "BETWEEN",
+            "value": f"{cond.args['low'].name} AND {cond.args['high'].name}"
+        }
+    return None
+
+
+def _having_item(cond):
+    if not isinstance(cond, COMPARISON_TYPES):
         return None
+    left = cond.this
+    agg_func = None
 
+    if isinstance(left, AGG_TYPES):
+        agg_func = _agg_name(left)
+        arg = left.this
+        if isinstance(left, exp.Count) and (arg is None or isinstance(arg, exp.Star)):
+            col_name = "*"
+        elif getattr(arg, "name", None):
+            col_name = arg.name
+        elif arg:
+            col_name = arg.sql()
+        else:
+            col_name = left.sql()
+    elif isinstance(left, exp.Column):
+        col_name = left.name
+    else:
+        col_name = left.sql()
+
+    return {
+        "column": col_name,
+        "agg": agg_func,
+        "operator": OPERATOR_MAP.get(type(cond), "UNKNOWN"),
+        "value": _value(cond.expression)
+    }
+
+
+def light_json_from_tree(parsed):
+    """Build the light IR from a parsed statement in a single breadth-first pass"""
     light_sql = {
         "select": [],
         "from": [],
@@ -22,185 +156,224 @@ def parse_sql_to_light_json(sql_query):
         "limit": None,
         "having": []
     }
+    clauses = {}
 
-    for table in parsed.find_all(exp.Table):
-        light_sql["from"].append(table.name)
+    for node in parsed.bfs():
+        kind = _node_kind(type(node))
+        if kind is None:
+            continue
+        if kind == "from":
+            light_sql["from"].append(node.name)
+        elif kind == "select":
+            light_sql["select"].extend(_select_item(col_exp) for col_exp in node.expressions)
+        elif kind not in clauses:
+            clauses[kind] = node
 
-    for expression in parsed.find_all(exp.Select):
-        for col_exp in expression.expressions:
-            col_info = {"column": None, "agg": None, "alias": None}
-            
-            if isinstance(col_exp, exp.Alias):
-                col_info["alias"] = col_exp.alias
-                child = col_exp.this
-            else:
-                child = col_exp
+    if "where" in clauses:
+        for cond in _and_terms(clauses["where"].this):
+            item = _where_item(cond)
+            if item is not None:
+                light_sql["where"].append(item)
 
-            if isinstance(child, (exp.Sum, exp.Count, exp.Avg, exp.Min, exp.Max)):
-                func_name = child.sql().split('(')[0].upper()
-                col_info["agg"] = func_name
+    if "groupBy" in clauses:
+        light_sql["groupBy"] = [group.name for group in clauses["groupBy"].expressions]
 
-                if isinstance(child.this, exp.Star):
-                    col_info["column"] = "*"
-                elif child.this is None:
-                    col_info["column"] = "*"
-                else:
-                    if hasattr(child.this, "name") and child.this.name:
-                        col_info["column"] = child.this.name
-                    else:
-                        col_info["column"] = child.this.sql()
-                    
-            elif isinstance(child, exp.Column):
-                col_info["column"] = child.name
-            else:
-                col_info["column"] = child.sql()
-
-            light_sql["select"].append(col_info)
-
-    if parsed.find(exp.Where):
-        where_expression = parsed.find(exp.Where).this
-        
-        conditions = []
-        
-        def collect_conditions(node):
-            if isinstance(node, exp.And):
-                collect_conditions(node.left)
-                collect_conditions(node.right)
-            else:
-                conditions.append(node)
-
-        collect_conditions(where_expression)
-
-        for cond in conditions:
-            if isinstance(cond, (exp.EQ, exp.GT, exp.LT, exp.GTE, exp.LTE, exp.NEQ, exp.Like)):
-                operator_map = {
-                    exp.EQ: "=", exp.GT: ">", exp.LT: "<", 
-                    exp.GTE: ">=", exp.LTE: "<=", exp.NEQ: "!=", exp.Like: "LIKE"
-                }
-                
-                val_node = cond.expression
-                if isinstance(val_node, exp.Literal):
-                    val = val_node.name if val_node.is_string else val_node.this
-                    if val_node.is_string:
-                        val = f"'{val}'"
-                else:
-                    val = val_node.sql()
-
-                light_sql["where"].append({
-                    "column": cond.this.name,
-                    "operator": operator_map.get(type(cond), "UNKNOWN"),
-                    "value": val
-                })
-            elif isinstance(cond, exp.In):
-                light_sql["where"].append({
-                    "column": cond.this.name,
-                    "operator": "IN",
-                    "value": str([e.name for e in cond.args['expressions']])
-                })
-            elif isinstance(cond, exp.Between):
-                light_sql["where"].append({
-                    "column": cond.this.name,
-                    "operator": "BETWEEN",
-                    "value": f"{cond.args['low'].name} AND {cond.args['high'].name}"
-                })
-
-    if parsed.find(exp.Group):
-        for group in parsed.find(exp.Group).expressions:
-            light_sql["groupBy"].append(group.name)
-
-    if parsed.find(exp.Order):
-        for order in parsed.find(exp.Order).expressions:
-            light_sql["orderBy"].append({
-                "column": order.this.name,
-                "direction": "DESC" if order.args.get("desc") else "ASC"
-            })
-
-    if parsed.find(exp.Limit):
-        light_sql["limit"] = int(parsed.find(exp.Limit).expression.this)
-        
-    if parsed.find(exp.Having):
-        having_expression = parsed.find(exp.Having).this
-        
-        conditions = []
-        def collect_conditions(node):
-            if isinstance(node, exp.And):
-                collect_conditions(node.left)
-                collect_conditions(node.right)
+    if "orderBy" in clauses:
+        light_sql["orderBy"] = [
+            {"column": order.this.name, "direction": "DESC" if order.args.get("desc") else "ASC"}
+            for order in clauses["orderBy"].expressions
+        ]
+
+    if "limit" in clauses:
+        light_sql["limit"] = int(clauses["limit"].expression.this)
+
+    if "having" in clauses:
+        for cond in _and_terms(clauses["having"].this):
+            item = _having_item(cond)
+            if item is not None:
+                light_sql["having"].append(item)
+    return light_sql
+
+
+def parse_sql_to_light_json(sql_query):
+    try:
+        parsed = sqlglot.parse_one(sql_query)
+    except Exception as e:
+        print(f"Error parsing SQL: {sql_query} | {e}")
+        return None
+    return light_json_from_tree(parsed)
+
+
+def converter_version():
+    """Cache version of the SQL -> IR conversion (IR format and sqlglot parser)"""
+    return f"{IR_VERSION}/sqlglot-{sqlglot.__version__}"
+
+
+# Per-process read-only IR cache, opened by _init_worker.
+_worker_cache = None
+
+
+def _init_worker(cache_path):
+    global _worker_cache
+    _worker_cache = IRCache(converter_version(), cache_path, readonly=True) if cache_path else None
+
+
+def _parse_error(e):
+    # sqlglot's message embeds the query with ANSI highlighting; keep the
+    # plain description and position instead.
+    errors = getattr(e, "errors", None)
+    if errors:
+        first = errors[0]
+        return f"{first.get('description')} (line {first.get('line')}, col {first.get('col')})"
+    return str(e)
+
+
+def convert_record(item):
+    """
+    Convert one decoded input row; returns (output_line, reject, new_entry).
+
+    `item` is (line number, record) as yielded by
+    JSONLReader.iter_records(keep_errors=True), so malformed lines arrive as
+    (line number, None). Exactly one of output_line / reject is set; rows
+    that fail to decode, parse or convert become rejects.
+    new_entry is (key, ir_text) for an IR that was parsed because the cache
+    missed; the caller stores it, as workers only read the cache.
+    Module-level so pool workers can run it; the output line is JSON-encoded
+    here too, which keeps the parent process down to file writes.
+    """
+    line_no, data = item
+    if data is None:
+        return None, {"line": line_no, "error": "invalid JSON"}, None
+    if not isinstance(data, dict):
+        return None, {"line": line_no, "error": f"expected a JSON object, got {type(data).__name__}"}, None
+    sql = data.get("sql")
+    if not sql:
+        return None, {"line": line_no, "id": data.get("id"), "sql": sql, "error": "missing sql"}, None
+
+    key = sql_key(sql) if _worker_cache else None
+    ir = _worker_cache.get(key) if key else None
+    if ir is None:
+        try:
+            parsed = sqlglot.parse_one(sql)
+        except Exception as e:
+            return None, {"line": line_no, "id": data.get("id"), "sql": sql,
+                          "error": f"parse error: {_parse_error(e)}"}, None
+        # Parsed SQL outside the supported shape (e.g. a non-literal LIMIT)
+        # must not take down the whole run from inside a pool worker.
+        try:
+            ir = light_json_from_tree(parsed)
+        except Exception as e:
+            return None, {"line": line_no, "id": data.get("id"), "sql": sql,
+                          "error": f"extraction error: {type(e).__name__}: {e}"}, None
+        new_entry = (key, json.dumps(ir, ensure_ascii=False)) if key else None
+    else:
+        new_entry = None
+    data["json_label"] = ir
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8"), None, new_entry
+
+
+def convert_file(input_file, output_file, reject_file=None, workers=0, chunk_size=256, cache=None):
+    """
+    Convert `input_file` to `output_file`, returning (converted, rejected, reader).
+
+    Rows are streamed through a JSONLReader (whose error counter reports
+    malformed lines) and written with a JSONLWriter. With workers > 1 rows
+    are converted in a process pool, `chunk_size` rows per task, and
+    results are written back in input order as they arrive, so the output
+    is the same as a serial run.
+
+    Args:
+        input_file (str): JSONL with a 'sql' field per row
+        output_file (str): JSONL written with a 'json_label' added
+        reject_file (str): JSONL receiving rows that could not be converted
+            (line, id, sql, error); created on the first reject, so clean
+            runs leave no file. None only reports them on stdout
+        workers (int): Worker processes; 0 or 1 converts in this process
+        chunk_size (int): Rows sent to a worker per task
+        cache (IRCache): Writable IR cache; rows whose SQL is cached skip
+            parsing, and hits/misses are counted on it
+    """
+    converted = rejected = 0
+    cache_path = cache.cache_path if cache else None
+    reader = JSONLReader(input_file)
+    if workers and workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(cache_path,))
+    else:
+        pool = None
+        _init_worker(cache_path)
+    rejects = None
+    if reject_file and os.path.exists(reject_file):
+        # Rejects from an earlier run would describe rows this run converts
+        os.remove(reject_file)
+    try:
+        with JSONLWriter(output_file) as out:
+            items = reader.iter_records(keep_errors=True)
+            if pool is not None:
+                results = pool.imap(convert_record, items, chunksize=max(1, chunk_size))
             else:
-                conditions.append(node)
-        collect_conditions(having_expression)
-
-        for cond in conditions:
-            if isinstance(cond, (exp.EQ, exp.GT, exp.LT, exp.GTE, exp.LTE, exp.NEQ, exp.Like)):
-                operator_map = {
-                    exp.EQ: "=", exp.GT: ">", exp.LT: "<", 
-                    exp.GTE: ">=", exp.LTE: "<=", exp.NEQ: "!=", exp.Like: "LIKE"
-                }
-                
-                left = cond.this
-                col_name = left.sql()
-                agg_func = None
-                
-                if isinstance(left, (exp.Sum, exp.Count, exp.Avg, exp.Min, exp.Max)):
-                    agg_func = left.sql().split('(')[0].upper()
-                    
-                    if isinstance(left, exp.Count):
-                        if isinstance(left.this, exp.Star) or left.this is None:
-                            col_name = "*"
-                        elif hasattr(left.this, "name") and left.this.name:
-                            col_name = left.this.name
-                        else:
-                            col_name = left.this.sql()
+                results = map(convert_record, items)
+            for out_line, reject, new_entry in results:
+                if cache:
+                    if out_line and new_entry is None:
+                        cache.hits += 1
                     else:
-                        if hasattr(left.this, "name") and left.this.name:
-                            col_name = left.this.name
-                        elif left.this:
-                            col_name = left.this.sql()
-                            
-                elif isinstance(left, exp.Column):
-                    col_name = left.name
-
-                val_node = cond.expression
-                if isinstance(val_node, exp.Literal):
-                    val = val_node.name if val_node.is_string else val_node.this
-                    if val_node.is_string:
-                        val = f"'{val}'"
+                        cache.misses += 1
+                if new_entry is not None:
+                    cache.put(*new_entry)
+                if out_line is not None:
+                    out.write_encoded(out_line)
+                    converted += 1
                 else:
-                    val = val_node.sql()
-
-                light_sql["having"].append({
-                    "column": col_name,
-                    "agg": agg_func,
-                    "operator": operator_map.get(type(cond), "UNKNOWN"),
-                    "value": val
-                })
-    return light_sql
+                    if reject_file:
+                        if rejects is None:
+                            rejects = JSONLWriter(reject_file)
+                        rejects.write(reject)
+                    rejected += 1
+                    print(f"Skipping line {reject['line']} (ID {reject.get('id')}): {reject['error']}")
+    finally:
+        if rejects:
+            rejects.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+        elif _worker_cache is not None:
+            _worker_cache.close()
+            _init_worker(None)
+    return converted, rejected, reader
+
 
 def main():
-    print(f"Starting conversion: {INPUT_FILE} -> {OUTPUT_FILE}")
-    
-    success_count = 0
-    
-    with open(INPUT_FILE, 'r', encoding='utf-8') as fin, \
-         open(OUTPUT_FILE, 'w', encoding='utf-8') as fout:
-        
-        for line in fin:
-            if not line.strip(): continue
-            
-            data = json.loads(line)
-            sql = data.get("sql")
-            
-            if sql:
-                json_label = parse_sql_to_light_json(sql)
-                
-                if json_label:
-                    data["json_label"] = json_label
-                    fout.write(json.dumps(data, ensure_ascii=False) + "\n")
-                    success_count += 1
-                else:
-                    print(f"Skipping ID {data.get('id')}: Parsing failed.")
-            
-    print(f"Done! Successfully processed {success_count} records.")
+    parser = argparse.ArgumentParser(description="Add light JSON IR labels (json_label) to an NL/SQL JSONL file")
+    parser.add_argument("--input", type=str, default=INPUT_FILE, help="JSONL with a 'sql' field")
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE, help="JSONL to write")
+    parser.add_argument("--reject_file", type=str, default=None,
+                        help="JSONL for rows that fail to convert (default: <output>.rejects.jsonl)")
+    parser.add_argument("--workers", type=int, default=0, help="Parser processes (0 = serial)")
+    parser.add_argument("--chunk_size", type=int, default=256, help="Rows per worker task")
+    parser.add_argument("--ir_cache", type=str, default=IR_CACHE_PATH, help="SQLite file caching SQL -> IR conversions")
+    parser.add_argument("--no_cache", action="store_true", help="Parse every row and leave the cache untouched")
+    parser.add_argument("--prune_cache", action="store_true", help="Drop cache entries from other converter versions")
+    args = parser.parse_args()
+
+    reject_file = args.reject_file or os.path.splitext(args.output)[0] + ".rejects.jsonl"
+    cache = None if args.no_cache else IRCache(converter_version(), args.ir_cache)
+    print(f"Starting conversion: {args.input} -> {args.output}")
+    try:
+        if cache and args.prune_cache:
+            print(f"Pruned {cache.prune()} stale cache entries.")
+        converted, rejected, reader = convert_file(args.input, args.output, reject_file, args.workers,
+                                                   args.chunk_size, cache)
+    finally:
+        if cache:
+            cache.close()
+    print(f"Done! Successfully processed {converted} records.")
+    if reader.errors:
+        print(reader.summary())
+    if rejected:
+        print(f"{rejected} rows rejected -> {reject_file}")
+    if cache:
+        print(f"IR Cache Hits: {cache.hits}/{cache.hits + cache.misses} ({args.ir_cache})")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
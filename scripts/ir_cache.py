@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+from typing import Optional
+
+IR_CACHE_PATH = "data/cache/light_ir.db"
+
+# New entries are committed in batches so an interrupted run keeps its work.
+COMMIT_EVERY = 10000
+
+_QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse whitespace outside quoted literals and identifiers.
+
+    Unlike eval/result_digest.normalize_sql nothing is lowercased: the light
+    IR keeps column names and aliases as written, so case is part of the key.
+    """
+    parts = _QUOTED_RE.split(sql.strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip()
+
+
+def sql_key(sql: str) -> str:
+    """Content address of a query: sha256 of its normalized text"""
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+class IRCache:
+    def __init__(self, version: str, cache_path: str = IR_CACHE_PATH, readonly: bool = False):
+        """
+        On-disk store of light IRs keyed by normalized SQL and converter version.
+
+        Entries written under another version (converter or sqlglot upgrade)
+        are never returned. Read-only instances let pool workers look up
+        entries while the parent process is the only writer.
+
+        Args:
+            version (str): Converter version string (see generate_json.converter_version)
+            cache_path (str): Path to the SQLite file backing the cache
+            readonly (bool): Open an existing cache file for lookups only
+        """
+        self.version = version
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{cache_path}?mode=ro", uri=True)
+            return
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(cache_path)
+        # WAL keeps worker lookups from blocking the parent's batched commits.
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS light_ir ("
+            " sql_key TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " ir TEXT NOT NULL,"
+            " PRIMARY KEY (sql_key, version))"
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached IR for `key` (see sql_key), or None on a miss"""
+        row = self.conn.execute(
+            "SELECT ir FROM light_ir WHERE sql_key = ? AND version = ?", (key, self.version)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, ir_text: str) -> None:
+        """Record the JSON-encoded IR of a successfully converted query"""
+        self.conn.execute("INSERT OR REPLACE INTO light_ir VALUES (?, ?, ?)", (key, self.version, ir_text))
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+
+    def prune(self) -> int:
+        """Delete entries written under other versions; returns how many"""
+        removed = self.conn.execute("DELETE FROM light_ir WHERE version != ?", (self.version,)).rowcount
+        self.conn.commit()
+        return removed
+
+    def close(self) -> None:
+        """Flush pending entries and close the cache file"""
+        if self.conn:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
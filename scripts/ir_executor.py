@@ -0,0 +1,661 @@
+import os
+import re
+import ast
+import json
+import time
+import sqlite3
+import argparse
+import numpy as np
+
+from JSON_to_SQL import clean_json_string, translate_json_to_sql
+from light_ir import LightIR
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "..", "my_database.db")
+PRED_FILE = os.path.join(BASE_DIR, "..", "data", "eval_ready", "nl_to_json_v3.jsonl")
+TABLE_NAME = "demographics"
+
+AGG_FUNCS = ("SUM", "AVG", "COUNT", "MIN", "MAX")
+AGG_PATTERN = re.compile(r"(SUM|AVG|COUNT|MIN|MAX)\s*\(", re.IGNORECASE)
+AGG_EXPR = re.compile(r"^\s*(SUM|AVG|COUNT|MIN|MAX)\s*\(\s*(\*|(?:DISTINCT\s+)?[A-Za-z_]\w*)\s*\)\s*$", re.IGNORECASE)
+QUOTED = re.compile(r"^'((?:[^']|'')*)'$")
+NUMBER = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+
+# The light IR's meaning is whatever translate_json_to_sql() turns it into,
+# run on SQLite. This executor reproduces that for the IR shapes it knows
+# and raises UnsupportedIR for the rest, so callers can fall back to SQL.
+
+
+class UnsupportedIR(Exception):
+    """The IR uses a construct the NumPy executor does not reproduce exactly"""
+
+
+class IRExecutionError(Exception):
+    """The IR is invalid (SQLite would reject the translated query)"""
+
+
+class Column:
+    __slots__ = ("name", "kind", "affinity", "values", "null", "_ranks")
+
+    def __init__(self, name, kind, affinity, values, null):
+        self.name = name
+        self.kind = kind            # "int", "float", "text" or "mixed"
+        self.affinity = affinity    # "numeric" or "text"
+        self.values = values
+        self.null = null
+        self._ranks = None
+
+    def ranks(self):
+        # Dense order-preserving codes; NULL sorts first (-1).
+        if self._ranks is None:
+            codes = np.full(len(self.values), -1, dtype=np.int64)
+            uniq, inverse = np.unique(self.values[~self.null], return_inverse=True)
+            codes[~self.null] = inverse
+            self._ranks = (codes, uniq)
+        return self._ranks
+
+    def like(self, regex):
+        # Match each distinct value once; SQLite renders numbers as text for LIKE.
+        codes, uniq = self.ranks()
+        hits = np.fromiter((bool(regex.fullmatch(v if self.kind == "text" else repr(v))) for v in uniq.tolist()),
+                           dtype=bool, count=len(uniq))
+        return np.append(hits, False)[codes]
+
+    def take(self, rows):
+        """Python values (None for NULL) at positions `rows`"""
+        values = self.values[rows].tolist()
+        for i in np.nonzero(self.null[rows])[0].tolist():
+            values[i] = None
+        return values
+
+
+class ColumnTable:
+    def __init__(self, columns, n_rows, clustered=False):
+        self.columns = columns
+        self.n_rows = n_rows
+        self.names = list(columns)
+        # WITHOUT ROWID tables (storage_layout.py) are scanned in key order
+        # and SQLite may walk that index backwards, so tied rows can come
+        # back in either direction.
+        self.clustered = clustered
+
+    @classmethod
+    def from_sqlite(cls, conn, table=TABLE_NAME):
+        """Load `table` into per-column NumPy arrays, in SQLite scan order"""
+        info = list(conn.execute(f"PRAGMA table_info({table})"))
+        names = [row[1] for row in info]
+        rows = conn.execute(f"SELECT {', '.join(names)} FROM {table}").fetchall()
+        columns = {}
+        for i, (_, name, decl, *_rest) in enumerate(info):
+            raw = [r[i] for r in rows]
+            null = np.array([v is None for v in raw], dtype=bool)
+            types = {type(v) for v in raw if v is not None}
+            affinity = "text" if "CHAR" in decl.upper() or "TEXT" in decl.upper() or "CLOB" in decl.upper() else "numeric"
+            if types <= {int}:
+                kind, values = "int", np.array([0 if v is None else v for v in raw], dtype=np.int64)
+            elif types <= {float}:
+                kind, values = "float", np.array([0.0 if v is None else v for v in raw], dtype=np.float64)
+            elif types <= {str}:
+                kind, values = "text", np.array(["" if v is None else v for v in raw], dtype=str)
+            else:
+                kind, values = "mixed", np.array(raw, dtype=object)
+            columns[name.lower()] = Column(name, kind, affinity, values, null)
+        layout = conn.execute("SELECT wr FROM pragma_table_list WHERE name = ? AND schema = 'main'", (table,)).fetchone()
+        return cls(columns, len(rows), clustered=bool(layout and layout[0]))
+
+    def column(self, name):
+        if not isinstance(name, str) or name.lower() not in self.columns:
+            raise IRExecutionError(f"no such column: {name}")
+        col = self.columns[name.lower()]
+        if col.kind == "mixed":
+            raise UnsupportedIR(f"column {name} mixes storage classes")
+        return col
+
+
+def _parse_literal(text):
+    text = str(text).strip()
+    quoted = QUOTED.match(text)
+    if quoted:
+        return quoted.group(1).replace("''", "'")
+    if NUMBER.match(text):
+        value = float(text)
+        return int(value) if re.match(r"^[+-]?\d+$", text) else value
+    raise UnsupportedIR(f"not a literal: {text}")
+
+
+def _coerce(col, value):
+    # Apply the column's affinity to a literal, as SQLite does in comparisons.
+    if col.affinity == "text":
+        if isinstance(value, float):
+            raise UnsupportedIR("REAL literal compared to TEXT column")
+        return str(value)
+    if isinstance(value, str):
+        if NUMBER.match(value.strip()):
+            return _parse_literal(value.strip())
+        raise UnsupportedIR("TEXT literal compared to numeric column")
+    if col.kind == "text":
+        raise UnsupportedIR("numeric literal compared to text values")
+    return value
+
+
+def _like_regex(pattern):
+    parts = []
+    for ch in str(pattern):
+        parts.append(".*" if ch == "%" else "." if ch == "_" else re.escape(ch))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def _compare(values, op, literal):
+    if op == "=" or op == "==":
+        return values == literal
+    if op in ("!=", "<>"):
+        return values != literal
+    if op == ">":
+        return values > literal
+    if op == "<":
+        return values < literal
+    if op == ">=":
+        return values >= literal
+    if op == "<=":
+        return values <= literal
+    raise UnsupportedIR(f"operator {op}")
+
+
+def _condition_value(cond):
+    # Same list handling as translate_json_to_sql().
+    val = cond.get("value")
+    if isinstance(val, str) and val.strip().startswith("[") and val.strip().endswith("]"):
+        try:
+            parsed = ast.literal_eval(val)
+            if isinstance(parsed, list):
+                val = parsed
+        except (ValueError, SyntaxError):
+            pass
+    return val
+
+
+def _row_mask(table, cond):
+    col = table.column(cond.get("column", ""))
+    op = str(cond.get("operator", "=")).upper()
+    val = _condition_value(cond)
+
+    if op == "IN":
+        if not isinstance(val, list):
+            raise UnsupportedIR("IN without a list value")
+        items = [_coerce(col, v if isinstance(v, str) else _parse_literal(str(v))) for v in val]
+        return np.isin(col.values, np.array(items, dtype=col.values.dtype)) & ~col.null
+    if op == "BETWEEN":
+        bounds = re.split(r"\s+AND\s+", str(val), flags=re.IGNORECASE)
+        if len(bounds) != 2:
+            raise UnsupportedIR(f"BETWEEN value {val}")
+        low, high = (_coerce(col, _parse_literal(b)) for b in bounds)
+        return (col.values >= low) & (col.values <= high) & ~col.null
+    if op in ("LIKE", "NOT LIKE"):
+        matched = col.like(_like_regex(_parse_literal(str(val))))
+        return (matched if op == "LIKE" else ~matched) & ~col.null
+    if isinstance(val, str) and val.strip().lower() in table.columns:
+        # Column-to-column comparison (e.g. black > white).
+        other = table.column(val.strip())
+        if (col.kind == "text") != (other.kind == "text") or col.affinity != other.affinity:
+            raise UnsupportedIR("comparison across storage classes")
+        return _compare(col.values, op, other.values) & ~col.null & ~other.null
+    return _compare(col.values, op, _coerce(col, _parse_literal(str(val)))) & ~col.null
+
+
+class _Plan:
+    __slots__ = ("select", "where", "having", "group", "order", "limit", "aggregate")
+
+
+def _agg_term(func, column):
+    func = func.upper()
+    if func not in AGG_FUNCS:
+        raise UnsupportedIR(f"aggregate {func}")
+    if column == "*" and func != "COUNT":
+        raise IRExecutionError(f"wrong use of *: {func}(*)")
+    distinct = re.match(r"^DISTINCT\s+(\w+)$", str(column).strip(), re.IGNORECASE)
+    if distinct:
+        if func != "COUNT":
+            raise UnsupportedIR(f"{func}(DISTINCT ...)")
+        return ("COUNT DISTINCT", distinct.group(1))
+    return (func, column)
+
+
+def compile_ir(ir, table):
+    """Resolve an IR dict against `table`, mirroring translate_json_to_sql()"""
+    if isinstance(ir, str):
+        ir = json.loads(ir)
+    elif isinstance(ir, LightIR):
+        ir = ir.to_dict()
+    if not isinstance(ir, dict):
+        raise IRExecutionError("IR is not an object")
+    if [t.lower() for t in ir.get("from", [TABLE_NAME])] != [TABLE_NAME]:
+        raise UnsupportedIR("only the demographics table is supported")
+
+    plan = _Plan()
+    plan.select = []
+    col_to_agg = {}
+    for item in ir.get("select", []):
+        col = item.get("column", "*")
+        agg = item.get("agg")
+        if col and agg and agg.upper() != "NONE":
+            col_to_agg[col] = agg.upper()
+    for item in ir.get("select", []):
+        col = item.get("column", "*")
+        agg = item.get("agg")
+        if agg and agg.upper() != "NONE":
+            term = ("agg", _agg_term(agg, col))
+            if term[1][1] != "*":
+                table.column(term[1][1])
+        elif col == "*":
+            term = ("star", None)
+        else:
+            if AGG_EXPR.match(str(col)):
+                term = ("agg", _agg_term(*AGG_EXPR.match(col).groups()))
+                if term[1][1] != "*":
+                    table.column(term[1][1])
+            else:
+                table.column(col)
+                term = ("col", col.lower())
+        plan.select.append((term, item.get("alias") or (col if term[0] == "col" else None)))
+    if not plan.select:
+        plan.select = [(("star", None), None)]
+
+    plan.where = []
+    plan.having = []
+    for cond in ir.get("where", []) + ir.get("having", []):
+        col = cond.get("column", "")
+        val = cond.get("value")
+        cond_agg = cond.get("agg")
+        is_agg = bool(cond_agg and cond_agg.upper() != "NONE") or bool(AGG_PATTERN.search(str(col))) or \
+            (isinstance(val, str) and bool(AGG_PATTERN.search(val)))
+        if not is_agg:
+            plan.where.append(cond)
+            continue
+        match = AGG_EXPR.match(str(col))
+        if match:
+            term = _agg_term(*match.groups())
+        elif cond_agg:
+            term = _agg_term(cond_agg, col)
+        elif col in col_to_agg:
+            term = _agg_term(col_to_agg[col], col)
+        else:
+            raise UnsupportedIR("HAVING on a bare column")
+        if term[1] != "*":
+            table.column(term[1])
+        op = str(cond.get("operator", "=")).upper()
+        _compare(np.zeros(0), op, 0)
+        plan.having.append((term, op, _parse_literal(str(_condition_value(cond)))))
+
+    plan.group = []
+    for g in ir.get("groupBy", []) or []:
+        table.column(g)
+        plan.group.append(g.lower())
+
+    orders = ir.get("orderBy", []) or []
+    if isinstance(orders, dict):
+        orders = [orders]
+    plan.order = []
+    for order in orders:
+        direction = order.get("direction", "ASC").upper()
+        if direction not in ("ASC", "DESC"):
+            raise UnsupportedIR(f"direction {direction}")
+        plan.order.append((order["column"], direction == "DESC"))
+
+    limit = ir.get("limit")
+    plan.limit = None
+    if limit is not None:
+        try:
+            plan.limit = int(limit)
+        except (TypeError, ValueError):
+            raise UnsupportedIR(f"LIMIT {limit}")
+        if plan.limit < 0:
+            plan.limit = None
+
+    plan.aggregate = bool(plan.group or plan.having or any(t[0] == "agg" for t, _ in plan.select))
+    if plan.aggregate and any(t[0] == "star" for t, _ in plan.select):
+        raise UnsupportedIR("SELECT * in an aggregate query")
+    for term, _ in plan.select:
+        if plan.aggregate and term[0] == "col" and term[1] not in plan.group:
+            raise UnsupportedIR("bare column in an aggregate query")
+    return plan
+
+
+def _sort_codes(values, null, descending):
+    codes = np.full(len(values), -1, dtype=np.int64)
+    if (~null).any():
+        _, inverse = np.unique(values[~null], return_inverse=True)
+        codes[~null] = inverse
+    return -codes if descending else codes
+
+
+def _stable_order(keys, limit):
+    """Stable sort positions by `keys` (most significant first), only the top `limit` if set"""
+    n = len(keys[0]) if keys else 0
+    if limit is not None and len(keys) == 1 and limit < n // 4:
+        key = keys[0]
+        if limit == 0:
+            return np.zeros(0, dtype=np.int64)
+        kth = np.partition(key, limit - 1)[limit - 1]
+        candidates = np.nonzero(key <= kth)[0]
+        return candidates[np.argsort(key[candidates], kind="stable")][:limit]
+    order = np.lexsort(keys[::-1]) if keys else np.arange(n)
+    return order[:limit] if limit is not None else order
+
+
+def _has_ties(keys):
+    if not len(keys[0]):
+        return False
+    return len(np.unique(np.stack(keys, axis=1), axis=0)) < len(keys[0])
+
+
+class IRExecutor:
+    def __init__(self, table: ColumnTable):
+        """
+        Runs light-IR queries directly over a ColumnTable.
+
+        Results are lists of tuples equal to what SQLite returns for
+        translate_json_to_sql(ir), including row order.
+        """
+        self.table = table
+
+    @classmethod
+    def from_db(cls, db_path=DB_PATH):
+        conn = sqlite3.connect(db_path)
+        try:
+            return cls(ColumnTable.from_sqlite(conn))
+        finally:
+            conn.close()
+
+    def execute(self, ir):
+        plan = compile_ir(ir, self.table)
+        mask = np.ones(self.table.n_rows, dtype=bool)
+        for cond in plan.where:
+            mask &= _row_mask(self.table, cond)
+        rows = np.nonzero(mask)[0]
+        if plan.aggregate:
+            return self._aggregate(plan, rows)
+        return self._project(plan, rows)
+
+    def _project(self, plan, rows):
+        table = self.table
+        outputs = []
+        for term, alias in plan.select:
+            if term[0] == "star":
+                outputs += [table.columns[name.lower()] for name in table.names]
+            else:
+                outputs.append(table.column(term[1]))
+
+        keys = []
+        for name, descending in plan.order:
+            col = self._order_column(plan, name)
+            codes = col.ranks()[0][rows]
+            keys.append(-codes if descending else codes)
+        if keys:
+            if table.clustered and _has_ties(keys):
+                raise UnsupportedIR("ORDER BY ties in a clustered table")
+            rows = rows[_stable_order(keys, plan.limit)]
+        elif plan.limit is not None:
+            rows = rows[:plan.limit]
+
+        columns = [c.take(rows) for c in outputs]
+        return list(zip(*columns)) if columns else []
+
+    def _order_column(self, plan, name):
+        text = str(name)
+        if text.isdigit():
+            index = int(text) - 1
+            if not 0 <= index < len(plan.select) or plan.select[index][0][0] != "col":
+                raise UnsupportedIR(f"ORDER BY {name}")
+            return self.table.column(plan.select[index][0][1])
+        for term, alias in plan.select:
+            if alias and alias.lower() == text.lower() and term[0] == "col":
+                return self.table.column(term[1])
+        if any(alias and alias.lower() == text.lower() for _, alias in plan.select):
+            raise UnsupportedIR(f"ORDER BY {name}")
+        return self.table.column(text)
+
+    def _aggregate(self, plan, rows):
+        table = self.table
+        if plan.group:
+            # One int64 key per row, ordered like the group columns (NULL first).
+            key = np.zeros(len(rows), dtype=np.int64)
+            for g in plan.group:
+                codes, uniq = table.column(g).ranks()
+                key = key * (len(uniq) + 1) + codes[rows] + 1
+            _, first, gid = np.unique(key, return_index=True, return_inverse=True)
+            gid = gid.reshape(-1)
+            n_groups = len(first)
+            first_rows = rows[first]
+        else:
+            gid = np.zeros(len(rows), dtype=np.int64)
+            n_groups = 1
+            first_rows = None
+
+        cache = {}
+
+        def agg_values(term):
+            if term not in cache:
+                cache[term] = self._agg(term, rows, gid, n_groups)
+            return cache[term]
+
+        keep = np.ones(n_groups, dtype=bool)
+        for term, op, literal in plan.having:
+            values, null = agg_values(term)
+            if isinstance(literal, str):
+                raise UnsupportedIR("TEXT literal in HAVING")
+            keep &= _compare(values, op, literal) & ~null
+
+        outputs = []
+        for term, alias in plan.select:
+            if term[0] == "agg":
+                values, null = agg_values(term[1])
+                outputs.append((values, null))
+            else:
+                col = table.column(term[1])
+                outputs.append((col.values[first_rows], col.null[first_rows]))
+
+        groups = np.nonzero(keep)[0]
+        keys = []
+        for name, descending in plan.order:
+            values, null = self._group_order_values(plan, name, outputs, first_rows, agg_values)
+            keys.append(_sort_codes(values[groups], null[groups], descending))
+        if keys:
+            # SQLite returns equal sort keys of a single-column GROUP BY in
+            # reverse group order when the first ORDER BY term is DESC.
+            if len(plan.group) == 1 and len(keys) == 1 and not table.clustered:
+                if plan.order[0][1]:
+                    groups = groups[::-1]
+                    keys = [k[::-1] for k in keys]
+            elif _has_ties(keys):
+                # Otherwise the order of equal groups depends on the plan
+                # and sorter SQLite picks; leave those queries to SQLite.
+                raise UnsupportedIR("ORDER BY ties between groups")
+            groups = groups[_stable_order(keys, plan.limit)]
+        else:
+            if table.clustered and len(plan.group) > 1:
+                # SQLite may emit the groups in clustering-key order instead.
+                raise UnsupportedIR("multi-column GROUP BY without ORDER BY in a clustered table")
+            if plan.limit is not None:
+                groups = groups[:plan.limit]
+
+        columns = []
+        for values, null in outputs:
+            column = values[groups].tolist()
+            for i in np.nonzero(null[groups])[0].tolist():
+                column[i] = None
+            columns.append(column)
+        return list(zip(*columns))
+
+    def _group_order_values(self, plan, name, outputs, first_rows, agg_values):
+        text = str(name)
+        if text.isdigit():
+            index = int(text) - 1
+            if not 0 <= index < len(outputs):
+                raise IRExecutionError(f"ORDER BY term out of range: {name}")
+            return outputs[index]
+        for (term, alias), output in zip(plan.select, outputs):
+            if alias and alias.lower() == text.lower():
+                return output
+        match = AGG_EXPR.match(text)
+        if match:
+            return agg_values(_agg_term(*match.groups()))
+        if text.lower() in plan.group:
+            col = self.table.column(text)
+            return col.values[first_rows], col.null[first_rows]
+        self.table.column(text)
+        raise UnsupportedIR(f"ORDER BY bare column {name} in an aggregate query")
+
+    def _agg(self, term, rows, gid, n_groups):
+        func, column = term
+        if column == "*":
+            return np.bincount(gid, minlength=n_groups).astype(np.int64), np.zeros(n_groups, dtype=bool)
+
+        col = self.table.column(column)
+        present = ~col.null[rows]
+        g = gid[present]
+        counts = np.bincount(g, minlength=n_groups)
+        if func == "COUNT":
+            return counts.astype(np.int64), np.zeros(n_groups, dtype=bool)
+        if func == "COUNT DISTINCT":
+            pairs = np.unique(np.stack([g, col.ranks()[0][rows][present]], axis=1), axis=0)
+            return np.bincount(pairs[:, 0], minlength=n_groups).astype(np.int64), np.zeros(n_groups, dtype=bool)
+
+        empty = counts == 0
+        if col.kind == "text":
+            if func not in ("MIN", "MAX"):
+                raise UnsupportedIR(f"{func} over a TEXT column")
+            codes, uniq = col.ranks()
+            c = codes[rows][present]
+            best = np.full(n_groups, -1 if func == "MAX" else len(uniq), dtype=np.int64)
+            (np.maximum if func == "MAX" else np.minimum).at(best, g, c)
+            out = np.array([uniq[b] if 0 <= b < len(uniq) else "" for b in best], dtype=object)
+            return out, empty
+
+        values = col.values[rows][present]
+        if func == "SUM":
+            if col.kind == "int":
+                out = np.zeros(n_groups, dtype=np.int64)
+                np.add.at(out, g, values)
+            else:
+                # bincount accumulates sequentially, as SQLite's sum() does.
+                out = np.bincount(g, weights=values, minlength=n_groups)
+            return out, empty
+        if func == "AVG":
+            sums = np.bincount(g, weights=values.astype(np.float64), minlength=n_groups)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return sums / np.maximum(counts, 1), empty
+        if func in ("MIN", "MAX"):
+            if col.kind == "int":
+                init = np.iinfo(np.int64).max if func == "MIN" else np.iinfo(np.int64).min
+            else:
+                init = np.inf if func == "MIN" else -np.inf
+            out = np.full(n_groups, init, dtype=values.dtype)
+            (np.minimum if func == "MIN" else np.maximum).at(out, g, values)
+            return out, empty
+        raise UnsupportedIR(f"aggregate {func}")
+
+
+def run_with_fallback(executor, conn, ir):
+    """Run `ir` with the executor, or through SQLite when it is unsupported.
+    Returns (rows, used_numpy)."""
+    try:
+        return executor.execute(ir), True
+    except UnsupportedIR:
+        sql = translate_json_to_sql(ir)
+        if sql is None:
+            raise IRExecutionError("IR could not be translated")
+        try:
+            return conn.execute(sql).fetchall(), False
+        except sqlite3.Error as e:
+            raise IRExecutionError(str(e)) from e
+
+
+def _load_ir(value):
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return None
+    try:
+        return json.loads(clean_json_string(value))
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def score_predictions(pred_path, db_path=DB_PATH):
+    """Execution accuracy of pred_json against gold_json, without generating SQL"""
+    executor = IRExecutor.from_db(db_path)
+    conn = sqlite3.connect(db_path)
+    total = matched = numpy_runs = errors = 0
+    start = time.perf_counter()
+    with open(pred_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            gold, pred = _load_ir(data.get("gold_json")), _load_ir(data.get("pred_json"))
+            if gold is None:
+                continue
+            total += 1
+            try:
+                gold_rows, fast_gold = run_with_fallback(executor, conn, gold)
+                pred_rows, fast_pred = run_with_fallback(executor, conn, pred) if pred else (None, False)
+            except IRExecutionError:
+                errors += 1
+                continue
+            numpy_runs += fast_gold + fast_pred
+            matched += pred_rows == gold_rows
+    conn.close()
+    elapsed = time.perf_counter() - start
+    print(f"Scored {total} predictions in {elapsed:.2f}s ({numpy_runs} of {2 * total} runs on NumPy, {errors} errors)")
+    print(f"Execution Match (EX): {matched / total if total else 0:.3f}")
+
+
+def verify(pred_path, db_path=DB_PATH):
+    """Compare the executor with SQLite on every gold/pred IR in a file"""
+    executor = IRExecutor.from_db(db_path)
+    conn = sqlite3.connect(db_path)
+    checked = unsupported = mismatches = 0
+    with open(pred_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            for key in ("gold_json", "pred_json", "json_label"):
+                ir = _load_ir(data.get(key))
+                if ir is None:
+                    continue
+                sql = translate_json_to_sql(ir)
+                try:
+                    expected = conn.execute(sql).fetchall() if sql else None
+                except sqlite3.Error:
+                    expected = None
+                try:
+                    actual = executor.execute(ir)
+                except UnsupportedIR:
+                    unsupported += 1
+                    continue
+                except IRExecutionError:
+                    actual = None
+                checked += 1
+                if actual != expected:
+                    mismatches += 1
+                    print(f"[MISMATCH] id={data.get('id')} {key}: {sql}")
+    conn.close()
+    print(f"Checked {checked} IRs ({unsupported} unsupported), {mismatches} mismatches")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run light JSON IR directly on NumPy column arrays")
+    parser.add_argument("--db", type=str, default=DB_PATH, help="SQLite database to load")
+    parser.add_argument("--input", type=str, default=PRED_FILE, help="JSONL with gold_json/pred_json (or json_label)")
+    parser.add_argument("--verify", action="store_true", help="Check results against SQLite instead of scoring")
+    args = parser.parse_args()
+
+    if args.verify:
+        verify(args.input, args.db)
+    else:
+        score_predictions(args.input, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+from enum import Enum
+
+import orjson
+
+DEFAULT_TABLE = "demographics"
+
+IR_KEYS = ("select", "from", "where", "groupBy", "orderBy", "limit", "having")
+
+
+class IRValidationError(ValueError):
+    """An IR object that does not fit the light IR schema"""
+
+
+class Agg(str, Enum):
+    SUM = "SUM"
+    COUNT = "COUNT"
+    AVG = "AVG"
+    MIN = "MIN"
+    MAX = "MAX"
+
+
+class Op(str, Enum):
+    EQ = "="
+    NEQ = "!="
+    GT = ">"
+    LT = "<"
+    GTE = ">="
+    LTE = "<="
+    LIKE = "LIKE"
+    NOT_LIKE = "NOT LIKE"
+    IN = "IN"
+    NOT_IN = "NOT IN"
+    BETWEEN = "BETWEEN"
+
+
+class Direction(str, Enum):
+    ASC = "ASC"
+    DESC = "DESC"
+
+
+def _agg(value, where):
+    # "NONE" is how models (and older labels) spell "no aggregate".
+    if value is None or (isinstance(value, str) and value.upper() == "NONE"):
+        return None
+    try:
+        return Agg(value.upper())
+    except (AttributeError, ValueError):
+        raise IRValidationError(f"{where}: unknown aggregate {value!r}") from None
+
+
+def _str(value, where, optional=False):
+    if value is None and optional:
+        return None
+    if not isinstance(value, str):
+        raise IRValidationError(f"{where}: expected a string, got {value!r}")
+    return value
+
+
+def _list(obj, key):
+    value = obj.get(key, [])
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise IRValidationError(f"{key}: expected a list, got {type(value).__name__}")
+    return value
+
+
+def _item(value, where):
+    if not isinstance(value, dict):
+        raise IRValidationError(f"{where}: expected an object, got {type(value).__name__}")
+    return value
+
+
+class _Frozen:
+    # Fields are set once in __init__ (through object.__setattr__); any later
+    # assignment raises, so a cached hash can never go stale.
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    # Equality and hashing are by value, through each class's _key().
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        # Pickle/copy through __init__ (slots are listed in argument order).
+        return type(self), tuple(getattr(self, name) for name in self.__slots__ if name != "_hash")
+
+
+_set = object.__setattr__
+
+
+class SelectItem(_Frozen):
+    __slots__ = ("column", "agg", "alias")
+
+    def __init__(self, column: str, agg=None, alias=None):
+        _set(self, "column", _str(column, "select.column"))
+        _set(self, "agg", _agg(agg, "select.agg"))
+        _set(self, "alias", _str(alias, "select.alias", optional=True))
+
+    def _key(self):
+        return (self.column, self.agg, self.alias)
+
+    def to_dict(self) -> dict:
+        return {"column": self.column, "agg": self.agg.value if self.agg else None, "alias": self.alias}
+
+
+class Condition(_Frozen):
+    __slots__ = ("column", "operator", "value", "agg")
+
+    def __init__(self, column: str, operator, value, agg=None):
+        """
+        One WHERE or HAVING term: `column operator value`.
+
+        Values are kept as written in the IR: a SQL literal string ("'30303'",
+        "2020", "10 AND 20", "['2019', '2020']"), a number, or a list of
+        scalars (stored as a tuple).
+        """
+        _set(self, "column", _str(column, "condition.column"))
+        try:
+            operator = Op(operator.upper() if isinstance(operator, str) else operator)
+        except ValueError:
+            raise IRValidationError(f"condition.operator: unknown operator {operator!r}") from None
+        _set(self, "operator", operator)
+        if isinstance(value, (list, tuple)):
+            if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in value):
+                raise IRValidationError(f"condition.value: unsupported list {value!r}")
+            value = tuple(value)
+        elif not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise IRValidationError(f"condition.value: unsupported value {value!r}")
+        _set(self, "value", value)
+        _set(self, "agg", _agg(agg, "condition.agg"))
+
+    def _key(self):
+        return (self.column, self.operator, self.value, self.agg)
+
+    def to_dict(self, with_agg: bool = False) -> dict:
+        """WHERE items carry no "agg" key unless they have one; HAVING items always do"""
+        value = list(self.value) if isinstance(self.value, tuple) else self.value
+        if with_agg or self.agg:
+            return {"column": self.column, "agg": self.agg.value if self.agg else None,
+                    "operator": self.operator.value, "value": value}
+        return {"column": self.column, "operator": self.operator.value, "value": value}
+
+
+class OrderItem(_Frozen):
+    __slots__ = ("column", "direction")
+
+    def __init__(self, column: str, direction="ASC"):
+        _set(self, "column", _str(column, "orderBy.column"))
+        try:
+            _set(self, "direction", Direction(direction.upper() if isinstance(direction, str) else direction))
+        except ValueError:
+            raise IRValidationError(f"orderBy.direction: unknown direction {direction!r}") from None
+
+    def _key(self):
+        return (self.column, self.direction)
+
+    def to_dict(self) -> dict:
+        return {"column": self.column, "direction": self.direction.value}
+
+
+class LightIR(_Frozen):
+    __slots__ = ("select", "tables", "where", "group_by", "order_by", "limit", "having", "_hash")
+
+    def __init__(self, select=(), tables=(DEFAULT_TABLE,), where=(), group_by=(), order_by=(),
+                 limit=None, having=()):
+        """
+        Typed, immutable form of the light JSON plan.
+
+        Built from the dict IR with from_dict(), which validates every item;
+        instances compare and hash by value, so they can key caches directly.
+
+        Args:
+            select: SelectItem objects (empty means SELECT *)
+            tables: Table names for the FROM clause
+            where: Condition objects combined with AND
+            group_by: Column names
+            order_by: OrderItem objects
+            limit (int): Row limit, or None
+            having: Condition objects combined with AND
+        """
+        _set(self, "select", tuple(select))
+        _set(self, "tables", tuple(_str(t, "from") for t in tables))
+        _set(self, "where", tuple(where))
+        _set(self, "group_by", tuple(_str(g, "groupBy") for g in group_by))
+        _set(self, "order_by", tuple(order_by))
+        if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+            raise IRValidationError(f"limit: expected a non-negative integer, got {limit!r}")
+        _set(self, "limit", limit)
+        _set(self, "having", tuple(having))
+        _set(self, "_hash", None)
+
+    def _key(self):
+        return (tuple(s._key() for s in self.select), self.tables, tuple(c._key() for c in self.where),
+                self.group_by, tuple(o._key() for o in self.order_by), self.limit,
+                tuple(c._key() for c in self.having))
+
+    def __hash__(self):
+        # Cached: LightIRs are used as memo keys
+        if self._hash is None:
+            _set(self, "_hash", hash(self._key()))
+        return self._hash
+
+    def __repr__(self):
+        return f"LightIR({self.to_dict()!r})"
+
+    @classmethod
+    def from_dict(cls, obj: dict) -> "LightIR":
+        """
+        Validate a dict IR (as written by generate_json.py) and build a LightIR.
+
+        Missing keys take their defaults (FROM demographics, no LIMIT);
+        unknown keys, aggregates, operators or malformed items raise
+        IRValidationError.
+        """
+        if not isinstance(obj, dict):
+            raise IRValidationError(f"IR: expected an object, got {type(obj).__name__}")
+        unknown = set(obj) - set(IR_KEYS)
+        if unknown:
+            raise IRValidationError(f"IR: unknown keys {sorted(unknown)}")
+
+        select = [SelectItem(i.get("column", "*"), i.get("agg"), i.get("alias"))
+                  for i in (_item(i, "select") for i in _list(obj, "select"))]
+        where = [Condition(c.get("column"), c.get("operator", "="), c.get("value"), c.get("agg"))
+                 for c in (_item(c, "where") for c in _list(obj, "where"))]
+        having = [Condition(c.get("column"), c.get("operator", "="), c.get("value"), c.get("agg"))
+                  for c in (_item(c, "having") for c in _list(obj, "having"))]
+        orders = obj.get("orderBy", [])
+        if isinstance(orders, dict):
+            orders = [orders]
+        elif orders is None:
+            orders = []
+        elif not isinstance(orders, list):
+            raise IRValidationError(f"orderBy: expected a list, got {type(orders).__name__}")
+        order_by = [OrderItem(o.get("column"), o.get("direction", "ASC"))
+                    for o in (_item(o, "orderBy") for o in orders)]
+        tables = obj["from"] if "from" in obj else [DEFAULT_TABLE]
+        if not isinstance(tables, list):
+            raise IRValidationError(f"from: expected a list, got {type(tables).__name__}")
+        return cls(select, tables, where, _list(obj, "groupBy"), order_by, obj.get("limit"), having)
+
+    def to_dict(self) -> dict:
+        """The dict IR, with the same key order and item shapes as generate_json.py"""
+        return {
+            "select": [s.to_dict() for s in self.select],
+            "from": list(self.tables),
+            "where": [c.to_dict() for c in self.where],
+            "groupBy": list(self.group_by),
+            "orderBy": [o.to_dict() for o in self.order_by],
+            "limit": self.limit,
+            "having": [c.to_dict(with_agg=True) for c in self.having],
+        }
+
+    def dumps(self) -> bytes:
+        """Compact JSON encoding (orjson)"""
+        return orjson.dumps(self.to_dict())
+
+    @classmethod
+    def loads(cls, data) -> "LightIR":
+        """Decode and validate a JSON IR (str or bytes)"""
+        try:
+            obj = orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise IRValidationError(f"IR: invalid JSON ({e})") from None
+        return cls.from_dict(obj)
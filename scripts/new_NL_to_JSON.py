@@ -1,9 +1,11 @@
 import os
-import json
+import sys
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 from tqdm import tqdm
 import transformers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval"))
+from jsonl_io import JSONLReader, JSONLWriter
 
 transformers.logging.set_verbosity_error()
 
@@ -97,48 +99,30 @@ def batch_inference(nl_queries, max_new_tokens=512):
 
 
 def main():
-    triplets = []
     print(f"Reading data from {DATA_FILE}...")
-    
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                triplets.append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-    
-    print(f"Loaded {len(triplets)} samples.")
-    
-    nls = [item.get("nl", "").strip() for item in triplets]
-    
-    pred_jsons = []
-    
+    reader = JSONLReader(DATA_FILE)
+
     print(f"Running Inference on H100 (Batch Size: {BATCH_SIZE})...")
-    
-    for i in tqdm(range(0, len(nls), BATCH_SIZE)):
-        batch_nl = nls[i : i + BATCH_SIZE]
-        try:
-            batch_result = batch_inference(batch_nl)
-        except Exception as e:
-            print(f"Error in batch {i}: {e}")
-            batch_result = ["ERROR"] * len(batch_nl)
-        pred_jsons.extend(batch_result)
-        
-    results = []
-    for item, pred_json in zip(triplets, pred_jsons):
-        results.append({
-            "id": item.get("id"),
-            "nl": item.get("nl"),
-            "gold_json": item.get("json_label"),
-            "pred_json": pred_json
-        })
-        
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        for r in results:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-            
+
+    with JSONLWriter(OUTPUT_FILE) as writer:
+        for i, triplets in enumerate(tqdm(reader.iter_batches(BATCH_SIZE), unit="batch")):
+            batch_nl = [item.get("nl", "").strip() for item in triplets]
+            try:
+                pred_jsons = batch_inference(batch_nl)
+            except Exception as e:
+                print(f"Error in batch {i * BATCH_SIZE}: {e}")
+                pred_jsons = ["ERROR"] * len(batch_nl)
+
+            for item, pred_json in zip(triplets, pred_jsons):
+                writer.write({
+                    "id": item.get("id"),
+                    "nl": item.get("nl"),
+                    "gold_json": item.get("json_label"),
+                    "pred_json": pred_json
+                })
+
+    print(f"Loaded {reader.summary()}")
     print(f"\nInference Complete. Results saved to: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
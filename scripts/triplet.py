@@ -1,5 +1,8 @@
 import os
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval"))
+from jsonl_io import JSONLIndex, JSONLWriter
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -10,46 +13,39 @@ JSON_PLAN_FILE = os.path.join(DATA_DIR, "converted_plans.jsonl")
 
 OUTPUT_FILE = os.path.join(DATA_DIR, "merged_dataset.jsonl")
 
-def load_jsonl(path):
-    items = {}
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            obj = json.loads(line)
-            items[obj["id"]] = obj
-    return items
-
 def main():
-    print("Loading NL/SQL jsonl...")
-    nl_sql = load_jsonl(NL_SQL_FILE)
+    # Both files are read through id -> offset indexes, so only the records
+    # being merged are decoded and held in memory.
+    print("Indexing NL/SQL jsonl...")
+    nl_sql = JSONLIndex(NL_SQL_FILE)
 
-    print("Loading JSON plans jsonl...")
-    plans = load_jsonl(JSON_PLAN_FILE)
+    print("Indexing JSON plans jsonl...")
+    plans = JSONLIndex(JSON_PLAN_FILE)
 
-    merged = []
     missing = 0
 
-    for id_, obj in nl_sql.items():
-        if id_ not in plans:
-            missing += 1
-            continue
-
-        merged.append({
-            "id": id_,
-            "nl": obj.get("nl"),
-            "sql": obj.get("sql"),
-            "json_plan": plans[id_].get("plan")
-        })
+    with nl_sql, plans, JSONLWriter(OUTPUT_FILE) as out:
+        for id_ in nl_sql.keys():
+            if id_ not in plans:
+                missing += 1
+                continue
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-        for m in merged:
-            out.write(json.dumps(m, ensure_ascii=False) + "\n")
+            obj = nl_sql.get(id_)
+            out.write({
+                "id": id_,
+                "nl": obj.get("nl"),
+                "sql": obj.get("sql"),
+                "json_plan": plans.get(id_).get("plan")
+            })
 
-    print(f"\nMerged records: {len(merged)}")
+    print(f"\nMerged records: {out.count}")
     print(f"Missing JSON plans: {missing}")
+    for index in (nl_sql, plans):
+        if index.errors:
+            shown = ", ".join(map(str, index.error_lines))
+            more = ", ..." if index.errors > len(index.error_lines) else ""
+            print(f"Skipped in {index.path} (malformed or no id): {index.errors} (line {shown}{more})")
     print(f"Saved to {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,16 +1,20 @@
 import json
 import sqlite3
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval"))
+from db_connections import DEFAULT_DB_PATH, open_readonly
 
 JSONL_FILE_PATH = "data/nl_sql.jsonl"
-DB_PATH = "my_database.db"
+DB_PATH = DEFAULT_DB_PATH
 
 def validate_sqls(jsonl_path, db_path):
     if not os.path.exists(db_path):
         print(f"Warning: '{db_path}' Cannot find the file")
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = open_readonly(db_path)
         cursor = conn.cursor()
         
         print(f" Validation start: {jsonl_path}")